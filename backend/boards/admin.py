@@ -1,8 +1,27 @@
+from django import forms
 from django.contrib import admin
+from budget.currency import unconvertible_expenses
 from .models import Board, List, Card
 
+
+class BoardAdminForm(forms.ModelForm):
+    class Meta:
+        model = Board
+        fields = '__all__'
+
+    def clean_currency(self):
+        # Same check as BoardSerializer.validate_currency: every expense gets converted
+        currency = self.cleaned_data['currency'].strip().upper()
+        if self.instance.pk and currency != self.instance.currency:
+            missing = unconvertible_expenses(self.instance, currency).count()
+            if missing:
+                raise forms.ValidationError(f"No exchange rate to convert {missing} expenses to {currency}; load rates first.")
+        return currency
+
+
 @admin.register(Board)
 class BoardAdmin(admin.ModelAdmin):
+    form = BoardAdminForm
     list_display = ('title', 'owner', 'status', 'created_at')
     list_filter = ('status', 'owner')
     search_fields = ('title', 'description')
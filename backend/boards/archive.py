@@ -0,0 +1,150 @@
+"""
+Archival of completed boards.
+
+archive_board() copies a board's rows (the board and its members, lists,
+cards and their assignees, expenses and their shares, locations) into one
+BoardArchive row as zlib-compressed JSON with the original primary keys, then
+purges them from the hot tables with the batched steps of boards/deletion.py.
+Derived rows (budget totals, spending rollups) are rebuilt on restore and
+history (description operations, due-date reminders) is dropped;
+notifications about the board are kept but lose their link to it.
+
+restore_board() inserts the rows back table by table with bulk_create, so
+the board keeps its ids and URLs. References to accounts deleted in the
+meantime are cleared, or the row is dropped where the foreign key cascades.
+"""
+import json
+import zlib
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.utils import timezone
+from budget.models import BudgetTotal, Expense, ExpenseShare, SpendingRollup
+from maps.models import Location
+from users.models import Notification, User
+from .deletion import board_plan
+from .models import Board, BoardArchive, Card, List
+
+# (document key, model, lookup of the board id), parents before children
+ARCHIVED_TABLES = [
+    ('boards', Board, 'pk'),
+    ('board_members', Board.members.through, 'board_id'),
+    ('lists', List, 'board_id'),
+    ('cards', Card, 'list__board_id'),
+    ('card_members', Card.assigned_members.through, 'card__list__board_id'),
+    ('expenses', Expense, 'board_id'),
+    ('expense_shares', ExpenseShare, 'expense__board_id'),
+    ('locations', Location, 'board_id'),
+]
+
+
+class ArchiveEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder, but keeping full microsecond precision so timestamps restore exactly"""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def archivable_boards(older_than_days=None):
+    """Completed boards whose trip ended (or, without an end date, last changed) more than the threshold ago"""
+    if older_than_days is None:
+        older_than_days = getattr(settings, 'BOARD_ARCHIVE_AFTER_DAYS', 180)
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    return Board.objects.filter(status='completed').filter(
+        models.Q(end_date__lt=cutoff.date()) | models.Q(end_date__isnull=True, updated_at__lt=cutoff)
+    )
+
+
+def columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def archive_board(board, batch_size=None):
+    """Move a board into the archive; returns the BoardArchive, or None if the board is gone"""
+    batch_size = batch_size or getattr(settings, 'DELETION_BATCH_SIZE', 1000)
+    with transaction.atomic():
+        if not Board.objects.select_for_update().filter(pk=board.pk).exists():
+            return None
+        document = {
+            key: list(model._base_manager.filter(**{lookup: board.pk}).values(*columns(model)))
+            for key, model, lookup in ARCHIVED_TABLES
+        }
+        board_row = document['boards'][0]
+        archive = BoardArchive.objects.create(
+            board_id=board.pk,
+            owner_id=board_row['owner_id'],
+            title=board_row['title'],
+            start_date=board_row['start_date'],
+            end_date=board_row['end_date'],
+            document=zlib.compress(json.dumps(document, cls=ArchiveEncoder).encode()),
+            row_count=sum(len(rows) for rows in document.values()),
+        )
+        archive.members.set(row['user_id'] for row in document['board_members'])
+
+        Notification.objects.filter(board_id=board.pk).update(board=None)
+        for step in board_plan(Board.all_objects.filter(pk=board.pk).values('pk')):
+            while step.run(batch_size):
+                pass
+    return archive
+
+
+def load_document(archive):
+    return json.loads(zlib.decompress(bytes(archive.document)))
+
+
+def restore_rows(model, rows, user_ids):
+    """bulk_create rows of model, keeping their primary keys and timestamps"""
+    user_fields = [
+        field for field in model._meta.concrete_fields
+        if field.is_relation and field.related_model is User
+    ]
+    objects = []
+    for row in rows:
+        for field in user_fields:
+            if row[field.attname] is not None and row[field.attname] not in user_ids:
+                if field.remote_field.on_delete is models.CASCADE:
+                    break
+                row[field.attname] = None
+        else:
+            objects.append((model(**row), row))
+    if not objects:
+        return 0
+
+    model._base_manager.bulk_create([obj for obj, _ in objects], batch_size=1000)
+    # bulk_create stamps auto_now / auto_now_add fields with the current time
+    stamped = [
+        field.attname for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    if stamped:
+        for obj, row in objects:
+            for attname in stamped:
+                setattr(obj, attname, row[attname])
+        model._base_manager.bulk_update([obj for obj, _ in objects], stamped, batch_size=1000)
+    return len(objects)
+
+
+def restore_board(archive):
+    """Put an archived board back into the hot tables; returns the Board"""
+    with transaction.atomic():
+        archive = BoardArchive.objects.select_for_update().get(pk=archive.pk)
+        document = load_document(archive)
+        referenced = {
+            row[field.attname]
+            for key, model, _ in ARCHIVED_TABLES
+            for field in model._meta.concrete_fields
+            if field.is_relation and field.related_model is User
+            for row in document[key]
+            if row[field.attname] is not None
+        }
+        user_ids = set(User.all_objects.filter(pk__in=referenced).values_list('pk', flat=True))
+        for key, model, _ in ARCHIVED_TABLES:
+            restore_rows(model, document[key], user_ids)
+
+        BudgetTotal.rebuild(board_ids=[archive.board_id])
+        SpendingRollup.rebuild(board_ids=[archive.board_id])
+        archive.delete()
+    return Board.objects.get(pk=archive.board_id)
@@ -0,0 +1,161 @@
+"""
+Collaborative editing of Board.description and Card.description.
+
+Clients send small operations (see boards/ot.py) tagged with the revision
+they were made against. The server transforms them over anything committed
+since, appends them to DescriptionOperation and keeps the merged text in the
+cache. Other clients poll for the deltas since their revision. The merged
+text is written back to the model row at most once per debounce window; the
+snapshot_descriptions command flushes documents whose last edit fell inside
+that window.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+from . import ot
+from .models import Board, Card, DescriptionOperation
+
+
+class ResyncRequired(Exception):
+    """The client's base revision is no longer usable; it must reload the text"""
+
+
+def snapshot_debounce():
+    return timedelta(seconds=getattr(settings, 'COLLAB_SNAPSHOT_DEBOUNCE_SECONDS', 5))
+
+
+class CollaborativeDescription:
+    def __init__(self, instance):
+        self.instance = instance
+        self.model = type(instance)
+        self.target = 'board' if isinstance(instance, Board) else 'card'
+
+    @property
+    def cache_key(self):
+        return f'collab:{self.target}:{self.instance.pk}'
+
+    def operations(self):
+        return DescriptionOperation.objects.filter(**{self.target: self.instance})
+
+    def _load(self, row):
+        """
+        Return the merged {text, revision}: the cached state, or the row snapshot
+        when the cache is cold, caught up with ops other processes committed.
+        """
+        state = cache.get(self.cache_key)
+        if state is None or state['revision'] < row['description_revision']:
+            state = {'text': row['description'] or '', 'revision': row['description_revision']}
+        for op in self.operations().filter(revision__gt=state['revision']):
+            state = {'text': ot.apply(state['text'], op.ops), 'revision': op.revision}
+        return state
+
+    def _row(self, lock=False):
+        queryset = self.model.objects.filter(pk=self.instance.pk)
+        if lock:
+            queryset = queryset.select_for_update()
+        return queryset.values('description', 'description_revision', 'updated_at').get()
+
+    def state(self):
+        state = self._load(self._row())
+        cache.set(self.cache_key, state)
+        return state
+
+    def operations_since(self, revision):
+        """Deltas committed after revision, oldest first"""
+        row = self._row()
+        if revision < row['description_revision'] and not self.operations().filter(revision=revision + 1).exists():
+            raise ResyncRequired()
+        return list(
+            self.operations().filter(revision__gt=revision)
+            .values('revision', 'ops', 'author_id', 'created_at')
+        )
+
+    def submit(self, base_revision, ops, user=None):
+        """
+        Merge an operation made against base_revision. Returns the new revision
+        and the transformed operation that other clients need to apply.
+        """
+        ops = ot.normalize(ops)
+        with transaction.atomic():
+            row = self._row(lock=True)
+            state = self._load(row)
+            if base_revision > state['revision']:
+                raise ot.OperationError("Unknown base revision")
+
+            concurrent = list(self.operations().filter(revision__gt=base_revision).values_list('revision', 'ops'))
+            if len(concurrent) != state['revision'] - base_revision:
+                # History before the last snapshot was pruned or replaced
+                raise ResyncRequired()
+            for _, applied in concurrent:
+                ops, _ = ot.transform(ops, applied)
+
+            if ot.is_noop(ops):
+                return state['revision'], ops
+
+            state = {'text': ot.apply(state['text'], ops), 'revision': state['revision'] + 1}
+            DescriptionOperation.objects.create(
+                **{self.target: self.instance}, revision=state['revision'], ops=ops, author=user
+            )
+            if timezone.now() - row['updated_at'] >= snapshot_debounce():
+                self._write_snapshot(state)
+            transaction.on_commit(lambda: cache.set(self.cache_key, state))
+        return state['revision'], ops
+
+    def _write_snapshot(self, state):
+        self.model.objects.filter(pk=self.instance.pk).update(
+            description=state['text'],
+            description_revision=state['revision'],
+            updated_at=timezone.now(),
+            version=F('version') + 1,
+        )
+
+    def snapshot(self):
+        with transaction.atomic():
+            state = self._load(self._row(lock=True))
+            self._write_snapshot(state)
+        cache.set(self.cache_key, state)
+        return state
+
+    def replace(self, loaded_text, loaded_revision, new_text):
+        """
+        The description was rewritten through the regular endpoints. Record the
+        rewrite as a whole-text replacement so clients editing on an older
+        revision can still be transformed over it.
+        """
+        with transaction.atomic():
+            self._row(lock=True)
+            state = self._load({'description': loaded_text, 'description_revision': loaded_revision})
+            if state['text'] != new_text:
+                replacement = ot.normalize([-len(state['text']), new_text])
+                state = {'text': new_text, 'revision': state['revision'] + 1}
+                DescriptionOperation.objects.create(
+                    **{self.target: self.instance}, revision=state['revision'], ops=replacement
+                )
+            self.model.objects.filter(pk=self.instance.pk).update(description_revision=state['revision'])
+            self.instance.description_revision = state['revision']
+            transaction.on_commit(lambda: cache.set(self.cache_key, state))
+
+
+def pending_snapshots():
+    """Boards and cards with edits newer than their snapshot and idle for the debounce window"""
+    idle_before = timezone.now() - snapshot_debounce()
+    for model in (Board, Card):
+        pending = model.objects.filter(
+            description_ops__revision__gt=F('description_revision')
+        ).annotate(last_edit=Max('description_ops__created_at')).filter(last_edit__lte=idle_before)
+        yield from pending
+
+
+def sync_saved_description(instance):
+    """Called after a regular save of a Board or Card that may have rewritten the description"""
+    loaded_text = getattr(instance, '_loaded_description', None)
+    if loaded_text is None or (instance.description or '') == loaded_text:
+        return
+    CollaborativeDescription(instance).replace(
+        loaded_text, instance._loaded_description_revision, instance.description or ''
+    )
+    instance._loaded_description = instance.description or ''
+    instance._loaded_description_revision = instance.description_revision
@@ -0,0 +1,169 @@
+"""
+Background deletion of boards and accounts.
+
+Deleting a big board with Model.delete() runs the cascade collector in the
+request, which loads every dependent row into memory. Instead delete_board()
+and delete_account() only stamp deleted_at, which hides the row from the
+default managers at once, and queue a DeletionJob. The purge_deleted worker
+then works through the job's plan: an ordered list of steps, leaves first,
+each emptying one table for the deleted objects DELETION_BATCH_SIZE rows at a
+time with a plain DELETE (or UPDATE ... SET NULL) by primary key, so nothing
+is collected in memory and each batch is a short transaction. The job row
+records the completed steps and the purged row count after every batch;
+since every step selects only the rows still left, a crashed worker simply
+resumes from there. The object row itself goes last through delete(), which
+by then has nothing left to cascade to.
+"""
+from collections import Counter
+from dataclasses import dataclass
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from budget.models import BudgetTotal, Expense, ExpenseShare, SpendingRollup
+from maps.models import Location, MapVersion
+from users.models import Notification, NotificationCounter, NotificationEvent, User
+from .models import Board, BoardArchive, Card, DeletionJob, DescriptionOperation, DueDateReminder, IdempotencyKey, List
+
+
+@dataclass
+class PurgeStep:
+    label: str
+    queryset: object
+    # Clear this foreign key instead of deleting the rows (on_delete=SET_NULL)
+    nullify: str = None
+    # Delete through the cascade collector; used for the object row itself
+    collect: bool = False
+    # Called with the primary keys of each batch before it is purged
+    before_purge: object = None
+
+    def run(self, batch_size):
+        """Purge one batch; returns the number of rows affected (0 once the step is done)"""
+        model = self.queryset.model
+        ids = list(self.queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return 0
+        batch = model._base_manager.filter(pk__in=ids)
+        if self.before_purge is not None:
+            self.before_purge(ids)
+        if self.nullify:
+            return batch.update(**{self.nullify: None})
+        if self.collect:
+            return batch.delete()[1].get(model._meta.label, 0)
+        return batch._raw_delete(batch.db)
+
+
+def release_unread(notification_ids):
+    """Take the unread notifications among notification_ids off their users' badge counters"""
+    unread = Counter(
+        Notification.objects.filter(pk__in=notification_ids, is_read=False).values_list('user_id', flat=True)
+    )
+    NotificationCounter.add({user_id: -count for user_id, count in unread.items()})
+
+
+def board_plan(boards):
+    """Steps purging the boards selected by the Board.all_objects values('pk') queryset"""
+    cards = Card.objects.filter(list__board__in=boards)
+    return [
+        PurgeStep('card assignments', Card.assigned_members.through.objects.filter(card__in=cards)),
+        PurgeStep('due date reminders', DueDateReminder.objects.filter(card__in=cards)),
+        PurgeStep('description operations', DescriptionOperation.objects.filter(Q(board__in=boards) | Q(card__in=cards))),
+        PurgeStep('expense shares', ExpenseShare.objects.filter(expense__board__in=boards)),
+        PurgeStep('expenses', Expense.objects.filter(board__in=boards)),
+        PurgeStep('budget totals', BudgetTotal.objects.filter(board__in=boards)),
+        PurgeStep('spending rollups', SpendingRollup.objects.filter(board__in=boards)),
+        PurgeStep('locations', Location.objects.filter(board__in=boards)),
+        PurgeStep('notifications', Notification.objects.filter(board__in=boards), before_purge=release_unread),
+        PurgeStep('cards', cards),
+        PurgeStep('lists', List.objects.filter(board__in=boards)),
+        PurgeStep('members', Board.members.through.objects.filter(board__in=boards)),
+        PurgeStep('map versions', MapVersion.objects.filter(board__in=boards)),
+        PurgeStep('boards', Board.all_objects.filter(pk__in=boards), collect=True),
+    ]
+
+
+def account_plan(user_id):
+    """Steps purging an account: first its own boards, then its rows on other boards"""
+    owned = Board.all_objects.filter(owner_id=user_id).values('pk')
+    return board_plan(owned) + [
+        PurgeStep('board memberships', Board.members.through.objects.filter(user_id=user_id)),
+        PurgeStep('archive members', BoardArchive.members.through.objects.filter(boardarchive__owner_id=user_id)),
+        PurgeStep('archive memberships', BoardArchive.members.through.objects.filter(user_id=user_id)),
+        PurgeStep('archives', BoardArchive.objects.filter(owner_id=user_id)),
+        PurgeStep('card assignments', Card.assigned_members.through.objects.filter(user_id=user_id)),
+        PurgeStep('due date reminders', DueDateReminder.objects.filter(user_id=user_id)),
+        PurgeStep('expense shares', ExpenseShare.objects.filter(user_id=user_id)),
+        PurgeStep('spending rollups', SpendingRollup.objects.filter(user_id=user_id)),
+        PurgeStep('notifications', Notification.objects.filter(user_id=user_id), before_purge=release_unread),
+        PurgeStep('queued notifications', NotificationEvent.objects.filter(user_id=user_id)),
+        PurgeStep('notification counter', NotificationCounter.objects.filter(user_id=user_id)),
+        PurgeStep('idempotency keys', IdempotencyKey.objects.filter(user_id=user_id)),
+        PurgeStep('expense creators', Expense.objects.filter(created_by_id=user_id), nullify='created_by'),
+        PurgeStep('expense payers', Expense.objects.filter(paid_by_id=user_id), nullify='paid_by'),
+        PurgeStep('location creators', Location.objects.filter(created_by_id=user_id), nullify='created_by'),
+        PurgeStep('description authors', DescriptionOperation.objects.filter(author_id=user_id), nullify='author'),
+        PurgeStep('account', User.all_objects.filter(pk=user_id), collect=True),
+    ]
+
+
+def job_plan(job):
+    if job.kind == DeletionJob.BOARD:
+        return board_plan(Board.all_objects.filter(pk=job.object_id).values('pk'))
+    return account_plan(job.object_id)
+
+
+def delete_board(board, requested_by=None):
+    """Hide the board at once and queue the purge of its rows; returns the DeletionJob"""
+    with transaction.atomic():
+        Board.all_objects.filter(pk=board.pk).update(deleted_at=timezone.now())
+        return DeletionJob.objects.create(kind=DeletionJob.BOARD, object_id=board.pk, requested_by=requested_by)
+
+
+def delete_account(user):
+    """
+    Hide the account and the boards it owns at once and queue their purge.
+    The email and username are released right away for a new registration.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        User.all_objects.filter(pk=user.pk).update(
+            deleted_at=now, is_active=False,
+            email=f'deleted-{user.pk}@deleted.invalid', username=f'deleted-{user.pk}',
+        )
+        Board.all_objects.filter(owner_id=user.pk, deleted_at__isnull=True).update(deleted_at=now)
+        return DeletionJob.objects.create(kind=DeletionJob.USER, object_id=user.pk, requested_by=user)
+
+
+def job_progress(job):
+    """(completed steps, total steps, label of the current step or None when finished)"""
+    plan = job_plan(job)
+    current = plan[job.step].label if job.step < len(plan) else None
+    return job.step, len(plan), current
+
+
+def purge_batch(batch_size=None, job_ids=None):
+    """
+    Purge one batch of the oldest unfinished job (or one of job_ids).
+    Returns the job, or None when there is nothing left to do.
+    """
+    batch_size = batch_size or getattr(settings, 'DELETION_BATCH_SIZE', 1000)
+    with transaction.atomic():
+        jobs = DeletionJob.objects.filter(finished_at__isnull=True).order_by('pk')
+        if job_ids is not None:
+            jobs = jobs.filter(pk__in=job_ids)
+        # Concurrent workers take different jobs
+        job = jobs.select_for_update(skip_locked=True).first()
+        if job is None:
+            return None
+
+        plan = job_plan(job)
+        while job.step < len(plan):
+            purged = plan[job.step].run(batch_size)
+            if purged:
+                job.purged_rows += purged
+                break
+            job.step += 1
+        if job.step == len(plan):
+            job.finished_at = timezone.now()
+        job.save(update_fields=['step', 'purged_rows', 'finished_at', 'updated_at'])
+    return job
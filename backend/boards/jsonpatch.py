@@ -0,0 +1,146 @@
+"""
+Minimal RFC 6902 JSON Patch support for the JSON array fields on Card.
+
+Operations are applied to a copy of the document, so a patch either applies
+completely or raises without touching the original.
+"""
+import copy
+
+
+class JsonPatchError(ValueError):
+    """The patch is malformed or cannot be applied to the document"""
+
+
+class JsonPatchTestFailed(JsonPatchError):
+    """A 'test' operation did not match the current document"""
+
+
+def parse_pointer(pointer):
+    """Split an RFC 6901 JSON pointer into its reference tokens"""
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith('/')):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    if pointer == '':
+        return []
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+
+def _list_index(container, token, allow_end=False):
+    if allow_end and token == '-':
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith('0')):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    upper = len(container) if allow_end else len(container) - 1
+    if index > upper:
+        raise JsonPatchError(f"Array index out of range: {index}")
+    return index
+
+
+def _resolve_parent(document, tokens):
+    if not tokens:
+        raise JsonPatchError("Operations on the document root are not supported")
+    target = document
+    for token in tokens[:-1]:
+        target = _get_child(target, token)
+    return target, tokens[-1]
+
+
+def _get_child(container, token):
+    if isinstance(container, list):
+        return container[_list_index(container, token)]
+    if isinstance(container, dict):
+        if token not in container:
+            raise JsonPatchError(f"Path member not found: {token!r}")
+        return container[token]
+    raise JsonPatchError(f"Cannot traverse into {type(container).__name__}")
+
+
+def _get(document, tokens):
+    target = document
+    for token in tokens:
+        target = _get_child(target, token)
+    return target
+
+
+def _add(document, tokens, value):
+    parent, token = _resolve_parent(document, tokens)
+    if isinstance(parent, list):
+        parent.insert(_list_index(parent, token, allow_end=True), value)
+    elif isinstance(parent, dict):
+        parent[token] = value
+    else:
+        raise JsonPatchError(f"Cannot add to {type(parent).__name__}")
+
+
+def _remove(document, tokens):
+    parent, token = _resolve_parent(document, tokens)
+    if isinstance(parent, list):
+        return parent.pop(_list_index(parent, token))
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"Path member not found: {token!r}")
+        return parent.pop(token)
+    raise JsonPatchError(f"Cannot remove from {type(parent).__name__}")
+
+
+def _replace(document, tokens, value):
+    parent, token = _resolve_parent(document, tokens)
+    if isinstance(parent, list):
+        parent[_list_index(parent, token)] = value
+    elif isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"Path member not found: {token!r}")
+        parent[token] = value
+    else:
+        raise JsonPatchError(f"Cannot replace in {type(parent).__name__}")
+
+
+def apply_patch(document, operations, allowed_roots=None):
+    """
+    Apply a list of RFC 6902 operations to document and return the patched copy.
+    When allowed_roots is given, every path must start with one of those members.
+    """
+    if not isinstance(operations, list):
+        raise JsonPatchError("A JSON Patch document must be an array of operations")
+
+    result = copy.deepcopy(document)
+    for operation in operations:
+        if not isinstance(operation, dict) or 'op' not in operation or 'path' not in operation:
+            raise JsonPatchError("Each operation needs 'op' and 'path'")
+
+        op = operation['op']
+        path = parse_pointer(operation['path'])
+        pointers = [path]
+        if op in ('move', 'copy'):
+            if 'from' not in operation:
+                raise JsonPatchError(f"'{op}' requires 'from'")
+            source = parse_pointer(operation['from'])
+            pointers.append(source)
+        if op in ('add', 'replace', 'test') and 'value' not in operation:
+            raise JsonPatchError(f"'{op}' requires 'value'")
+
+        if allowed_roots is not None:
+            for pointer in pointers:
+                if not pointer or pointer[0] not in allowed_roots:
+                    raise JsonPatchError(
+                        f"Only paths under {', '.join('/' + root for root in allowed_roots)} can be patched"
+                    )
+
+        if op == 'add':
+            _add(result, path, copy.deepcopy(operation['value']))
+        elif op == 'remove':
+            _remove(result, path)
+        elif op == 'replace':
+            _replace(result, path, copy.deepcopy(operation['value']))
+        elif op == 'move':
+            if path[:len(source)] == source and path != source:
+                raise JsonPatchError("Cannot move a value into one of its children")
+            _add(result, path, _remove(result, source))
+        elif op == 'copy':
+            _add(result, path, copy.deepcopy(_get(result, source)))
+        elif op == 'test':
+            if _get(result, path) != operation['value']:
+                raise JsonPatchTestFailed(f"Test failed at {operation['path']}")
+        else:
+            raise JsonPatchError(f"Unknown operation: {op!r}")
+    return result
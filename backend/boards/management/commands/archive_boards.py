@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from boards.archive import archivable_boards, archive_board
+
+
+class Command(BaseCommand):
+    help = "Move completed boards older than the threshold into the board_archives table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=None,
+                            help="Days since the trip ended (default: BOARD_ARCHIVE_AFTER_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Rows deleted per query (default: DELETION_BATCH_SIZE)")
+        parser.add_argument('--limit', type=int, default=None, help="Archive at most this many boards")
+        parser.add_argument('--dry-run', action='store_true', help="Only list the boards that would be archived")
+
+    def handle(self, *args, **options):
+        boards = archivable_boards(options['older_than_days']).order_by('pk').only('pk', 'title')
+        if options['limit']:
+            boards = boards[:options['limit']]
+
+        archived = rows = 0
+        for board in boards:
+            if options['dry_run']:
+                self.stdout.write(f"Would archive board {board.pk} '{board.title}'")
+                continue
+            archive = archive_board(board, batch_size=options['batch_size'])
+            if archive is None:
+                continue
+            archived += 1
+            rows += archive.row_count
+            self.stdout.write(f"Archived board {board.pk} '{board.title}' ({archive.row_count} rows)")
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Archived {archived} board(s), {rows} row(s)"))
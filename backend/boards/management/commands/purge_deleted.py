@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand
+from boards.deletion import job_progress, purge_batch
+
+
+class Command(BaseCommand):
+    help = "Purge the rows of deleted boards and accounts in batches; interrupted jobs resume where they stopped"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Rows deleted per query (default: DELETION_BATCH_SIZE)")
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep running, polling every N seconds (0 = drain once and exit)")
+
+    def handle(self, *args, **options):
+        while True:
+            last = None
+            while True:
+                job = purge_batch(batch_size=options['batch_size'])
+                if job is None:
+                    break
+                if job.finished_at:
+                    self.stdout.write(f"Deleted {job.kind} {job.object_id}: {job.purged_rows} row(s)")
+                elif (job.pk, job.step) != last:
+                    step, steps, label = job_progress(job)
+                    self.stdout.write(
+                        f"{job.kind} {job.object_id}: step {step + 1}/{steps} ({label}), "
+                        f"{job.purged_rows} row(s) so far"
+                    )
+                last = (job.pk, job.step)
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from boards.reminders import reminder_horizons, send_due_date_reminders
+
+
+class Command(BaseCommand):
+    help = "Notify assigned members about cards coming due; already sent reminders are not repeated"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizons', help="Comma-separated days before the due date (default: DUE_DATE_REMINDER_HORIZONS)")
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep running, checking every N seconds (0 = run once)")
+
+    def handle(self, *args, **options):
+        horizons = reminder_horizons()
+        if options['horizons']:
+            try:
+                horizons = sorted(int(days) for days in options['horizons'].split(','))
+            except ValueError:
+                raise CommandError("--horizons must be comma-separated day counts")
+            if horizons[0] < 0:
+                raise CommandError("Horizons cannot be negative")
+
+        while True:
+            users, reminders = send_due_date_reminders(horizons=horizons)
+            self.stdout.write(f"Sent {reminders} reminder(s) to {users} member(s)")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
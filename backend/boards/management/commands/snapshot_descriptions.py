@@ -0,0 +1,37 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from boards.collab import CollaborativeDescription, pending_snapshots
+from boards.models import DescriptionOperation
+
+
+class Command(BaseCommand):
+    help = "Write idle collaborative description edits back to boards/cards and prune old operations"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep running, flushing every N seconds (0 = run once)")
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = 0
+            for instance in pending_snapshots():
+                CollaborativeDescription(instance).snapshot()
+                flushed += 1
+            pruned = self.prune()
+            self.stdout.write(f"Snapshotted {flushed} description(s), pruned {pruned} operation(s)")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def prune(self):
+        """Keep only the last COLLAB_HISTORY_LENGTH operations before each snapshot"""
+        history = getattr(settings, 'COLLAB_HISTORY_LENGTH', 200)
+        deleted = 0
+        for target in ('board', 'card'):
+            deleted += DescriptionOperation.objects.filter(
+                **{f'{target}__isnull': False},
+                revision__lte=F(f'{target}__description_revision') - history,
+            ).delete()[0]
+        return deleted
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:53
+
+import boards.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0006_board_version_card_version_list_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='description_revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='description_revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='DescriptionOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revision', models.PositiveIntegerField()),
+                ('ops', models.JSONField(default=boards.models.get_default_list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('board', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='description_ops', to='boards.board')),
+                ('card', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='description_ops', to='boards.card')),
+            ],
+            options={
+                'db_table': 'description_operations',
+                'ordering': ['revision'],
+                'constraints': [models.UniqueConstraint(fields=('board', 'revision'), name='unique_board_description_revision'), models.UniqueConstraint(fields=('card', 'revision'), name='unique_card_description_revision')],
+            },
+        ),
+    ]
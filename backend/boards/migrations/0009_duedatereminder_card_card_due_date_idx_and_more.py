@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0008_idempotencykey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DueDateReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('horizon_days', models.PositiveSmallIntegerField()),
+                ('due_date', models.DateField(db_index=True)),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'due_date_reminders',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(condition=models.Q(('due_date__isnull', False)), fields=['due_date'], name='card_due_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='duedatereminder',
+            name='card',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='due_date_reminders', to='boards.card'),
+        ),
+        migrations.AddField(
+            model_name='duedatereminder',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='duedatereminder',
+            constraint=models.UniqueConstraint(fields=('card', 'user', 'horizon_days', 'due_date'), name='unique_due_date_reminder'),
+        ),
+    ]
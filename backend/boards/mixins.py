@@ -0,0 +1,142 @@
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+
+def version_etag(instance):
+    return f'"{instance.version}"'
+
+
+def parse_if_match(header):
+    """Return the set of versions listed in an If-Match header, or None for '*'"""
+    versions = set()
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag == '*':
+            return None
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        versions.add(tag.strip('"'))
+    return versions
+
+
+class ConditionalUpdateMixin:
+    """
+    Optimistic concurrency for detail views of VersionedModel rows.
+
+    GET responses carry an ETag with the row version. PUT/PATCH/DELETE requests
+    that send If-Match are checked against the locked current row and get a
+    412 with the current representation when the version moved on, so the
+    client can merge without fetching again. Requests without If-Match keep
+    the old last-write-wins behaviour.
+    """
+
+    def precondition_failed(self, request):
+        header = request.headers.get('If-Match')
+        if not header:
+            return None
+
+        instance = self.get_object()
+        current_version = (
+            type(instance).objects.select_for_update()
+            .values_list('version', flat=True)
+            .get(pk=instance.pk)
+        )
+        versions = parse_if_match(header)
+        if versions is None or str(current_version) in versions:
+            return None
+
+        instance.refresh_from_db()
+        return Response(
+            {
+                'error': 'Precondition failed: the object was modified by someone else.',
+                'current': self.get_serializer(instance).data,
+            },
+            status=status.HTTP_412_PRECONDITION_FAILED,
+            headers={'ETag': version_etag(instance)},
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = f'"{response.data["version"]}"'
+        return response
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            failed = self.precondition_failed(request)
+            if failed is not None:
+                return failed
+            response = super().update(request, *args, **kwargs)
+        if 'version' in response.data:
+            response['ETag'] = f'"{response.data["version"]}"'
+        return response
+
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            failed = self.precondition_failed(request)
+            if failed is not None:
+                return failed
+            return super().destroy(request, *args, **kwargs)
+
+
+class IdempotentCreateMixin:
+    """
+    Honours an Idempotency-Key header on POST. The key row is inserted in the
+    same transaction as the created object, so a concurrent retry blocks on the
+    unique (user, key) index until the first request commits and then replays
+    its stored response instead of inserting again. Failed requests roll the
+    key back and can be retried. Keys expire after IDEMPOTENCY_KEY_TTL_HOURS.
+    """
+    idempotency_header = 'Idempotency-Key'
+
+    def request_fingerprint(self, request):
+        payload = json.dumps(request.data, sort_keys=True, default=str)
+        return hashlib.sha256(f"{request.method}:{request.path}:{payload}".encode()).hexdigest()
+
+    def replay(self, record, fingerprint):
+        if record.fingerprint != fingerprint:
+            return Response(
+                {'error': 'Idempotency-Key was already used for a different request.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return Response(
+            record.response_body,
+            status=record.response_status,
+            headers={'Idempotent-Replayed': 'true'},
+        )
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(self.idempotency_header, '')[:255]
+        if not key:
+            return super().create(request, *args, **kwargs)
+
+        fingerprint = self.request_fingerprint(request)
+        now = timezone.now()
+        ttl = timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+        IdempotencyKey.objects.filter(user=request.user, key=key, expires_at__lte=now).delete()
+
+        with transaction.atomic():
+            record, created = IdempotencyKey.objects.get_or_create(
+                user=request.user,
+                key=key,
+                defaults={
+                    'fingerprint': fingerprint,
+                    'response_status': status.HTTP_202_ACCEPTED,
+                    'expires_at': now + ttl,
+                },
+            )
+            if not created:
+                return self.replay(record, fingerprint)
+
+            response = super().create(request, *args, **kwargs)
+            record.response_status = response.status_code
+            record.response_body = json.loads(JSONRenderer().render(response.data) or 'null')
+            record.save(update_fields=['response_status', 'response_body'])
+        return response
@@ -10,7 +10,50 @@ def get_default_list():
 def get_default_dict():
     return {}
 
-class Board(models.Model):
+class VersionedModel(models.Model):
+    """
+    Adds a row version that is bumped on every save. It backs the ETag /
+    If-Match optimistic concurrency checks in the detail views.
+    """
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        bumped = self.pk is not None and not kwargs.get('force_insert')
+        if bumped:
+            # Incremented in the UPDATE itself, so a save made from a stale copy
+            # still moves the version past every write it overwrites
+            self.version = models.F('version') + 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'version'}
+        super().save(*args, **kwargs)
+        if bumped:
+            self.refresh_from_db(fields=['version'])
+
+
+class CollaborativeDescriptionMixin:
+    """Remembers the description as loaded so saves can detect a rewrite (see boards/collab.py)"""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'description' in instance.__dict__ and 'description_revision' in instance.__dict__:
+            instance._loaded_description = instance.description or ''
+            instance._loaded_description_revision = instance.description_revision
+        return instance
+
+
+class BoardManager(models.Manager):
+    """Leaves out boards that were deleted and wait for the background purge (boards/deletion.py)"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class Board(CollaborativeDescriptionMixin, VersionedModel):
     STATUS_CHOICES = [
         ('planning', 'Planning'),
         ('active', 'Active'),
@@ -19,6 +62,7 @@ class Board(models.Model):
 
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
+    description_revision = models.PositiveIntegerField(default=0)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='boards')
     members = models.ManyToManyField(User, related_name='member_boards', blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='planning')
@@ -31,10 +75,22 @@ class Board(models.Model):
     cover_image = models.URLField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = BoardManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Currency as loaded, so saves can tell that it changed (see budget/signals.py)
+        if 'currency' in instance.__dict__:
+            instance._loaded_currency = instance.currency
+        return instance
+
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
         if self.owner not in self.members.all():
@@ -45,7 +101,7 @@ class Board(models.Model):
         ordering = ['-created_at']
 
 
-class List(models.Model):
+class List(VersionedModel):
     board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='lists')
     title = models.CharField(max_length=200)
     color = models.CharField(max_length=20, default='blue')
@@ -67,7 +123,7 @@ class List(models.Model):
         ordering = ['position']
 
 
-class Card(models.Model):
+class Card(CollaborativeDescriptionMixin, VersionedModel):
     CATEGORY_CHOICES = [
         ('flight', 'Flight'),
         ('hotel', 'Hotel'),
@@ -80,6 +136,7 @@ class Card(models.Model):
     list = models.ForeignKey(List, on_delete=models.CASCADE, related_name='cards')
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
+    description_revision = models.PositiveIntegerField(default=0)
     budget = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     people_number = models.PositiveIntegerField(default=1)
     tags = models.JSONField(default=get_default_list)  # Changed to callable
@@ -104,4 +161,123 @@ class Card(models.Model):
 
     class Meta:
         db_table = 'cards'
-        ordering = ['position', '-created_at']
\ No newline at end of file
+        ordering = ['position', '-created_at']
+        indexes = [
+            models.Index(fields=['due_date'], condition=models.Q(due_date__isnull=False), name='card_due_date_idx'),
+        ]
+
+
+class DescriptionOperation(models.Model):
+    """One operational edit of a board or card description (see boards/collab.py)"""
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, null=True, blank=True, related_name='description_ops')
+    card = models.ForeignKey(Card, on_delete=models.CASCADE, null=True, blank=True, related_name='description_ops')
+    revision = models.PositiveIntegerField()
+    ops = models.JSONField(default=get_default_list)
+    author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        target = f"card {self.card_id}" if self.card_id else f"board {self.board_id}"
+        return f"{target} r{self.revision}"
+
+    class Meta:
+        db_table = 'description_operations'
+        ordering = ['revision']
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'revision'], name='unique_board_description_revision'),
+            models.UniqueConstraint(fields=['card', 'revision'], name='unique_card_description_revision'),
+        ]
+
+
+class DueDateReminder(models.Model):
+    """A due-date reminder already sent to one assignee (see boards/reminders.py)"""
+    card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name='due_date_reminders')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    horizon_days = models.PositiveSmallIntegerField()
+    # The due date the reminder was for; moving the due date makes the card eligible again
+    due_date = models.DateField(db_index=True)
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"card {self.card_id} to {self.user_id}: {self.horizon_days}d before {self.due_date}"
+
+    class Meta:
+        db_table = 'due_date_reminders'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['card', 'user', 'horizon_days', 'due_date'], name='unique_due_date_reminder'
+            ),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """Stored first response for an Idempotency-Key, replayed to retried POSTs"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField()
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key} ({self.user_id})"
+
+    class Meta:
+        db_table = 'idempotency_keys'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_user_idempotency_key'),
+        ]
+
+
+class DeletionJob(models.Model):
+    """Background purge of a deleted board or account, resumed from `step` (see boards/deletion.py)"""
+    BOARD = 'board'
+    USER = 'user'
+    KIND_CHOICES = [
+        (BOARD, 'Board'),
+        (USER, 'User'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # Number of purge steps completed; rows of the current step are deleted in batches
+    step = models.PositiveSmallIntegerField(default=0)
+    purged_rows = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"delete {self.kind} {self.object_id} (step {self.step})"
+
+    class Meta:
+        db_table = 'deletion_jobs'
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(finished_at__isnull=True), name='deletion_job_pending_idx'),
+        ]
+
+
+class BoardArchive(models.Model):
+    """
+    A completed board moved out of the hot tables: its rows are kept as one
+    compressed JSON document and restored with bulk inserts (see boards/archive.py)
+    """
+    board_id = models.BigIntegerField(unique=True)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_boards')
+    members = models.ManyToManyField(User, related_name='member_archived_boards', db_table='board_archive_members')
+    title = models.CharField(max_length=200)
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+    # zlib-compressed JSON: {table: [row, ...]} with the original primary keys
+    document = models.BinaryField()
+    row_count = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.title} (archived)"
+
+    class Meta:
+        db_table = 'board_archives'
+        ordering = ['-archived_at']
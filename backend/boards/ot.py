@@ -0,0 +1,156 @@
+"""
+Plain-text operational transformation.
+
+An operation is a list of components that walks the whole base document:
+a positive int retains that many characters, a string inserts it and a
+negative int deletes that many characters, e.g. [5, "abc", -2, 10]. This is
+the same wire format ot.js uses, so the frontend can use an existing client.
+"""
+
+
+class OperationError(ValueError):
+    """The operation is malformed or does not fit the document"""
+
+
+def _is_retain(component):
+    return isinstance(component, int) and not isinstance(component, bool) and component > 0
+
+
+def _is_delete(component):
+    return isinstance(component, int) and not isinstance(component, bool) and component < 0
+
+
+def _is_insert(component):
+    return isinstance(component, str)
+
+
+def _push(ops, component):
+    """Append component to ops, merging it with the previous one when possible"""
+    if component == 0 or component == '':
+        return
+    if ops:
+        last = ops[-1]
+        if _is_retain(last) and _is_retain(component):
+            ops[-1] = last + component
+            return
+        if _is_delete(last) and _is_delete(component):
+            ops[-1] = last + component
+            return
+        if _is_insert(last) and _is_insert(component):
+            ops[-1] = last + component
+            return
+        # Keep inserts before deletes so equivalent operations look the same
+        if _is_delete(last) and _is_insert(component):
+            if len(ops) > 1 and _is_insert(ops[-2]):
+                ops[-2] = ops[-2] + component
+            else:
+                ops.insert(len(ops) - 1, component)
+            return
+    ops.append(component)
+
+
+def normalize(ops):
+    if not isinstance(ops, list):
+        raise OperationError("An operation must be a list of components")
+    result = []
+    for component in ops:
+        if not (_is_retain(component) or _is_delete(component) or _is_insert(component) or component == 0):
+            raise OperationError(f"Invalid component: {component!r}")
+        _push(result, component)
+    return result
+
+
+def base_length(ops):
+    return sum(abs(c) for c in ops if not _is_insert(c))
+
+
+def target_length(ops):
+    return sum(c if _is_retain(c) else len(c) for c in ops if not _is_delete(c))
+
+
+def is_noop(ops):
+    return all(_is_retain(c) for c in ops)
+
+
+def apply(text, ops):
+    if base_length(ops) != len(text):
+        raise OperationError("Operation base length does not match the document")
+    parts = []
+    index = 0
+    for component in ops:
+        if _is_retain(component):
+            parts.append(text[index:index + component])
+            index += component
+        elif _is_insert(component):
+            parts.append(component)
+        else:
+            index -= component
+    return ''.join(parts)
+
+
+def transform(op1, op2):
+    """
+    Transform two operations made against the same document so that
+    apply(apply(text, op1), op2') == apply(apply(text, op2), op1').
+    Returns (op1', op2'). On a tie, op1's insert is placed first.
+    """
+    if base_length(op1) != base_length(op2):
+        raise OperationError("Both operations must have the same base length")
+
+    op1_prime, op2_prime = [], []
+    ops1, ops2 = list(op1), list(op2)
+    i1 = i2 = 0
+    c1 = ops1[i1] if ops1 else None
+    c2 = ops2[i2] if ops2 else None
+
+    def next1():
+        nonlocal i1
+        i1 += 1
+        return ops1[i1] if i1 < len(ops1) else None
+
+    def next2():
+        nonlocal i2
+        i2 += 1
+        return ops2[i2] if i2 < len(ops2) else None
+
+    while c1 is not None or c2 is not None:
+        if _is_insert(c1):
+            _push(op1_prime, c1)
+            _push(op2_prime, len(c1))
+            c1 = next1()
+            continue
+        if _is_insert(c2):
+            _push(op1_prime, len(c2))
+            _push(op2_prime, c2)
+            c2 = next2()
+            continue
+        if c1 is None or c2 is None:
+            raise OperationError("Operations do not cover the same document")
+
+        if _is_retain(c1) and _is_retain(c2):
+            size = min(c1, c2)
+            _push(op1_prime, size)
+            _push(op2_prime, size)
+        elif _is_delete(c1) and _is_delete(c2):
+            # Both deleted the same text; nothing left to do for this span
+            size = min(-c1, -c2)
+        elif _is_delete(c1) and _is_retain(c2):
+            size = min(-c1, c2)
+            _push(op1_prime, -size)
+        else:  # retain in op1, delete in op2
+            size = min(c1, -c2)
+            _push(op2_prime, -size)
+
+        c1 = _shrink(c1, size) or next1()
+        c2 = _shrink(c2, size) or next2()
+
+    return op1_prime, op2_prime
+
+
+def _shrink(component, size):
+    """Consume size characters of a retain/delete component; None when used up"""
+    if _is_retain(component):
+        remaining = component - size
+    else:
+        remaining = component + size
+    return remaining or None
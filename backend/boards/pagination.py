@@ -0,0 +1,51 @@
+from django.db.models import Prefetch, Q
+from rest_framework.exceptions import ValidationError
+from .models import Card
+
+# Deterministic card order used for windowing; position can repeat, id breaks ties
+CARD_WINDOW_ORDERING = ('position', '-id')
+MAX_CARDS_PER_LIST = 200
+
+
+def parse_card_limit(value, param='cards_per_list'):
+    """Validate a per-list card limit query param, capped at MAX_CARDS_PER_LIST"""
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"{param} must be a positive integer")
+    if limit < 1:
+        raise ValidationError(f"{param} must be a positive integer")
+    return min(limit, MAX_CARDS_PER_LIST)
+
+
+def encode_card_cursor(card):
+    """Build an opaque continuation cursor from the last card returned"""
+    return f"{card.position}:{card.id}"
+
+
+def decode_card_cursor(value):
+    try:
+        position, pk = value.split(':')
+        return int(position), int(pk)
+    except (AttributeError, ValueError):
+        raise ValidationError("Invalid cursor")
+
+
+def windowed_cards_prefetch(limit, lookup='lists__cards'):
+    """
+    Prefetch at most limit + 1 cards per list into List.windowed_cards. Django
+    turns a sliced prefetch queryset into a ROW_NUMBER() window query
+    partitioned by list, so the cost is bounded by the window size instead of
+    the number of cards on the board. The extra card only signals that a
+    continuation cursor is needed.
+    """
+    queryset = Card.objects.prefetch_related('assigned_members').order_by(*CARD_WINDOW_ORDERING)
+    return Prefetch(lookup, queryset=queryset[:limit + 1], to_attr='windowed_cards')
+
+
+def cards_after(queryset, cursor):
+    """Keyset filter returning the cards that follow cursor in CARD_WINDOW_ORDERING"""
+    position, pk = decode_card_cursor(cursor)
+    return queryset.filter(
+        Q(position__gt=position) | Q(position=position, id__lt=pk)
+    ).order_by(*CARD_WINDOW_ORDERING)
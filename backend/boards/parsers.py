@@ -0,0 +1,6 @@
+from rest_framework.parsers import JSONParser
+
+
+class JSONPatchParser(JSONParser):
+    """Parses RFC 6902 JSON Patch request bodies"""
+    media_type = 'application/json-patch+json'
@@ -1,4 +1,5 @@
 # boards/permissions.py
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import BasePermission
 from django.shortcuts import get_object_or_404
 from .models import Board
@@ -20,6 +21,10 @@ class IsBoardOwnerOrMember(BasePermission):
             board = obj.list.board
         else:
             return False
+
+        # Rows of a deleted board stay reachable by primary key until purged
+        if board.deleted_at is not None:
+            raise NotFound()
             
         # Check for share query param
         share = request.query_params.get('share')
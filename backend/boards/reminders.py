@@ -0,0 +1,76 @@
+"""
+Due-date reminders for assigned cards.
+
+Each run reads the card assignments due between today and the largest
+horizon (an index range scan on cards.due_date) and the reminders already
+sent for that date range, so its cost follows the number of cards coming
+due, not the size of the cards table. Every assignee gets at most one
+reminder per horizon and due date, for the tightest horizon the card is
+within; a run sends one notification per member listing their cards and
+records the reminders in the same transaction, so repeated runs are no-ops.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from users.outbox import notify_many
+from .models import Card, DueDateReminder
+
+MAX_LISTED_CARDS = 10
+
+
+def reminder_horizons():
+    return sorted(getattr(settings, 'DUE_DATE_REMINDER_HORIZONS', [7, 1, 0]))
+
+
+def describe_due(days_left):
+    if days_left == 0:
+        return "today"
+    if days_left == 1:
+        return "tomorrow"
+    return f"in {days_left} days"
+
+
+def send_due_date_reminders(today=None, horizons=None):
+    """Send the reminders that are due; returns (notified users, reminders recorded)"""
+    today = today or timezone.localdate()
+    horizons = sorted(horizons) if horizons else reminder_horizons()
+    last_day = today + timedelta(days=horizons[-1])
+
+    assignments = (
+        Card.assigned_members.through.objects
+        .filter(card__due_date__gte=today, card__due_date__lte=last_day, card__list__board__deleted_at__isnull=True)
+        .values_list('card_id', 'user_id', 'card__due_date', 'card__title', 'card__list__board__title')
+    )
+    already_sent = set(
+        DueDateReminder.objects.filter(due_date__gte=today, due_date__lte=last_day)
+        .values_list('card_id', 'user_id', 'horizon_days', 'due_date')
+    )
+
+    reminders = []
+    cards_by_user = defaultdict(list)
+    for card_id, user_id, due_date, title, board_title in assignments:
+        days_left = (due_date - today).days
+        horizon = next(h for h in horizons if days_left <= h)
+        if (card_id, user_id, horizon, due_date) in already_sent:
+            continue
+        reminders.append(DueDateReminder(card_id=card_id, user_id=user_id, horizon_days=horizon, due_date=due_date))
+        cards_by_user[user_id].append((days_left, title, board_title))
+
+    events = []
+    for user_id, cards in cards_by_user.items():
+        cards.sort()
+        if len(cards) == 1:
+            days_left, title, board_title = cards[0]
+            message = f"'{title}' in board '{board_title}' is due {describe_due(days_left)}."
+        else:
+            listed = ', '.join(f"'{title}' ({describe_due(days_left)})" for days_left, title, _ in cards[:MAX_LISTED_CARDS])
+            more = len(cards) - MAX_LISTED_CARDS
+            message = f"{len(cards)} cards are due soon: {listed}" + (f" and {more} more." if more > 0 else ".")
+        events.append((user_id, "Upcoming due dates", message, 'due_date_reminder', None))
+
+    with transaction.atomic():
+        DueDateReminder.objects.bulk_create(reminders, ignore_conflicts=True, batch_size=1000)
+        notify_many(events)
+    return len(events), len(reminders)
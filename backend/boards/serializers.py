@@ -1,7 +1,11 @@
 # boards/serializers.py
 from rest_framework import serializers
-from .models import Board, List, Card
+from .models import Board, BoardArchive, List, Card, DeletionJob
+from .pagination import encode_card_cursor
+from .deletion import job_progress
 from users.serializers import UserSerializer
+from maps.geo import point_from_json
+from budget.currency import unconvertible_expenses
 from django.utils import timezone
 from datetime import datetime
 
@@ -15,6 +19,29 @@ class CardMoveSerializer(serializers.Serializer):
             raise serializers.ValidationError("Position must be non-negative")
         return value
 
+class SubtaskSerializer(serializers.Serializer):
+    """A single entry of Card.subtasks"""
+    title = serializers.CharField(max_length=200)
+    completed = serializers.BooleanField(default=False)
+
+class AttachmentSerializer(serializers.Serializer):
+    """A single entry of Card.attachments"""
+    name = serializers.CharField(max_length=255)
+    size = serializers.CharField(max_length=50, allow_blank=True, default='')
+
+class CardItemReorderSerializer(serializers.Serializer):
+    """Serializer for moving one subtask/attachment to another index"""
+    from_index = serializers.IntegerField(min_value=0)
+    to_index = serializers.IntegerField(min_value=0)
+
+class DescriptionOperationSerializer(serializers.Serializer):
+    """An operational edit of a description, made against a known revision"""
+    revision = serializers.IntegerField(min_value=0, help_text="Revision the operation was made against")
+    ops = serializers.ListField(
+        child=serializers.JSONField(),
+        help_text="Components: positive int = retain, string = insert, negative int = delete"
+    )
+
 class CardSerializer(serializers.ModelSerializer):
     assigned_members = UserSerializer(many=True, read_only=True)
 
@@ -23,19 +50,47 @@ class CardSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'list', 'title', 'description', 'budget', 'people_number', 'tags',
             'due_date', 'assigned_members', 'subtasks', 'attachments', 'location',
-            'position', 'created_at', 'updated_at', 'category'
+            'position', 'created_at', 'updated_at', 'category', 'version',
+            'description_revision'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'list']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'list', 'version', 'description_revision']
+
+    def validate_location(self, value):
+        # An empty location clears it; otherwise it needs a point for the map
+        if value and point_from_json(value) is None:
+            raise serializers.ValidationError("Location needs numeric lat (-90..90) and lng (-180..180).")
+        return value
 
 class ListSerializer(serializers.ModelSerializer):
-    cards = CardSerializer(many=True, read_only=True)
+    cards = serializers.SerializerMethodField()
 
     class Meta:
         model = List
         fields = [
-            'id', 'board', 'title', 'color', 'position', 'cards', 'created_at', 'updated_at'
+            'id', 'board', 'title', 'color', 'position', 'cards', 'created_at', 'updated_at',
+            'version'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'board']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'board', 'version']
+
+    def get_cards(self, obj):
+        # Boards opened with ?cards_per_list=N prefetch one extra card per list
+        # into windowed_cards; only the first N are rendered
+        windowed_cards = getattr(obj, 'windowed_cards', None)
+        if windowed_cards is not None:
+            cards = windowed_cards[:self.context['cards_per_list']]
+        else:
+            cards = obj.cards.all()
+        return CardSerializer(cards, many=True, context=self.context).data
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        windowed_cards = getattr(instance, 'windowed_cards', None)
+        if windowed_cards is not None:
+            limit = self.context['cards_per_list']
+            data['next_cards_cursor'] = (
+                encode_card_cursor(windowed_cards[limit - 1]) if len(windowed_cards) > limit else None
+            )
+        return data
 
 class BoardSerializer(serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
@@ -56,9 +111,11 @@ class BoardSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'description', 'owner', 'members', 'status', 'budget', 'currency',
             'start_date', 'end_date', 'is_favorite', 'tags', 'cover_image', 'lists',
-            'created_at', 'updated_at'
+            'created_at', 'updated_at', 'version', 'description_revision'
+        ]
+        read_only_fields = [
+            'id', 'owner', 'members', 'lists', 'created_at', 'updated_at', 'version', 'description_revision'
         ]
-        read_only_fields = ['id', 'owner', 'members', 'lists', 'created_at', 'updated_at']
 
     def validate_budget(self, value):
         try:
@@ -69,7 +126,15 @@ class BoardSerializer(serializers.ModelSerializer):
     def validate_currency(self, value):
         if not value or len(value.strip()) != 3:
             raise serializers.ValidationError("Currency must be a 3-letter code (e.g., USD)")
-        return value.strip().upper()
+        value = value.strip().upper()
+        if self.instance is not None and value != self.instance.currency:
+            # Every expense gets converted into the new currency
+            missing = unconvertible_expenses(self.instance, value).count()
+            if missing:
+                raise serializers.ValidationError(
+                    f"No exchange rate to convert {missing} expenses to {value}; load rates first."
+                )
+        return value
 
     def validate_cover_image(self, value):
         if value and not value.startswith(('http://', 'https://')):
@@ -108,4 +173,38 @@ class BoardSerializer(serializers.ModelSerializer):
 
 class BoardMemberSerializer(serializers.Serializer):
     """Serializer for adding/removing board members"""
-    user_id = serializers.IntegerField(help_text="ID of the user to add/remove as a board member")
\ No newline at end of file
+    user_id = serializers.IntegerField(help_text="ID of the user to add/remove as a board member")
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+    """Progress of the background purge of a deleted board or account"""
+    status = serializers.SerializerMethodField()
+    steps = serializers.SerializerMethodField()
+    current_step = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DeletionJob
+        fields = ['id', 'kind', 'object_id', 'status', 'step', 'steps', 'current_step',
+                  'purged_rows', 'created_at', 'updated_at', 'finished_at']
+        read_only_fields = fields
+
+    def get_progress(self, obj):
+        if not hasattr(obj, '_progress'):
+            obj._progress = job_progress(obj)
+        return obj._progress
+
+    def get_status(self, obj):
+        return 'done' if obj.finished_at else 'pending'
+
+    def get_steps(self, obj):
+        return self.get_progress(obj)[1]
+
+    def get_current_step(self, obj):
+        return self.get_progress(obj)[2]
+
+
+class BoardArchiveSerializer(serializers.ModelSerializer):
+    """An archived board as listed to its members; restore it to see its contents"""
+    class Meta:
+        model = BoardArchive
+        fields = ['board_id', 'title', 'owner', 'start_date', 'end_date', 'row_count', 'archived_at']
+        read_only_fields = fields
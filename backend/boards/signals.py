@@ -1,15 +1,18 @@
 from django.db.models.signals import post_save, m2m_changed
 from django.dispatch import receiver
 from .models import Board, Card
-from users.models import Notification
+from .collab import sync_saved_description
+from users.outbox import notify
 
 @receiver(post_save, sender=Board)
 def create_board_notification(sender, instance, created, **kwargs):
     if created:
-        Notification.objects.create(
-            user=instance.owner,
+        notify(
+            [instance.owner_id],
             title="New board created",
-            message=f"Your new board '{instance.title}' has been created."
+            message=f"Your new board '{instance.title}' has been created.",
+            kind='board_created',
+            board=instance,
         )
 
 @receiver(post_save, sender=Board)
@@ -25,11 +28,18 @@ def create_default_lists(sender, instance, created, **kwargs):
 
 @receiver(m2m_changed, sender=Card.assigned_members.through)
 def card_assigned_notification(sender, instance, action, pk_set, **kwargs):
-    if action == 'post_add':
-        for pk in pk_set:
-            user = instance.assigned_members.get(pk=pk)
-            Notification.objects.create(
-                user=user,
-                title="Task assigned to you",
-                message=f"You have been assigned to the task '{instance.title}' in board '{instance.list.board.title}'."
-            )
\ No newline at end of file
+    if action == 'post_add' and pk_set:
+        notify(
+            pk_set,
+            title="Task assigned to you",
+            message=f"You have been assigned to the task '{instance.title}' in board '{instance.list.board.title}'.",
+            kind='card_assigned',
+            board=instance.list.board_id,
+        )
+
+@receiver(post_save, sender=Board)
+@receiver(post_save, sender=Card)
+def sync_collaborative_description(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'description' not in update_fields):
+        return
+    sync_saved_description(instance)
@@ -1,3 +1,428 @@
-from django.test import TestCase
+import json
+from datetime import date, timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from budget.models import BudgetTotal, Expense
+from maps.models import Location
+from users.models import Notification, NotificationCounter
+from .deletion import purge_batch
+from .mixins import version_etag
+from .models import Board, BoardArchive, List, Card, DueDateReminder
+from .reminders import send_due_date_reminders
 
-# Create your tests here.
+User = get_user_model()
+
+
+class BoardAPITestCase(APITestCase):
+    """Shared fixtures: an owner with one board and its default lists."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(title='Lisbon', owner=self.owner)
+        self.list = self.board.lists.get(position=0)
+        self.client.force_authenticate(user=self.owner)
+
+
+class WindowedBoardDetailTest(BoardAPITestCase):
+    """Test cases for ?cards_per_list windowing on board detail."""
+
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            Card.objects.create(list=self.list, title=f'Card {i}', position=i + 1)
+
+    def test_board_detail_without_window_returns_all_cards(self):
+        response = self.client.get(reverse('board-detail', args=[self.board.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first = response.data['lists'][0]
+        self.assertEqual(len(first['cards']), 5)
+        self.assertNotIn('next_cards_cursor', first)
+
+    def test_board_detail_window_and_continuation(self):
+        url = reverse('board-detail', args=[self.board.pk])
+        response = self.client.get(url, {'cards_per_list': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first = response.data['lists'][0]
+        self.assertEqual([c['title'] for c in first['cards']], ['Card 0', 'Card 1'])
+        self.assertIsNotNone(first['next_cards_cursor'])
+        self.assertIsNone(response.data['lists'][1]['next_cards_cursor'])
+
+        cards_url = reverse('list-cards', args=[self.board.pk, self.list.pk])
+        response = self.client.get(cards_url, {'after': first['next_cards_cursor'], 'limit': 2})
+        self.assertEqual([c['title'] for c in response.data['results']], ['Card 2', 'Card 3'])
+        response = self.client.get(cards_url, {'after': response.data['next_cursor'], 'limit': 2})
+        self.assertEqual([c['title'] for c in response.data['results']], ['Card 4'])
+        self.assertIsNone(response.data['next_cursor'])
+
+    def test_invalid_cards_per_list(self):
+        response = self.client.get(reverse('board-detail', args=[self.board.pk]), {'cards_per_list': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CardJSONItemsTest(BoardAPITestCase):
+    """Test cases for subtask/attachment sub-resources and JSON Patch mode."""
+
+    def setUp(self):
+        super().setUp()
+        self.card = Card.objects.create(
+            list=self.list,
+            title='Flight',
+            subtasks=[{'title': 'Book', 'completed': False}, {'title': 'Check in', 'completed': False}],
+        )
+        self.args = [self.board.pk, self.list.pk, self.card.pk]
+
+    def test_add_toggle_reorder_remove_subtask(self):
+        response = self.client.post(reverse('card-subtasks', args=self.args), {'title': 'Pack'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['subtasks'][-1], {'title': 'Pack', 'completed': False})
+
+        self.client.post(reverse('card-subtask-toggle', args=self.args + [0]))
+        self.client.post(reverse('card-subtask-reorder', args=self.args), {'from_index': 2, 'to_index': 0}, format='json')
+        response = self.client.delete(reverse('card-subtask-detail', args=self.args + [2]))
+        self.assertEqual(response.data['subtasks'], [
+            {'title': 'Pack', 'completed': False},
+            {'title': 'Book', 'completed': True},
+        ])
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.subtasks, response.data['subtasks'])
+
+    def test_legacy_items_and_extra_keys(self):
+        Card.objects.filter(pk=self.card.pk).update(subtasks=['Legacy', {'title': 'Book', 'completed': False, 'id': 7}])
+        response = self.client.post(reverse('card-subtask-toggle', args=self.args + [0]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(reverse('card-subtask-detail', args=self.args + [0]), {'title': 'x'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.patch(reverse('card-subtask-detail', args=self.args + [1]), {'completed': True}, format='json')
+        self.assertEqual(response.data['subtasks'][1], {'title': 'Book', 'completed': True, 'id': 7})
+        response = self.client.post(reverse('card-subtasks', args=self.args), {'title': 'Pack', 'id': 8}, format='json')
+        self.assertEqual(response.data['subtasks'][-1], {'title': 'Pack', 'completed': False, 'id': 8})
+
+    def test_subtask_index_out_of_range(self):
+        response = self.client.post(reverse('card-subtask-toggle', args=self.args + [5]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_json_patch_mode(self):
+        url = reverse('list-card-detail', args=self.args)
+        patch = [
+            {'op': 'replace', 'path': '/subtasks/1/completed', 'value': True},
+            {'op': 'add', 'path': '/attachments/-', 'value': {'name': 'ticket.pdf', 'size': '1MB'}},
+        ]
+        response = self.client.generic('PATCH', url, json.dumps(patch), content_type='application/json-patch+json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['subtasks'][1]['completed'])
+        self.assertEqual(response.data['attachments'], [{'name': 'ticket.pdf', 'size': '1MB'}])
+
+    def test_json_patch_rejects_other_fields_and_failed_tests(self):
+        url = reverse('list-card-detail', args=self.args)
+        patch = [{'op': 'replace', 'path': '/title', 'value': 'Hacked'}]
+        response = self.client.generic('PATCH', url, json.dumps(patch), content_type='application/json-patch+json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        patch = [{'op': 'test', 'path': '/subtasks/0/completed', 'value': True}]
+        response = self.client.generic('PATCH', url, json.dumps(patch), content_type='application/json-patch+json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_json_patch_validates_items(self):
+        url = reverse('list-card-detail', args=self.args)
+        for patch in [
+            [{'op': 'add', 'path': '/subtasks/-', 'value': 42}],
+            [{'op': 'add', 'path': '/subtasks/-', 'value': {'completed': True}}],
+            [{'op': 'add', 'path': '/attachments/-', 'value': {'name': 'x' * 300}}],
+        ]:
+            response = self.client.generic('PATCH', url, json.dumps(patch), content_type='application/json-patch+json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, patch)
+
+
+class OptimisticConcurrencyTest(BoardAPITestCase):
+    """Test cases for ETag / If-Match preconditions on detail views."""
+
+    def setUp(self):
+        super().setUp()
+        self.card = Card.objects.create(list=self.list, title='Hotel', position=1)
+        self.url = reverse('list-card-detail', args=[self.board.pk, self.list.pk, self.card.pk])
+
+    def test_matching_if_match_updates_and_bumps_version(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.patch(self.url, {'title': 'Hostel'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['version'], self.card.version + 1)
+
+    def test_stale_if_match_returns_current_representation(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.patch(self.url, {'title': 'Hostel'}, format='json')
+        response = self.client.patch(self.url, {'title': 'Airbnb'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(response.data['current']['title'], 'Hostel')
+
+        response = self.client.delete(self.url, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertTrue(Card.objects.filter(pk=self.card.pk).exists())
+
+    def test_write_without_if_match_from_stale_copy_moves_version(self):
+        stale = Card.objects.get(pk=self.card.pk)
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.put(self.url, {'title': 'Hostel'}, format='json', HTTP_IF_MATCH=etag)
+        etag = response['ETag']
+        # A write without If-Match, made from a copy loaded before that PUT
+        stale.title = 'Airbnb'
+        stale.save()
+        self.assertNotEqual(version_etag(stale), etag)
+        response = self.client.put(self.url, {'title': 'Camping'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(response.data['current']['title'], 'Airbnb')
+
+    def test_board_precondition(self):
+        url = reverse('board-detail', args=[self.board.pk])
+        response = self.client.delete(url, HTTP_IF_MATCH='"999"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        response = self.client.delete(url, HTTP_IF_MATCH=self.client.get(url)['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+
+class CollaborativeDescriptionTest(BoardAPITestCase):
+    """Test cases for operational description edits."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.board.description = 'Trip to Lisbon'
+        self.board.save()
+        self.ops_url = reverse('board-description-ops', args=[self.board.pk])
+
+    def test_concurrent_edits_are_merged(self):
+        state = self.client.get(reverse('board-description', args=[self.board.pk])).data
+        self.assertEqual(state['text'], 'Trip to Lisbon')
+        base = state['revision']
+
+        # Two clients edit the same revision: one prepends, one appends
+        first = self.client.post(self.ops_url, {'revision': base, 'ops': ['Our ', 14]}, format='json')
+        second = self.client.post(self.ops_url, {'revision': base, 'ops': [14, ' and Porto']}, format='json')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, {'revision': base + 2, 'ops': [18, ' and Porto']})
+
+        state = self.client.get(reverse('board-description', args=[self.board.pk])).data
+        self.assertEqual(state['text'], 'Our Trip to Lisbon and Porto')
+
+        deltas = self.client.get(self.ops_url, {'since': base + 1}).data['operations']
+        self.assertEqual([d['ops'] for d in deltas], [[18, ' and Porto']])
+
+    def test_snapshot_is_debounced(self):
+        with self.settings(COLLAB_SNAPSHOT_DEBOUNCE_SECONDS=3600):
+            self.client.post(self.ops_url, {'revision': 0, 'ops': [14, '!']}, format='json')
+        self.board.refresh_from_db()
+        self.assertEqual(self.board.description, 'Trip to Lisbon')
+
+        with self.settings(COLLAB_SNAPSHOT_DEBOUNCE_SECONDS=0):
+            call_command('snapshot_descriptions', stdout=StringIO())
+        self.board.refresh_from_db()
+        self.assertEqual(self.board.description, 'Trip to Lisbon!')
+        self.assertEqual(self.board.description_revision, 1)
+
+    def test_regular_save_is_recorded_as_replacement(self):
+        self.client.post(self.ops_url, {'revision': 0, 'ops': [14, '!']}, format='json')
+        board = Board.objects.get(pk=self.board.pk)
+        board.description = 'Porto'
+        board.save()
+        response = self.client.post(self.ops_url, {'revision': 1, 'ops': [15, '?']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        state = self.client.get(reverse('board-description', args=[self.board.pk])).data
+        self.assertEqual(state['text'], 'Porto?')
+
+    def test_invalid_operation(self):
+        response = self.client.post(self.ops_url, {'revision': 0, 'ops': [99, 'x']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class IdempotencyKeyTest(BoardAPITestCase):
+    """Test cases for Idempotency-Key on create endpoints."""
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('list-cards', args=[self.board.pk, self.list.pk])
+
+    def test_retry_replays_first_response(self):
+        first = self.client.post(self.url, {'title': 'Museum'}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        retry = self.client.post(self.url, {'title': 'Museum'}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Card.objects.filter(title='Museum').count(), 1)
+
+    def test_key_reuse_with_different_payload(self):
+        self.client.post(self.url, {'title': 'Museum'}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        response = self.client.post(self.url, {'title': 'Beach'}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_failed_request_does_not_consume_key(self):
+        response = self.client.post(self.url, {}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, {}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DueDateReminderTest(BoardAPITestCase):
+    """Test cases for the due-date reminder scheduler."""
+
+    def setUp(self):
+        super().setUp()
+        self.member = User.objects.create_user(username='member', email='member@example.com', password='testpass123')
+        self.board.members.add(self.member)
+        self.today = date(2026, 5, 1)
+        self.soon = Card.objects.create(list=self.list, title='Book hotel', position=1,
+                                        due_date=self.today + timedelta(days=1))
+        self.later = Card.objects.create(list=self.list, title='Buy tickets', position=2,
+                                         due_date=self.today + timedelta(days=5))
+        Card.objects.create(list=self.list, title='Pack', position=3, due_date=self.today + timedelta(days=30))
+        self.soon.assigned_members.add(self.owner, self.member)
+        self.later.assigned_members.add(self.member)
+
+    def reminders(self):
+        return Notification.objects.filter(kind='due_date_reminder')
+
+    def run_reminders(self, today):
+        with self.captureOnCommitCallbacks(execute=True):
+            return send_due_date_reminders(today=today, horizons=[7, 1, 0])
+
+    def test_one_notification_per_member(self):
+        self.assertEqual(self.run_reminders(self.today), (2, 3))
+        self.assertEqual(self.reminders().filter(user=self.owner).count(), 1)
+        message = self.reminders().get(user=self.member).message
+        self.assertIn('Book hotel', message)
+        self.assertIn('Buy tickets', message)
+
+    def test_repeated_runs_are_idempotent(self):
+        self.run_reminders(self.today)
+        self.assertEqual(self.run_reminders(self.today), (0, 0))
+        self.assertEqual(self.reminders().count(), 2)
+
+    def test_tighter_horizon_and_moved_due_date_remind_again(self):
+        self.run_reminders(self.today)
+        # Next day 'Book hotel' falls into the 0-day horizon
+        self.assertEqual(self.run_reminders(self.today + timedelta(days=1)), (2, 2))
+        self.later.due_date = self.today + timedelta(days=6)
+        self.later.save()
+        self.assertEqual(self.run_reminders(self.today + timedelta(days=1)), (1, 1))
+        self.assertEqual(DueDateReminder.objects.filter(card=self.later).count(), 2)
+
+    def test_deleted_board_sends_no_reminders(self):
+        self.client.delete(reverse('board-detail', args=[self.board.pk]))
+        self.assertEqual(self.run_reminders(self.today), (0, 0))
+
+
+class BoardDeletionTest(BoardAPITestCase):
+    """Test cases for background board deletion."""
+
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            card = Card.objects.create(list=self.list, title=f'Card {i}', position=i + 1)
+            card.assigned_members.add(self.owner)
+            Expense.objects.create(board=self.board, card=card, title='Taxi', amount='10.00',
+                                   category='travel', created_by=self.owner)
+        Location.objects.create(board=self.board, name='Belem', lat=38.69, lng=-9.21, created_by=self.owner)
+        self.url = reverse('board-detail', args=[self.board.pk])
+
+    def test_delete_hides_board_and_queues_purge(self):
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('boards')).data['count'], 0)
+        self.assertEqual(Card.objects.filter(list__board=self.board).count(), 5)
+
+        call_command('purge_deleted', batch_size=2, stdout=StringIO())
+        self.assertFalse(Board.all_objects.filter(pk=self.board.pk).exists())
+        self.assertFalse(Card.objects.exists())
+        self.assertFalse(Expense.objects.exists())
+        self.assertFalse(Location.objects.exists())
+        self.assertFalse(Notification.objects.filter(board_id=self.board.pk).exists())
+
+        job = self.client.get(reverse('deletion-job-detail', args=[response.data['id']])).data
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['step'], job['steps'])
+        self.assertGreater(job['purged_rows'], 20)
+
+    def test_purge_keeps_unread_counters(self):
+        Notification.objects.create(user=self.owner, board=self.board, title='Board news', message='...')
+        NotificationCounter.add({self.owner.pk: 1})
+        self.client.delete(self.url)
+        call_command('purge_deleted', batch_size=2, stdout=StringIO())
+        self.assertFalse(Notification.objects.filter(user=self.owner, is_read=False).exists())
+        self.assertEqual(NotificationCounter.objects.get(user=self.owner).unread, 0)
+
+    def test_purge_resumes_between_batches(self):
+        job_id = self.client.delete(self.url).data['id']
+        for _ in range(3):
+            job = purge_batch(batch_size=2, job_ids=[job_id])
+        self.assertIsNone(job.finished_at)
+        self.assertEqual(job.step, 0)  # assignments: 5 rows, 2 per batch
+        self.assertEqual(job.purged_rows, 5)
+
+        while job.finished_at is None:
+            job = purge_batch(batch_size=2, job_ids=[job_id])
+        self.assertFalse(List.objects.filter(board_id=self.board.pk).exists())
+        self.assertIsNone(purge_batch(job_ids=[job_id]))
+
+
+class BoardArchiveTest(BoardAPITestCase):
+    """Test cases for archiving completed boards."""
+
+    def setUp(self):
+        super().setUp()
+        self.member = User.objects.create_user(username='member', email='member@example.com', password='testpass123')
+        self.board.members.add(self.member)
+        self.board.status = 'completed'
+        self.board.end_date = date(2020, 1, 10)
+        self.board.save()
+        self.card = Card.objects.create(list=self.list, title='Hotel', position=1, due_date=date(2020, 1, 5))
+        self.card.assigned_members.add(self.member)
+        self.expense = Expense.objects.create(board=self.board, card=self.card, title='Hotel', amount='300.00',
+                                              category='lodging', created_by=self.owner)
+        Location.objects.create(board=self.board, name='Belem', lat=38.69, lng=-9.21, created_by=self.member)
+        self.active = Board.objects.create(title='Porto', owner=self.owner, status='completed')
+
+    def test_archive_and_restore(self):
+        created_at = self.card.created_at
+        call_command('archive_boards', stdout=StringIO())
+        self.assertFalse(Board.all_objects.filter(pk=self.board.pk).exists())
+        self.assertFalse(Card.objects.filter(pk=self.card.pk).exists())
+        self.assertTrue(Board.objects.filter(pk=self.active.pk).exists())
+        self.assertEqual([b['id'] for b in self.client.get(reverse('boards')).data['results']], [self.active.pk])
+
+        self.client.force_authenticate(user=self.member)
+        archived = self.client.get(reverse('board-archives')).data['results']
+        self.assertEqual([a['board_id'] for a in archived], [self.board.pk])
+        url = reverse('board-archive-restore', args=[self.board.pk])
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['id'], self.board.pk)
+        self.assertFalse(BoardArchive.objects.exists())
+        card = Card.objects.get(pk=self.card.pk)
+        self.assertEqual(card.created_at, created_at)
+        self.assertEqual(list(card.assigned_members.all()), [self.member])
+        self.assertEqual(Expense.objects.get(pk=self.expense.pk).card_id, self.card.pk)
+        self.assertEqual(BudgetTotal.objects.get(board=self.board, category='lodging').expense_count, 1)
+        self.assertEqual(set(self.board.members.all()), {self.owner, self.member})
+        self.assertEqual(self.board.lists.count(), 4)
+
+    def test_recent_and_active_boards_stay(self):
+        self.board.end_date = timezone.now().date()
+        self.board.save()
+        call_command('archive_boards', stdout=StringIO())
+        self.assertTrue(Board.objects.filter(pk=self.board.pk).exists())
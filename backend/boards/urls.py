@@ -6,7 +6,16 @@ urlpatterns = [
     # Board URLs
     path('', views.BoardListCreateView.as_view(), name='boards'),
     path('<int:pk>/', views.BoardDetailView.as_view(), name='board-detail'),
+    path('deletions/<int:pk>/', views.DeletionJobDetailView.as_view(), name='deletion-job-detail'),
+
+    # Archived boards
+    path('archived/', views.BoardArchiveListView.as_view(), name='board-archives'),
+    path('archived/<int:board_id>/restore/', views.BoardArchiveRestoreView.as_view(), name='board-archive-restore'),
     
+    # Collaborative description editing
+    path('<int:pk>/description/', views.BoardDescriptionView.as_view(), name='board-description'),
+    path('<int:pk>/description/ops/', views.BoardDescriptionOperationsView.as_view(), name='board-description-ops'),
+
     # Board Member Management
     path('<int:pk>/add-member/', views.BoardMemberAddView.as_view(), name='board-add-member'),
     path('<int:pk>/remove-member/', views.BoardMemberRemoveView.as_view(), name='board-remove-member'),
@@ -18,6 +27,18 @@ urlpatterns = [
     # Card URLs
     path('<int:board_pk>/lists/<int:list_pk>/cards/', views.CardListCreateView.as_view(), name='list-cards'),
     path('<int:board_pk>/lists/<int:list_pk>/cards/<int:pk>/', views.CardDetailView.as_view(), name='list-card-detail'),
+
+    path('<int:board_pk>/lists/<int:list_pk>/cards/<int:pk>/description/', views.CardDescriptionView.as_view(), name='card-description'),
+    path('<int:board_pk>/lists/<int:list_pk>/cards/<int:pk>/description/ops/', views.CardDescriptionOperationsView.as_view(), name='card-description-ops'),
+
+    # Card subtask / attachment sub-resources
+    path('<int:board_pk>/lists/<int:list_pk>/cards/<int:card_pk>/subtasks/', views.SubtaskListCreateView.as_view(), name='card-subtasks'),
+    path('<int:board_pk>/lists/<int:list_pk>/cards/<int:card_pk>/subtasks/reorder/', views.SubtaskReorderView.as_view(), name='card-subtask-reorder'),
+    path('<int:board_pk>/lists/<int:list_pk>/cards/<int:card_pk>/subtasks/<int:index>/', views.SubtaskDetailView.as_view(), name='card-subtask-detail'),
+    path('<int:board_pk>/lists/<int:list_pk>/cards/<int:card_pk>/subtasks/<int:index>/toggle/', views.SubtaskToggleView.as_view(), name='card-subtask-toggle'),
+    path('<int:board_pk>/lists/<int:list_pk>/cards/<int:card_pk>/attachments/', views.AttachmentListCreateView.as_view(), name='card-attachments'),
+    path('<int:board_pk>/lists/<int:list_pk>/cards/<int:card_pk>/attachments/reorder/', views.AttachmentReorderView.as_view(), name='card-attachment-reorder'),
+    path('<int:board_pk>/lists/<int:list_pk>/cards/<int:card_pk>/attachments/<int:index>/', views.AttachmentDetailView.as_view(), name='card-attachment-detail'),
     
     # Card Move URL
     path('cards/<int:pk>/move/', views.CardMoveView.as_view(), name='card-move'),
@@ -1,12 +1,27 @@
 # boards/views.py
 from rest_framework import generics, permissions, status
-from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.exceptions import PermissionDenied, ValidationError, NotFound
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.settings import api_settings
 from django.shortcuts import get_object_or_404
-from django.db import models
-from .models import Board, List, Card
-from .serializers import BoardSerializer, ListSerializer, CardSerializer
+from django.db import models, transaction
+from django.utils import timezone
+from .models import Board, BoardArchive, List, Card, DeletionJob
+from .serializers import (
+    BoardSerializer, ListSerializer, CardSerializer,
+    SubtaskSerializer, AttachmentSerializer, CardItemReorderSerializer,
+    DescriptionOperationSerializer, DeletionJobSerializer, BoardArchiveSerializer,
+)
+from .archive import restore_board
+from .deletion import delete_board
 from .permissions import IsBoardOwnerOrMember
+from .mixins import ConditionalUpdateMixin, IdempotentCreateMixin, version_etag
+from .parsers import JSONPatchParser
+from .jsonpatch import apply_patch, JsonPatchError, JsonPatchTestFailed
+from .collab import CollaborativeDescription, ResyncRequired
+from .ot import OperationError
+from .pagination import parse_card_limit, windowed_cards_prefetch, cards_after, encode_card_cursor
 from users.models import User
 
 
@@ -25,21 +40,76 @@ class BoardListCreateView(generics.ListCreateAPIView):
         serializer.save(owner=self.request.user)
 
 
-class BoardDetailView(generics.RetrieveUpdateDestroyAPIView):
+class BoardDetailView(ConditionalUpdateMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = BoardSerializer
     permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
 
+    def get_cards_per_list(self):
+        value = self.request.query_params.get('cards_per_list')
+        if value is None or self.request.method != 'GET':
+            return None
+        return parse_card_limit(value)
+
     def get_queryset(self):
-        return Board.objects.filter(
+        queryset = Board.objects.filter(
             models.Q(owner=self.request.user) | 
             models.Q(members=self.request.user)
         ).distinct()
+        cards_per_list = self.get_cards_per_list()
+        if cards_per_list:
+            queryset = queryset.prefetch_related(windowed_cards_prefetch(cards_per_list))
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['cards_per_list'] = self.get_cards_per_list()
+        return context
 
     def get_object(self):
         obj = get_object_or_404(self.get_queryset(), pk=self.kwargs['pk'])
         self.check_object_permissions(self.request, obj)
         return obj
 
+    def perform_destroy(self, instance):
+        # Hidden at once; the rows are purged by the purge_deleted worker
+        self.deletion_job = delete_board(instance, requested_by=self.request.user)
+
+    def destroy(self, request, *args, **kwargs):
+        response = super().destroy(request, *args, **kwargs)
+        if response.status_code != status.HTTP_204_NO_CONTENT:
+            return response
+        return Response(DeletionJobSerializer(self.deletion_job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class DeletionJobDetailView(generics.RetrieveAPIView):
+    """Progress of a board deletion you requested"""
+    serializer_class = DeletionJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return DeletionJob.objects.filter(requested_by=self.request.user)
+
+
+class BoardArchiveListView(generics.ListAPIView):
+    """Archived boards you own or were a member of (they are left out of the board list)"""
+    serializer_class = BoardArchiveSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return BoardArchive.objects.filter(members=self.request.user).defer('document')
+
+
+class BoardArchiveRestoreView(APIView):
+    """Move an archived board back into the board list (owner only)"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, board_id):
+        archive = get_object_or_404(
+            BoardArchive.objects.defer('document'), board_id=board_id, owner=request.user
+        )
+        board = restore_board(archive)
+        return Response(BoardSerializer(board, context={'request': request}).data, status=status.HTTP_201_CREATED)
+
 
 class BoardMemberAddView(generics.UpdateAPIView):
     """Add a member to a board (owner only)"""
@@ -105,7 +175,7 @@ class ListListCreateView(generics.ListCreateAPIView):
         serializer.save(board=board)
 
 
-class ListDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ListDetailView(ConditionalUpdateMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ListSerializer
     permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
 
@@ -120,7 +190,7 @@ class ListDetailView(generics.RetrieveUpdateDestroyAPIView):
         return obj
 
 
-class CardListCreateView(generics.ListCreateAPIView):
+class CardListCreateView(IdempotentCreateMixin, generics.ListCreateAPIView):
     serializer_class = CardSerializer
     permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
 
@@ -130,6 +200,18 @@ class CardListCreateView(generics.ListCreateAPIView):
         self.check_object_permissions(self.request, board)
         return Card.objects.filter(list=list_obj)
 
+    def list(self, request, *args, **kwargs):
+        # Continuation of a windowed board detail: ?after=<cursor>&limit=N
+        cursor = request.query_params.get('after')
+        if cursor is None:
+            return super().list(request, *args, **kwargs)
+
+        limit = parse_card_limit(request.query_params.get('limit', 50), param='limit')
+        cards = list(cards_after(self.get_queryset(), cursor).prefetch_related('assigned_members')[:limit + 1])
+        next_cursor = encode_card_cursor(cards[limit - 1]) if len(cards) > limit else None
+        serializer = self.get_serializer(cards[:limit], many=True)
+        return Response({'results': serializer.data, 'next_cursor': next_cursor})
+
     def perform_create(self, serializer):
         board = get_object_or_404(Board, pk=self.kwargs['board_pk'])
         list_obj = get_object_or_404(List, pk=self.kwargs['list_pk'], board=board)
@@ -137,9 +219,12 @@ class CardListCreateView(generics.ListCreateAPIView):
         serializer.save(list=list_obj)
 
 
-class CardDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CardDetailView(ConditionalUpdateMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CardSerializer
     permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES + [JSONPatchParser]
+    json_patch_fields = ('subtasks', 'attachments')
+    json_patch_item_serializers = {'subtasks': SubtaskSerializer, 'attachments': AttachmentSerializer}
 
     def get_queryset(self):
         board = get_object_or_404(Board, pk=self.kwargs['board_pk'])
@@ -152,6 +237,260 @@ class CardDetailView(generics.RetrieveUpdateDestroyAPIView):
         self.check_object_permissions(self.request, obj)
         return obj
 
+    def partial_update(self, request, *args, **kwargs):
+        if request.content_type.split(';')[0].strip() != JSONPatchParser.media_type:
+            return super().partial_update(request, *args, **kwargs)
+
+        # RFC 6902 mode: apply the operations to the current row under a lock
+        instance = self.get_object()
+        with transaction.atomic():
+            failed = self.precondition_failed(request)
+            if failed is not None:
+                return failed
+            current = Card.objects.select_for_update().values(*self.json_patch_fields).get(pk=instance.pk)
+            try:
+                patched = apply_patch(current, request.data, allowed_roots=self.json_patch_fields)
+            except JsonPatchTestFailed as e:
+                return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+            except JsonPatchError as e:
+                raise ValidationError(str(e))
+            for field in self.json_patch_fields:
+                if not isinstance(patched[field], list):
+                    raise ValidationError(f"{field} must remain a list")
+            changed = {field: patched[field] for field in self.json_patch_fields if patched[field] != current[field]}
+            for field, items in changed.items():
+                # Same rules as the subtask/attachment sub-resources
+                serializer = self.json_patch_item_serializers[field](data=items, many=True)
+                if not serializer.is_valid():
+                    raise ValidationError({field: serializer.errors})
+                changed[field] = [merge_item(item, valid) for item, valid in zip(items, serializer.validated_data)]
+            if changed:
+                Card.objects.filter(pk=instance.pk).update(
+                    updated_at=timezone.now(), version=models.F('version') + 1, **changed
+                )
+
+        instance.refresh_from_db()
+        return Response(self.get_serializer(instance).data, headers={'ETag': version_etag(instance)})
+
+
+def merge_item(item, validated):
+    """Validated fields written over the item, so extra keys on it are kept"""
+    if hasattr(item, 'dict'):
+        item = item.dict()  # form-encoded QueryDict
+    return {**item, **validated}
+
+
+class CardItemsMixin:
+    """
+    Shared plumbing for the subtask/attachment sub-resources. Each change is a
+    read-modify-write of one JSON array done under SELECT ... FOR UPDATE and
+    written back with a single-column UPDATE, so concurrent edits to the same
+    card serialize instead of overwriting each other.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+    field_name = None
+    item_serializer_class = None
+
+    def get_card(self):
+        board = get_object_or_404(Board, pk=self.kwargs['board_pk'])
+        self.check_object_permissions(self.request, board)
+        return get_object_or_404(Card, pk=self.kwargs['card_pk'], list__pk=self.kwargs['list_pk'], list__board=board)
+
+    def get_index(self, items):
+        index = self.kwargs['index']
+        if index >= len(items):
+            raise NotFound(f"No {self.field_name} entry at index {index}")
+        return index
+
+    def get_item_index(self, items):
+        """Index of an entry that can be edited in place (not a legacy non-object value)"""
+        index = self.get_index(items)
+        if not isinstance(items[index], dict):
+            raise ValidationError(f"The {self.field_name} entry at index {index} is not an object; replace or delete it")
+        return index
+
+    def mutate(self, change, response_status=status.HTTP_200_OK):
+        card = self.get_card()
+        with transaction.atomic():
+            items = Card.objects.select_for_update().values_list(self.field_name, flat=True).get(pk=card.pk)
+            items = list(items or [])
+            change(items)
+            Card.objects.filter(pk=card.pk).update(**{
+                self.field_name: items,
+                'updated_at': timezone.now(),
+                'version': models.F('version') + 1,
+            })
+        return Response({self.field_name: items}, status=response_status)
+
+    def validated_item(self, data, partial=False, instance=None):
+        serializer = self.item_serializer_class(instance=instance, data=data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        item = merge_item(data, serializer.validated_data)
+        return {**instance, **item} if instance is not None else item
+
+
+class CardItemListCreateView(CardItemsMixin, APIView):
+    def get(self, request, *args, **kwargs):
+        card = self.get_card()
+        return Response({self.field_name: getattr(card, self.field_name) or []})
+
+    def post(self, request, *args, **kwargs):
+        item = self.validated_item(request.data)
+        return self.mutate(lambda items: items.append(item), status.HTTP_201_CREATED)
+
+
+class CardItemDetailView(CardItemsMixin, APIView):
+    def patch(self, request, *args, **kwargs):
+        def change(items):
+            index = self.get_item_index(items)
+            items[index] = self.validated_item(request.data, partial=True, instance=items[index])
+        return self.mutate(change)
+
+    def delete(self, request, *args, **kwargs):
+        return self.mutate(lambda items: items.pop(self.get_index(items)))
+
+
+class CardItemReorderView(CardItemsMixin, APIView):
+    def post(self, request, *args, **kwargs):
+        serializer = CardItemReorderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        from_index = serializer.validated_data['from_index']
+        to_index = serializer.validated_data['to_index']
+
+        def change(items):
+            if from_index >= len(items) or to_index >= len(items):
+                raise ValidationError("Index out of range")
+            items.insert(to_index, items.pop(from_index))
+        return self.mutate(change)
+
+
+class SubtaskListCreateView(CardItemListCreateView):
+    """List or append subtasks of a card"""
+    field_name = 'subtasks'
+    item_serializer_class = SubtaskSerializer
+
+
+class SubtaskDetailView(CardItemDetailView):
+    """Update or remove one subtask by index"""
+    field_name = 'subtasks'
+    item_serializer_class = SubtaskSerializer
+
+
+class SubtaskToggleView(CardItemsMixin, APIView):
+    """Flip the completed flag of one subtask"""
+    field_name = 'subtasks'
+
+    def post(self, request, *args, **kwargs):
+        def change(items):
+            index = self.get_item_index(items)
+            items[index] = {**items[index], 'completed': not items[index].get('completed', False)}
+        return self.mutate(change)
+
+
+class SubtaskReorderView(CardItemReorderView):
+    """Move a subtask to another index"""
+    field_name = 'subtasks'
+
+
+class AttachmentListCreateView(CardItemListCreateView):
+    """List or append attachments of a card"""
+    field_name = 'attachments'
+    item_serializer_class = AttachmentSerializer
+
+
+class AttachmentDetailView(CardItemDetailView):
+    """Update or remove one attachment by index"""
+    field_name = 'attachments'
+    item_serializer_class = AttachmentSerializer
+
+
+class AttachmentReorderView(CardItemReorderView):
+    """Move an attachment to another index"""
+    field_name = 'attachments'
+
+
+class DescriptionChannelMixin:
+    """
+    Collaborative editing channel for a description (see boards/collab.py).
+    GET returns the merged text, ops/?since=N the deltas after revision N,
+    and POST to ops/ merges one operation.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+
+    def get_document(self):
+        return CollaborativeDescription(self.get_target())
+
+    def resync_response(self, document):
+        return Response(
+            {'error': 'Revision is too old, reload the description', **document.state()},
+            status=status.HTTP_409_CONFLICT,
+        )
+
+
+class DescriptionStateMixin(DescriptionChannelMixin):
+    def get(self, request, *args, **kwargs):
+        return Response(self.get_document().state())
+
+
+class DescriptionOperationsMixin(DescriptionChannelMixin):
+    def get(self, request, *args, **kwargs):
+        document = self.get_document()
+        try:
+            since = int(request.query_params.get('since', 0))
+        except (TypeError, ValueError):
+            raise ValidationError("since must be an integer revision")
+        try:
+            operations = document.operations_since(since)
+        except ResyncRequired:
+            return self.resync_response(document)
+        return Response({'operations': operations})
+
+    def post(self, request, *args, **kwargs):
+        serializer = DescriptionOperationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        document = self.get_document()
+        try:
+            revision, ops = document.submit(
+                serializer.validated_data['revision'],
+                serializer.validated_data['ops'],
+                user=request.user,
+            )
+        except ResyncRequired:
+            return self.resync_response(document)
+        except OperationError as e:
+            raise ValidationError(str(e))
+        return Response({'revision': revision, 'ops': ops})
+
+
+class BoardDescriptionTargetMixin:
+    def get_target(self):
+        board = get_object_or_404(Board, pk=self.kwargs['pk'])
+        self.check_object_permissions(self.request, board)
+        return board
+
+
+class CardDescriptionTargetMixin:
+    def get_target(self):
+        board = get_object_or_404(Board, pk=self.kwargs['board_pk'])
+        self.check_object_permissions(self.request, board)
+        return get_object_or_404(Card, pk=self.kwargs['pk'], list__pk=self.kwargs['list_pk'], list__board=board)
+
+
+class BoardDescriptionView(BoardDescriptionTargetMixin, DescriptionStateMixin, APIView):
+    """Current merged board description and its revision"""
+
+
+class BoardDescriptionOperationsView(BoardDescriptionTargetMixin, DescriptionOperationsMixin, APIView):
+    """Poll or submit operational edits of a board description"""
+
+
+class CardDescriptionView(CardDescriptionTargetMixin, DescriptionStateMixin, APIView):
+    """Current merged card description and its revision"""
+
+
+class CardDescriptionOperationsView(CardDescriptionTargetMixin, DescriptionOperationsMixin, APIView):
+    """Poll or submit operational edits of a card description"""
+
 
 class CardMoveView(generics.UpdateAPIView):
     """Move a card between lists or reorder within the same list"""
@@ -198,12 +537,12 @@ class CardMoveView(generics.UpdateAPIView):
         if new_list != old_list:
             # Remove from old list: shift positions down for cards after old position
             old_list.cards.filter(position__gt=old_position).update(
-                position=models.F('position') - 1
+                position=models.F('position') - 1, version=models.F('version') + 1
             )
             
             # Add to new list: shift positions up for cards at/after new position
             new_list.cards.filter(position__gte=new_position).update(
-                position=models.F('position') + 1
+                position=models.F('position') + 1, version=models.F('version') + 1
             )
             
             # Update card's list and position
@@ -218,13 +557,13 @@ class CardMoveView(generics.UpdateAPIView):
                     old_list.cards.filter(
                         position__gt=old_position, 
                         position__lte=new_position
-                    ).update(position=models.F('position') - 1)
+                    ).update(position=models.F('position') - 1, version=models.F('version') + 1)
                 elif new_position < old_position:
                     # Moving up: shift cards between new and old position down
                     old_list.cards.filter(
                         position__gte=new_position, 
                         position__lt=old_position
-                    ).update(position=models.F('position') + 1)
+                    ).update(position=models.F('position') + 1, version=models.F('version') + 1)
                 
                 instance.position = new_position
 
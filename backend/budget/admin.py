@@ -1,8 +1,32 @@
 from django.contrib import admin
-from .models import Expense
+from .models import Expense, BudgetTotal, ExchangeRate, ExpenseShare, SpendingRollup
+
 
 @admin.register(Expense)
 class ExpenseAdmin(admin.ModelAdmin):
     list_display = ('title', 'board', 'amount', 'category', 'date', 'created_by', 'created_at')
     list_filter = ('board', 'category', 'date', 'created_by')
-    search_fields = ('title', 'notes')
\ No newline at end of file
+    search_fields = ('title', 'notes')
+
+
+@admin.register(BudgetTotal)
+class BudgetTotalAdmin(admin.ModelAdmin):
+    list_display = ('board', 'category', 'total', 'expense_count')
+    list_filter = ('category',)
+
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ('currency', 'date', 'rate')
+    list_filter = ('currency',)
+
+
+@admin.register(ExpenseShare)
+class ExpenseShareAdmin(admin.ModelAdmin):
+    list_display = ('expense', 'user', 'ratio')
+
+
+@admin.register(SpendingRollup)
+class SpendingRollupAdmin(admin.ModelAdmin):
+    list_display = ('user', 'board', 'category', 'month', 'total', 'expense_count', 'updated_at')
+    list_filter = ('category',)
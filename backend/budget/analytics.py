@@ -0,0 +1,117 @@
+"""
+Vectorized fleet-wide spend statistics for the budget_analytics command.
+
+Expenses are streamed in chunks, so per-expense distributions are kept as
+grouped histograms over fixed log-spaced bins: adding a chunk is one
+np.bincount and memory depends on groups x bins, not on the table size.
+Quantiles are read off the cumulative histograms with log interpolation
+inside a bin, which bounds the relative error by the bin width (about 1% with
+the default 2000 bins over 0.01 .. 10^8). Per-board totals fit in memory and
+use exact quantiles.
+"""
+import numpy as np
+
+DEFAULT_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+# (label, first day, last day) of each trip length bucket; boards without dates go to 'unknown'
+TRIP_LENGTH_BUCKETS = (
+    ('1-3', 1, 3),
+    ('4-7', 4, 7),
+    ('8-14', 8, 14),
+    ('15-30', 15, 30),
+    ('31+', 31, None),
+)
+
+
+def log_bin_edges(bins=2000, low=0.01, high=1e8):
+    """Edges starting at 0 so zero and sub-cent amounts land in the first bin"""
+    return np.concatenate(([0.0], np.logspace(np.log10(low), np.log10(high), bins)))
+
+
+class GroupedHistogram:
+    """Counts of values per (group, bin); groups are added as they are first seen"""
+
+    def __init__(self, edges, groups=()):
+        self.edges = edges
+        self.groups = list(groups)
+        self.index = {name: i for i, name in enumerate(self.groups)}
+        self.counts = np.zeros((len(self.groups), len(edges)), dtype=np.int64)
+
+    def group_indices(self, names):
+        """Map an array of group names to row indices, adding rows for new names"""
+        unique, inverse = np.unique(names, return_inverse=True)
+        for name in unique:
+            if name not in self.index:
+                self.index[name] = len(self.groups)
+                self.groups.append(name)
+        if len(self.groups) > len(self.counts):
+            grow = len(self.groups) - len(self.counts)
+            self.counts = np.vstack([self.counts, np.zeros((grow, len(self.edges)), dtype=np.int64)])
+        return np.array([self.index[name] for name in unique], dtype=np.int64)[inverse]
+
+    def add(self, names, values):
+        keep = np.isfinite(values)
+        names, values = names[keep], values[keep]
+        if not len(values):
+            return
+        rows = self.group_indices(names)
+        bins = np.clip(np.searchsorted(self.edges, values, side='right') - 1, 0, len(self.edges) - 1)
+        width = len(self.edges)
+        self.counts += np.bincount(rows * width + bins, minlength=self.counts.size).reshape(self.counts.shape)
+
+    def totals(self):
+        return self.counts.sum(axis=1)
+
+    def quantiles(self, qs):
+        """(groups x quantiles) estimates; NaN for empty groups"""
+        qs = np.asarray(qs, dtype=float)
+        result = np.full((len(self.groups), len(qs)), np.nan)
+        lower = self.edges
+        upper = np.append(self.edges[1:], self.edges[-1] * (self.edges[-1] / self.edges[-2]))
+        for row, counts in enumerate(self.counts):
+            total = counts.sum()
+            if not total:
+                continue
+            cumulative = np.cumsum(counts)
+            targets = qs * total
+            bins = np.minimum(np.searchsorted(cumulative, targets, side='left'), len(counts) - 1)
+            before = np.where(bins > 0, cumulative[bins - 1], 0)
+            fraction = np.where(counts[bins] > 0, (targets - before) / np.maximum(counts[bins], 1), 0.0)
+            low = np.where(bins == 0, upper[0], lower[bins])
+            result[row] = np.where(
+                bins == 0,
+                upper[0] * fraction,
+                low * (upper[bins] / low) ** fraction,
+            )
+        return result
+
+
+def trip_length_labels(lengths):
+    """Bucket label for each trip length in days (0 or less = unknown)"""
+    labels = np.full(len(lengths), 'unknown', dtype=object)
+    for label, first, last in TRIP_LENGTH_BUCKETS:
+        mask = lengths >= first
+        if last is not None:
+            mask &= lengths <= last
+        labels[mask] = label
+    return labels
+
+
+def grouped_quantiles(labels, values, qs):
+    """Exact quantiles of values per label; returns (names, counts, quantiles)"""
+    names = sorted(set(labels))
+    counts, result = [], []
+    for name in names:
+        selected = values[(labels == name) & np.isfinite(values)]
+        counts.append(len(selected))
+        result.append(np.quantile(selected, qs) if len(selected) else np.full(len(qs), np.nan))
+    return names, np.array(counts, dtype=np.int64), np.array(result).reshape(len(names), len(qs))
+
+
+def grouped_rates(labels, flags, valid):
+    """Share of valid rows with flag set, per label"""
+    names = sorted(set(labels))
+    return np.array([
+        flags[(labels == name) & valid].mean() if ((labels == name) & valid).any() else np.nan
+        for name in names
+    ])
@@ -0,0 +1,73 @@
+"""
+Currency conversion against the local exchange_rates table.
+
+Rates are stored per day relative to EXCHANGE_RATE_BASE_CURRENCY; converting
+between two other currencies goes through the base (cross rate). The rate in
+effect on a date is the latest one on or before it. Lookups are memoized per
+process and the memo is dropped every EXCHANGE_RATE_CACHE_SECONDS so freshly
+loaded rates are picked up without a restart.
+"""
+from django.db import connection, transaction
+from boards.models import Board
+from django.db.models import Exists, F, OuterRef, Q
+from .models import (  # noqa: F401 (rate lookups are defined next to ExchangeRate)
+    CENTS, Expense, ExchangeRate, ExchangeRateMissing, BudgetTotal, SpendingRollup,
+    base_currency, clear_rate_cache, convert, get_rate,
+)
+
+
+def unconvertible_expenses(board, currency):
+    """Expenses of board that have no rate to be converted into currency at their date"""
+    base = base_currency()
+    rate_on_date = ExchangeRate.objects.filter(date__lte=OuterRef('date'))
+    # The base currency is always at rate 1, stored or not
+    missing = ~Q(currency=base) & ~Q(Exists(rate_on_date.filter(currency=OuterRef('currency'))))
+    if currency != base:
+        missing |= ~Q(Exists(rate_on_date.filter(currency=currency)))
+    return Expense.objects.filter(board=board).exclude(currency=currency).filter(missing)
+
+
+# Rate of a currency on the expense date; the base currency is 1 even without a stored row
+RATE_ON_EXPENSE_DATE = """
+    CASE WHEN {currency} = %(base)s THEN 1 ELSE (
+        SELECT r.rate FROM exchange_rates AS r
+        WHERE r.currency = {currency} AND r.date <= expenses.date
+        ORDER BY r.date DESC LIMIT 1
+    ) END
+"""
+
+REDENOMINATE_SQL = f"""
+    UPDATE expenses
+    SET board_amount = ROUND(
+        expenses.amount
+        * {RATE_ON_EXPENSE_DATE.format(currency='%(currency)s')}
+        / {RATE_ON_EXPENSE_DATE.format(currency='expenses.currency')},
+        2
+    )
+    WHERE expenses.board_id = %(board_id)s AND expenses.currency <> %(currency)s
+"""
+
+
+def redenominate_board(board, previous_currency=None):
+    """
+    Recompute board_amount for every expense of board in its (new) currency.
+    Foreign-currency rows are converted by one UPDATE with the rates looked
+    up in correlated subqueries; the per-category totals and spending rollups
+    are rebuilt afterwards.
+    If an expense has no rate, nothing is converted: the board goes back to
+    previous_currency and ExchangeRateMissing is raised.
+    """
+    missing = unconvertible_expenses(board, board.currency).count()
+    if missing:
+        error = ExchangeRateMissing(f"No exchange rate to convert {missing} expenses to {board.currency}")
+        if previous_currency:
+            Board.all_objects.filter(pk=board.pk).update(currency=previous_currency)
+            board.currency = previous_currency
+        raise error
+    with transaction.atomic():
+        Expense.objects.filter(board=board, currency=board.currency).update(board_amount=F('amount'))
+        with connection.cursor() as cursor:
+            cursor.execute(REDENOMINATE_SQL, {'board_id': board.pk, 'currency': board.currency, 'base': base_currency()})
+        BudgetTotal.rebuild(board_ids=[board.pk])
+        SpendingRollup.rebuild(board_ids=[board.pk])
+
@@ -0,0 +1,172 @@
+import csv
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from boards.models import Board
+from budget.analytics import (
+    DEFAULT_QUANTILES, GroupedHistogram, grouped_quantiles, grouped_rates, log_bin_edges, trip_length_labels,
+)
+from budget.currency import base_currency, get_rate, ExchangeRateMissing
+from budget.models import Expense, CATEGORY_CHOICES
+
+
+class Command(BaseCommand):
+    help = (
+        "Fleet-wide spend statistics: quantiles and histograms of expense amounts per category "
+        "and per currency, and of board totals and budget-overrun rates per trip length and "
+        "board currency. Expenses are streamed in chunks; writes a .csv or .npz file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Output file; .npz keeps the histograms, .csv only the summary rows")
+        parser.add_argument('--chunk-size', type=int, default=100_000, help="Expenses fetched per query")
+        parser.add_argument('--bins', type=int, default=2000, help="Log-spaced histogram bins")
+        parser.add_argument('--quantiles', default=','.join(str(q) for q in DEFAULT_QUANTILES),
+                            help="Comma-separated quantiles between 0 and 1")
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if not output.endswith(('.csv', '.npz')):
+            raise CommandError("Output must be a .csv or .npz file")
+        try:
+            qs = np.array([float(q) for q in options['quantiles'].split(',')])
+        except ValueError:
+            raise CommandError("Invalid --quantiles")
+        if ((qs < 0) | (qs > 1)).any():
+            raise CommandError("Quantiles must be between 0 and 1")
+
+        boards = self.load_boards()
+        edges = log_bin_edges(options['bins'])
+        by_category = GroupedHistogram(edges, [value for value, _ in CATEGORY_CHOICES])
+        by_currency = GroupedHistogram(edges)
+        board_spend = np.zeros(len(boards['id']))
+
+        expenses = 0
+        for chunk in self.expense_chunks(options['chunk_size']):
+            positions = np.searchsorted(boards['id'], chunk['board_id'])
+            # Skip expenses of boards created after the board columns were loaded
+            known = positions < len(boards['id'])
+            known[known] = boards['id'][positions[known]] == chunk['board_id'][known]
+            if not known.all():
+                chunk = {column: values[known] for column, values in chunk.items()}
+                positions = positions[known]
+            # Board totals stay in the board's currency for the overrun check;
+            # cross-board distributions use the base currency
+            board_spend += np.bincount(positions, weights=chunk['board_amount'], minlength=len(board_spend))
+            by_category.add(chunk['category'], chunk['board_amount'] * boards['to_base'][positions])
+            by_currency.add(chunk['currency'], chunk['amount'])
+            expenses += len(positions)
+            self.stdout.write(f"Processed {expenses} expense(s)", ending='\r')
+        self.stdout.write('')
+
+        trip_labels = trip_length_labels(boards['trip_days'])
+        has_budget = boards['budget'] > 0
+        overrun = board_spend > boards['budget']
+        spend_in_base = board_spend * boards['to_base']
+
+        trip_names, trip_counts, trip_quantiles = grouped_quantiles(trip_labels, spend_in_base, qs)
+        board_currency_names, board_currency_counts, board_currency_quantiles = grouped_quantiles(
+            boards['currency'], board_spend, qs
+        )
+
+        results = {
+            'quantiles': qs,
+            'bin_edges': edges,
+            'base_currency': np.array(base_currency()),
+            'category_names': np.array(by_category.groups),
+            'category_counts': by_category.totals(),
+            'category_histogram': by_category.counts,
+            'category_quantiles': by_category.quantiles(qs),
+            'currency_names': np.array(by_currency.groups, dtype=str),
+            'currency_counts': by_currency.totals(),
+            'currency_histogram': by_currency.counts,
+            'currency_quantiles': by_currency.quantiles(qs),
+            'trip_length_names': np.array(trip_names),
+            'trip_length_counts': trip_counts,
+            'trip_length_quantiles': trip_quantiles,
+            'trip_length_overrun_rate': grouped_rates(trip_labels, overrun, has_budget),
+            'board_currency_names': np.array(board_currency_names, dtype=str),
+            'board_currency_counts': board_currency_counts,
+            'board_currency_quantiles': board_currency_quantiles,
+            'board_currency_overrun_rate': grouped_rates(boards['currency'], overrun, has_budget),
+        }
+        if output.endswith('.npz'):
+            np.savez_compressed(output, **results)
+        else:
+            self.write_csv(output, results)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote statistics for {expenses} expense(s) on {len(board_spend)} board(s) to {output}"
+        ))
+
+    def load_boards(self):
+        """Board columns as arrays sorted by id, with the factor converting board currency to base"""
+        ids, budgets, currencies, trip_days = [], [], [], []
+        for pk, budget, currency, start, end in (
+            Board.objects.order_by('pk')
+            .values_list('pk', 'budget', 'currency', 'start_date', 'end_date')
+            .iterator(chunk_size=10_000)
+        ):
+            ids.append(pk)
+            budgets.append(budget or 0)
+            currencies.append(currency)
+            trip_days.append((end - start).days + 1 if start and end else 0)
+
+        currencies = np.array(currencies, dtype=str)
+        to_base = np.full(len(ids), np.nan)
+        for currency in np.unique(currencies):
+            try:
+                to_base[currencies == currency] = 1 / float(get_rate(currency))
+            except ExchangeRateMissing:
+                self.stderr.write(f"No exchange rate for {currency}; its boards are left out of cross-currency stats")
+        return {
+            'id': np.array(ids, dtype=np.int64),
+            'budget': np.array(budgets, dtype=float),
+            'currency': currencies,
+            'trip_days': np.array(trip_days, dtype=np.int64),
+            'to_base': to_base,
+        }
+
+    def expense_chunks(self, chunk_size):
+        """Expense columns as arrays, chunk_size rows at a time in primary-key order"""
+        last_pk = 0
+        columns = ('pk', 'board_id', 'category', 'currency', 'amount', 'board_amount')
+        while True:
+            rows = list(
+                Expense.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list(*columns)[:chunk_size]
+            )
+            if not rows:
+                return
+            last_pk = rows[-1][0]
+            pks, board_ids, categories, currencies, amounts, board_amounts = zip(*rows)
+            yield {
+                'board_id': np.array(board_ids, dtype=np.int64),
+                'category': np.array(categories, dtype=str),
+                'currency': np.array(currencies, dtype=str),
+                'amount': np.array(amounts, dtype=float),
+                'board_amount': np.array(board_amounts, dtype=float),
+            }
+
+    def write_csv(self, path, results):
+        quantile_headers = [f"p{q * 100:g}" for q in results['quantiles']]
+        dimensions = [
+            ('category', 'expense_amount', None),
+            ('currency', 'expense_amount', None),
+            ('trip_length', 'board_total', 'trip_length_overrun_rate'),
+            ('board_currency', 'board_total', 'board_currency_overrun_rate'),
+        ]
+        with open(path, 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(['dimension', 'group', 'measure', 'count', *quantile_headers, 'overrun_rate'])
+            for dimension, measure, rate_key in dimensions:
+                names = results[f'{dimension}_names']
+                for i, name in enumerate(names):
+                    rate = results[rate_key][i] if rate_key else np.nan
+                    writer.writerow([
+                        dimension, name, measure, int(results[f'{dimension}_counts'][i]),
+                        *(self.format_number(value) for value in results[f'{dimension}_quantiles'][i]),
+                        self.format_number(rate, digits=4),
+                    ])
+
+    @staticmethod
+    def format_number(value, digits=2):
+        return '' if np.isnan(value) else f"{value:.{digits}f}"
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from boards.models import Board
+from budget.models import CATEGORY_CHOICES
+from budget.statements import FIELDS, StatementError, detect_format, import_statement
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Import a CSV or OFX bank/card statement into a board's expenses, skipping rows already imported"
+
+    def add_arguments(self, parser):
+        parser.add_argument('board_id', type=int)
+        parser.add_argument('path', help="CSV or OFX statement file")
+        parser.add_argument('--user', required=True, help="Email of the user the expenses are recorded for")
+        parser.add_argument('--format', choices=['csv', 'ofx'], help="Defaults to the file extension")
+        parser.add_argument('--category', choices=[value for value, _ in CATEGORY_CHOICES], default='misc')
+        parser.add_argument('--currency', help="Currency of rows without a currency column")
+        parser.add_argument('--debits', choices=['negative', 'positive'], default='negative',
+                            help="Sign of spending rows in the file")
+        parser.add_argument('--date-format', help="strptime format, e.g. %%d/%%m/%%Y")
+        parser.add_argument('--decimal-separator', choices=['.', ','],
+                            help="Detected from the amounts when not given")
+        parser.add_argument('--batch-size', type=int)
+        for field in FIELDS:
+            parser.add_argument(f'--{field}-column', help=f"CSV header holding the expense {field}")
+
+    def handle(self, *args, **options):
+        try:
+            board = Board.objects.get(pk=options['board_id'])
+            user = User.objects.get(email=options['user'])
+        except (Board.DoesNotExist, User.DoesNotExist) as e:
+            raise CommandError(str(e))
+
+        columns = {field: options[f'{field}_column'] for field in FIELDS if options[f'{field}_column']}
+        try:
+            fmt = detect_format(options['path'], options['format'])
+            with open(options['path'], encoding='utf-8-sig', errors='replace', newline='') as stream:
+                result = import_statement(
+                    board, user, stream, fmt, columns,
+                    category=options['category'],
+                    currency=options['currency'],
+                    debits=options['debits'],
+                    date_format=options['date_format'],
+                    decimal_separator=options['decimal_separator'],
+                    batch_size=options['batch_size'],
+                )
+        except FileNotFoundError:
+            raise CommandError(f"File not found: {options['path']}")
+        except StatementError as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stderr.write(f"Line {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['imported']} expense(s), {result['duplicates']} duplicate(s), "
+            f"{result['skipped']} skipped"
+        ))
@@ -0,0 +1,51 @@
+import csv
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from budget.currency import base_currency, clear_rate_cache
+from budget.models import ExchangeRate
+
+
+class Command(BaseCommand):
+    help = (
+        "Load dated exchange rates from a local CSV (date,currency,rate) or JSON file "
+        "([{\"date\": ..., \"currency\": ..., \"rate\": ...}]). Rates are units of the "
+        "currency per one unit of EXCHANGE_RATE_BASE_CURRENCY."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSON file with exchange rates")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def read_rows(self, path):
+        with open(path, newline='') as handle:
+            if path.endswith('.json'):
+                yield from json.load(handle)
+            else:
+                yield from csv.DictReader(handle)
+
+    def handle(self, *args, **options):
+        base = base_currency()
+        rates = {}
+        try:
+            for row in self.read_rows(options['path']):
+                day = date.fromisoformat(str(row['date']).strip())
+                currency = str(row['currency']).strip().upper()
+                rates[(currency, day)] = Decimal(str(row['rate']).strip())
+                # The base currency is stored at 1 so bulk conversions can join on it
+                rates[(base, day)] = Decimal('1')
+        except FileNotFoundError:
+            raise CommandError(f"File not found: {options['path']}")
+        except (KeyError, ValueError, InvalidOperation) as e:
+            raise CommandError(f"Invalid exchange rate row: {e}")
+
+        ExchangeRate.objects.bulk_create(
+            [ExchangeRate(currency=currency, date=day, rate=rate) for (currency, day), rate in rates.items()],
+            batch_size=options['batch_size'],
+            update_conflicts=True,
+            unique_fields=['currency', 'date'],
+            update_fields=['rate'],
+        )
+        clear_rate_cache()
+        self.stdout.write(self.style.SUCCESS(f"Loaded {len(rates)} exchange rate(s)"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from budget.models import BudgetTotal
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-board, per-category budget totals from the expenses table and report drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report drift, do not rewrite totals")
+        parser.add_argument('--board', type=int, help="Limit to one board id")
+
+    def handle(self, *args, **options):
+        board_ids = [options['board']] if options['board'] else None
+        drift = BudgetTotal.rebuild(board_ids=board_ids, dry_run=options['dry_run'])
+
+        for (board_id, category), found, expected in drift:
+            self.stdout.write(
+                f"board {board_id} {category}: stored {found[0]} ({found[1]}) != actual {expected[0]} ({expected[1]})"
+            )
+        verb = "Found" if options['dry_run'] else "Fixed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(drift)} drifted total(s)"))
@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+from boards.models import Board
+from budget.models import SpendingRollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user spending rollups behind the spending dashboard from the expenses table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="Limit to one user id")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Boards rebuilt per transaction")
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep running, refreshing every N seconds (0 = run once)")
+
+    def handle(self, *args, **options):
+        while True:
+            if options['user']:
+                SpendingRollup.rebuild(user_ids=[options['user']])
+                self.stdout.write(self.style.SUCCESS(f"Refreshed spending rollups of user {options['user']}"))
+            else:
+                self.refresh_all(options['chunk_size'])
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def refresh_all(self, chunk_size):
+        board_ids = list(Board.objects.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(board_ids), chunk_size):
+            SpendingRollup.rebuild(board_ids=board_ids[start:start + chunk_size])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed spending rollups of {len(board_ids)} board(s)"))
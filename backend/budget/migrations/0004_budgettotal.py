@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:56
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_budget_totals(apps, schema_editor):
+    Expense = apps.get_model('budget', 'Expense')
+    BudgetTotal = apps.get_model('budget', 'BudgetTotal')
+    rows = Expense.objects.order_by().values('board_id', 'category').annotate(total=Sum('amount'), count=Count('id'))
+    BudgetTotal.objects.bulk_create([
+        BudgetTotal(board_id=row['board_id'], category=row['category'], total=row['total'], expense_count=row['count'])
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0008_idempotencykey'),
+        ('budget', '0003_remove_budgetitem_budget_remove_budgetcategory_owner_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BudgetTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('travel', 'Travel/Flight'), ('lodging', 'Lodging'), ('food', 'Food'), ('activities', 'Activities'), ('fees', 'Fees'), ('misc', 'Misc')], max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('expense_count', models.PositiveIntegerField(default=0)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budget_totals', to='boards.board')),
+            ],
+            options={
+                'db_table': 'budget_totals',
+                'ordering': ['category'],
+                'constraints': [models.UniqueConstraint(fields=('board', 'category'), name='unique_board_budget_category')],
+            },
+        ),
+        migrations.RunPython(backfill_budget_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0008_idempotencykey'),
+        ('budget', '0004_budgettotal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='card',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='expenses', to='boards.card'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:00
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_amount_to_board_amount(apps, schema_editor):
+    # Until now every expense was recorded in its board's currency
+    Expense = apps.get_model('budget', 'Expense')
+    Expense.objects.update(board_amount=F('amount'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0005_expense_card'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='board_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18)),
+            ],
+            options={
+                'db_table': 'exchange_rates',
+                'ordering': ['currency', '-date'],
+                'constraints': [models.UniqueConstraint(fields=('currency', 'date'), name='unique_exchange_rate_per_day')],
+            },
+        ),
+        migrations.RunPython(copy_amount_to_board_amount, migrations.RunPython.noop),
+    ]
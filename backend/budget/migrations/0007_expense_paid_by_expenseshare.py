@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def default_payer_to_creator(apps, schema_editor):
+    Expense = apps.get_model('budget', 'Expense')
+    Expense.objects.update(paid_by=F('created_by'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0006_expense_board_amount_exchangerate'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='paid_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='paid_expenses', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='ExpenseShare',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ratio', models.DecimalField(decimal_places=8, max_digits=9)),
+                ('expense', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shares', to='budget.expense')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_shares', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'expense_shares',
+                'constraints': [models.UniqueConstraint(fields=('expense', 'user'), name='unique_expense_share_user')],
+            },
+        ),
+        migrations.RunPython(default_payer_to_creator, migrations.RunPython.noop),
+    ]
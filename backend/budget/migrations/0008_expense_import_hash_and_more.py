@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0008_idempotencykey'),
+        ('budget', '0007_expense_paid_by_expenseshare'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='import_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='expense',
+            constraint=models.UniqueConstraint(condition=models.Q(('import_hash__isnull', False)), fields=('board', 'import_hash'), name='unique_expense_import_hash'),
+        ),
+    ]
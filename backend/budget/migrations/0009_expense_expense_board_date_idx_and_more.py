@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0008_idempotencykey'),
+        ('budget', '0008_expense_import_hash_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['board', 'date'], name='expense_board_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['board', 'category'], name='expense_board_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['board', 'created_by'], name='expense_board_creator_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:08
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_spending_rollups(apps, schema_editor):
+    Board = apps.get_model('boards', 'Board')
+    Expense = apps.get_model('budget', 'Expense')
+    SpendingRollup = apps.get_model('budget', 'SpendingRollup')
+    members = {}
+    for user_id, board_id in Board.members.through.objects.values_list('user_id', 'board_id'):
+        members.setdefault(board_id, []).append(user_id)
+    rows = (
+        Expense.objects.filter(date__isnull=False).order_by()
+        .values('board_id', 'category', month=TruncMonth('date'))
+        .annotate(total=Sum('board_amount'), count=Count('id'))
+    )
+    SpendingRollup.objects.bulk_create([
+        SpendingRollup(user_id=user_id, board_id=row['board_id'], category=row['category'], month=row['month'],
+                       total=row['total'], expense_count=row['count'])
+        for row in rows
+        for user_id in members.get(row['board_id'], [])
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0008_idempotencykey'),
+        ('budget', '0009_expense_expense_board_date_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('travel', 'Travel/Flight'), ('lodging', 'Lodging'), ('food', 'Food'), ('activities', 'Activities'), ('fees', 'Fees'), ('misc', 'Misc')], max_length=20)),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('expense_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_rollups', to='boards.board')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'spending_rollups',
+                'ordering': ['month', 'category'],
+                'indexes': [models.Index(fields=['board', 'category', 'month'], name='spending_rollup_board_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'board', 'category', 'month'), name='unique_spending_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_spending_rollups, migrations.RunPython.noop),
+    ]
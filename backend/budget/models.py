@@ -1,5 +1,13 @@
-from django.db import models
-from boards.models import Board
+import time
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from boards.models import Board, Card
 from users.models import User
 from django.utils import timezone 
 
@@ -12,28 +20,336 @@ CATEGORY_CHOICES = [
     ('misc', 'Misc'),
 ]
 
+# How planned Card.category values line up with expense categories when
+# comparing planned and actual spend; cards without a category count as misc
+CARD_CATEGORY_TO_EXPENSE_CATEGORY = {
+    'flight': 'travel',
+    'hotel': 'lodging',
+    'food': 'food',
+    'activity': 'activities',
+    'romantic': 'activities',
+    'family': 'activities',
+}
+
 class Expense(models.Model):
     board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='expenses')
+    card = models.ForeignKey(Card, on_delete=models.SET_NULL, null=True, blank=True, related_name='expenses')
     title = models.CharField(max_length=200)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
     date = models.DateField(null=True, blank=True)
     notes = models.TextField(blank=True, null=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='created_expenses')
+    paid_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='paid_expenses')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     currency = models.CharField(max_length=3)
+    # amount converted to the board's currency at the expense date; all totals use it
+    board_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    # Content hash of the statement row an expense was imported from (see budget/statements.py)
+    import_hash = models.CharField(max_length=64, null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.title} ({self.board.title})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_totals_key()
+        return instance
+
+    def _remember_totals_key(self):
+        # What this row currently contributes to BudgetTotal, so saves and
+        # deletes can move the right amount between categories
+        if {'board_id', 'category', 'board_amount', 'date'} <= self.__dict__.keys():
+            self._loaded_totals_key = (self.board_id, self.category, self.board_amount, self.date)
+
     def save(self, *args, **kwargs):
         if not self.date:
             self.date = timezone.now().date()  # Fixed: Use date instead of datetime
         if not self.currency:
             self.currency = self.board.currency
-        super().save(*args, **kwargs)
+        if self.paid_by_id is None:
+            self.paid_by_id = self.created_by_id
+        self.board_amount = self.convert_to_board_currency()
+        with transaction.atomic():
+            previous = getattr(self, '_loaded_totals_key', None)
+            super().save(*args, **kwargs)
+            if previous != (self.board_id, self.category, self.board_amount, self.date):
+                if previous is not None:
+                    BudgetTotal.add(previous[0], previous[1], -Decimal(previous[2]), -1)
+                    SpendingRollup.add(previous[0], previous[1], previous[3], -Decimal(previous[2]), -1)
+                BudgetTotal.add(self.board_id, self.category, Decimal(self.board_amount), 1)
+                SpendingRollup.add(self.board_id, self.category, self.date, Decimal(self.board_amount), 1)
+        self._remember_totals_key()
+
+    def convert_to_board_currency(self):
+        try:
+            return convert(self.amount, self.currency, self.board.currency, self.date or timezone.now().date())
+        except ExchangeRateMissing as e:
+            raise ValidationError({'currency': str(e)})
+
+    def clean(self):
+        # Admin and other ModelForms report a missing rate as a form error
+        super().clean()
+        if self.board_id and self.amount is not None:
+            self.convert_to_board_currency()
+
+    def delete(self, *args, **kwargs):
+        previous = getattr(
+            self, '_loaded_totals_key', (self.board_id, self.category, self.board_amount, self.date)
+        )
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            BudgetTotal.add(previous[0], previous[1], -Decimal(previous[2]), -1)
+            SpendingRollup.add(previous[0], previous[1], previous[3], -Decimal(previous[2]), -1)
+        return result
 
     class Meta:
         db_table = 'expenses'
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['board', 'date'], name='expense_board_date_idx'),
+            models.Index(fields=['board', 'category'], name='expense_board_category_idx'),
+            models.Index(fields=['board', 'created_by'], name='expense_board_creator_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['board', 'import_hash'],
+                condition=models.Q(import_hash__isnull=False),
+                name='unique_expense_import_hash',
+            ),
+        ]
+
+
+class BudgetTotal(models.Model):
+    """
+    Running total of a board's expenses per category, maintained by
+    Expense.save()/delete() so the budget summary does not aggregate the
+    expenses table. Bulk queryset updates/deletes bypass it; the
+    reconcile_budget_totals command rebuilds it and reports drift.
+    """
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='budget_totals')
+    category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    expense_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.category}: {self.total} ({self.board_id})"
+
+    @classmethod
+    def add(cls, board_id, category, amount, count):
+        """Atomically add amount/count to a (board, category) row, creating it if needed"""
+        changes = {'total': F('total') + amount, 'expense_count': F('expense_count') + count}
+        if cls.objects.filter(board_id=board_id, category=category).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(board_id=board_id, category=category, total=amount, expense_count=count)
+        except IntegrityError:
+            # Another transaction created the row first
+            cls.objects.filter(board_id=board_id, category=category).update(**changes)
+
+    @classmethod
+    def rebuild(cls, board_ids=None, dry_run=False):
+        """
+        Recompute totals from the expenses table. Returns the drifted rows as
+        ((board_id, category), stored, actual) with (total, count) pairs, and
+        rewrites the table unless dry_run.
+        """
+        zero = (Decimal('0.00'), 0)
+        expenses = Expense.objects.order_by()
+        totals = cls.objects.all()
+        if board_ids is not None:
+            expenses = expenses.filter(board_id__in=board_ids)
+            totals = totals.filter(board_id__in=board_ids)
+
+        with transaction.atomic():
+            # Lock the maintained rows so concurrent expense writes wait for the rebuild
+            stored = {(row.board_id, row.category): (row.total, row.expense_count) for row in totals.select_for_update()}
+            actual = {
+                (row['board_id'], row['category']): (row['total'], row['count'])
+                for row in expenses.values('board_id', 'category').annotate(total=Sum('board_amount'), count=Count('id'))
+            }
+            drift = [
+                (key, stored.get(key, zero), actual.get(key, zero))
+                for key in sorted(stored.keys() | actual.keys())
+                if stored.get(key, zero) != actual.get(key, zero)
+            ]
+            if not dry_run:
+                totals.delete()
+                cls.objects.bulk_create([
+                    cls(board_id=board_id, category=category, total=total, expense_count=count)
+                    for (board_id, category), (total, count) in actual.items()
+                ], batch_size=1000)
+        return drift
+
+    class Meta:
+        db_table = 'budget_totals'
+        ordering = ['category']
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'category'], name='unique_board_budget_category'),
+        ]
+
+
+class SpendingRollup(models.Model):
+    """
+    A board's spend per category and month, copied once for every member so a
+    user's cross-board dashboard is a single indexed read by user instead of
+    an aggregate over every board they belong to. Amounts are in the board's
+    currency. Kept current by Expense.save()/delete() and membership changes;
+    refresh_spending_rollups rebuilds it after bulk writes.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='spending_rollups')
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='spending_rollups')
+    category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
+    month = models.DateField(help_text="First day of the month")
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    expense_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id} {self.board_id} {self.category} {self.month:%Y-%m}: {self.total}"
+
+    @classmethod
+    def add(cls, board_id, category, day, amount, count):
+        """Add amount/count to the (board, category, month) row of every board member"""
+        if day is None:
+            return
+        month = day.replace(day=1)
+        member_ids = Board.members.through.objects.filter(board_id=board_id).values_list('user_id', flat=True)
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, board_id=board_id, category=category, month=month) for user_id in member_ids],
+            ignore_conflicts=True,
+        )
+        cls.objects.filter(board_id=board_id, category=category, month=month).update(
+            total=F('total') + amount,
+            expense_count=F('expense_count') + count,
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def rebuild(cls, user_ids=None, board_ids=None):
+        """Recompute the rows of the given users and/or boards (all rows when both are None)"""
+        memberships = Board.members.through.objects.all()
+        rows = cls.objects.all()
+        if user_ids is not None:
+            memberships = memberships.filter(user_id__in=user_ids)
+            rows = rows.filter(user_id__in=user_ids)
+        if board_ids is not None:
+            memberships = memberships.filter(board_id__in=board_ids)
+            rows = rows.filter(board_id__in=board_ids)
+
+        members = defaultdict(list)
+        for user_id, board_id in memberships.values_list('user_id', 'board_id'):
+            members[board_id].append(user_id)
+        spend = (
+            Expense.objects.filter(board_id__in=list(members), date__isnull=False)
+            .order_by()
+            .values('board_id', 'category', month=TruncMonth('date'))
+            .annotate(total=Sum('board_amount'), count=Count('id'))
+        )
+        with transaction.atomic():
+            rows.delete()
+            cls.objects.bulk_create([
+                cls(user_id=user_id, board_id=row['board_id'], category=row['category'], month=row['month'],
+                    total=row['total'], expense_count=row['count'])
+                for row in spend
+                for user_id in members[row['board_id']]
+            ], batch_size=1000)
+
+    class Meta:
+        db_table = 'spending_rollups'
+        ordering = ['month', 'category']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'board', 'category', 'month'], name='unique_spending_rollup'),
+        ]
+        indexes = [
+            # Expense writes update every member's copy of one (board, category, month)
+            models.Index(fields=['board', 'category', 'month'], name='spending_rollup_board_idx'),
+        ]
+
+
+class ExchangeRate(models.Model):
+    """Units of currency per one unit of EXCHANGE_RATE_BASE_CURRENCY on a given date"""
+    currency = models.CharField(max_length=3)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+
+    def __str__(self):
+        return f"{self.currency} {self.rate} ({self.date})"
+
+    class Meta:
+        db_table = 'exchange_rates'
+        ordering = ['currency', '-date']
+        constraints = [
+            models.UniqueConstraint(fields=['currency', 'date'], name='unique_exchange_rate_per_day'),
+        ]
+
+
+# Rate lookups live next to ExchangeRate so Expense.save can convert without
+# importing budget/currency.py (which imports this module); see there for the
+# conversion rules.
+CENTS = Decimal('0.01')
+
+
+class ExchangeRateMissing(ValueError):
+    """No rate is known for the currency on or before the requested date"""
+
+
+def base_currency():
+    return getattr(settings, 'EXCHANGE_RATE_BASE_CURRENCY', 'USD')
+
+
+@lru_cache(maxsize=4096)
+def _cached_rate(currency, on_date, generation):
+    return (
+        ExchangeRate.objects.filter(currency=currency, date__lte=on_date)
+        .order_by('-date')
+        .values_list('rate', flat=True)
+        .first()
+    )
+
+
+def get_rate(currency, on_date=None):
+    """Units of currency per one unit of the base currency on on_date"""
+    if currency == base_currency():
+        return Decimal('1')
+    on_date = on_date or timezone.now().date()
+    generation = int(time.monotonic() // getattr(settings, 'EXCHANGE_RATE_CACHE_SECONDS', 3600))
+    rate = _cached_rate(currency, on_date, generation)
+    if rate is None:
+        raise ExchangeRateMissing(f"No exchange rate for {currency} on or before {on_date}")
+    return rate
+
+
+def clear_rate_cache():
+    _cached_rate.cache_clear()
+
+
+def convert(amount, from_currency, to_currency, on_date=None):
+    amount = Decimal(amount)
+    if from_currency == to_currency:
+        return amount.quantize(CENTS, ROUND_HALF_UP)
+    converted = amount / get_rate(from_currency, on_date) * get_rate(to_currency, on_date)
+    return converted.quantize(CENTS, ROUND_HALF_UP)
+
+
+class ExpenseShare(models.Model):
+    """
+    Fraction of an expense owed by one board member. Shares are stored as
+    ratios of the expense so they stay correct when its amount or currency
+    changes; amounts owed are board_amount * ratio, computed in SQL.
+    """
+    expense = models.ForeignKey(Expense, on_delete=models.CASCADE, related_name='shares')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_shares')
+    ratio = models.DecimalField(max_digits=9, decimal_places=8)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.ratio} of {self.expense_id}"
+
+    class Meta:
+        db_table = 'expense_shares'
+        constraints = [
+            models.UniqueConstraint(fields=['expense', 'user'], name='unique_expense_share_user'),
+        ]
@@ -0,0 +1,76 @@
+from decimal import Decimal
+from django.db.models import Count, Sum, Window
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class ExpensePagination(PageNumberPagination):
+    """
+    Page-number pagination that also returns totals for the whole filtered set.
+    The count and sum ride along on the page query as COUNT(*) OVER () and
+    SUM(board_amount) OVER (), which are evaluated before LIMIT/OFFSET, so the
+    page, the count and the totals come back in a single query.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound("Invalid page.")
+        if self.page_number < 1:
+            raise NotFound("Invalid page.")
+
+        offset = (self.page_number - 1) * self.page_size_value
+        rows = list(
+            queryset.annotate(
+                filtered_count=Window(Count('id')),
+                filtered_total=Window(Sum('board_amount')),
+            )[offset:offset + self.page_size_value]
+        )
+        if rows:
+            self.count = rows[0].filtered_count
+            self.total = rows[0].filtered_total
+        elif self.page_number == 1:
+            self.count, self.total = 0, None
+        else:
+            raise NotFound("Invalid page.")
+        return rows
+
+    def get_next_link(self):
+        if self.page_number * self.page_size_value >= self.count:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page_number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_totals(self):
+        total = Decimal(self.total or 0).quantize(Decimal('0.01'))
+        return {'count': self.count, 'total': str(total)}
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'totals': self.get_totals(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response = super().get_paginated_response_schema(schema)
+        response['properties']['totals'] = {
+            'type': 'object',
+            'properties': {'count': {'type': 'integer'}, 'total': {'type': 'string'}},
+        }
+        return response
@@ -1,20 +1,110 @@
 from rest_framework import serializers
-from .models import Expense
+from django.utils import timezone
+from decimal import Decimal
+from .models import Expense, ExpenseShare, CATEGORY_CHOICES
+from .currency import get_rate, ExchangeRateMissing
 from users.serializers import UserSerializer
 
 
+class ExpenseShareSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExpenseShare
+        fields = ['user', 'ratio']
+
+
 class ExpenseSerializer(serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
+    shares = ExpenseShareSerializer(many=True, read_only=True)
 
     class Meta:
         model = Expense
         fields = [
-            'id', 'board', 'title', 'amount', 'category', 'date', 'notes',
-            'created_by', 'created_at', 'updated_at', 'currency'
+            'id', 'board', 'card', 'title', 'amount', 'category', 'date', 'notes',
+            'created_by', 'created_at', 'updated_at', 'currency', 'board_amount', 'paid_by', 'shares'
         ]
         read_only_fields = [
-            'id', 'board', 'created_by', 'created_at', 'updated_at', 'currency'
+            'id', 'board', 'created_by', 'created_at', 'updated_at', 'board_amount'
         ]
+        extra_kwargs = {
+            'currency': {'required': False, 'help_text': "Currency the expense was paid in; defaults to the board's"},
+            'paid_by': {'required': False, 'help_text': "Board member who paid; defaults to the creator"},
+        }
+
+    def validate_currency(self, value):
+        if not value or len(value.strip()) != 3:
+            raise serializers.ValidationError("Currency must be a 3-letter code (e.g., USD)")
+        return value.strip().upper()
+
+    def validate(self, attrs):
+        # Foreign-currency expenses need a rate to be converted into the board's currency
+        board = self.context.get('board')
+        currency = attrs.get('currency') or (self.instance.currency if self.instance else None)
+        if board is not None and currency and currency != board.currency:
+            on_date = attrs.get('date') or (self.instance.date if self.instance else None) or timezone.now().date()
+            try:
+                get_rate(currency, on_date)
+                get_rate(board.currency, on_date)
+            except ExchangeRateMissing as e:
+                raise serializers.ValidationError({'currency': str(e)})
+        return attrs
+
+    def validate_card(self, value):
+        board = self.context.get('board')
+        if value is not None and board is not None and value.list.board_id != board.id:
+            raise serializers.ValidationError("Card must belong to the expense's board.")
+        return value
+
+    def validate_paid_by(self, value):
+        board = self.context.get('board')
+        if value is not None and board is not None and not is_board_member(board, value):
+            raise serializers.ValidationError("Payer must be a member of the board.")
+        return value
+
+
+def is_board_member(board, user):
+    return user.pk == board.owner_id or board.members.filter(pk=user.pk).exists()
+
+
+class ExpenseSplitShareSerializer(serializers.Serializer):
+    user = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.00'))
+
+
+class ExpenseSplitSerializer(serializers.Serializer):
+    """
+    Either {"users": [ids]} to split equally, or {"shares": [{"user": id, "amount": "12.50"}]}
+    with amounts in the expense's board currency that add up to its board_amount.
+    """
+    users = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    shares = ExpenseSplitShareSerializer(many=True, required=False, allow_empty=False)
+
+    def validate(self, attrs):
+        if ('users' in attrs) == ('shares' in attrs):
+            raise serializers.ValidationError("Send either users or shares.")
+        expense = self.context['expense']
+        board = expense.board
+
+        user_ids = attrs['users'] if 'users' in attrs else [share['user'] for share in attrs['shares']]
+        if len(set(user_ids)) != len(user_ids):
+            raise serializers.ValidationError("Each user may appear only once.")
+        member_ids = set(board.members.values_list('id', flat=True)) | {board.owner_id}
+        outsiders = sorted(set(user_ids) - member_ids)
+        if outsiders:
+            raise serializers.ValidationError(f"Not members of the board: {', '.join(map(str, outsiders))}")
+
+        if 'users' in attrs:
+            ratio = Decimal(1) / len(user_ids)
+            attrs['ratios'] = {user_id: ratio for user_id in user_ids}
+        else:
+            total = sum((share['amount'] for share in attrs['shares']), Decimal('0.00'))
+            if total != expense.board_amount:
+                raise serializers.ValidationError(
+                    f"Share amounts add up to {total}, expected {expense.board_amount}."
+                )
+            if not total:
+                raise serializers.ValidationError("Cannot split a zero expense by amount.")
+            attrs['ratios'] = {share['user']: share['amount'] / total for share in attrs['shares']}
+        return attrs
 
 
 class BudgetSummaryByCategorySerializer(serializers.Serializer):
@@ -23,7 +113,150 @@ class BudgetSummaryByCategorySerializer(serializers.Serializer):
 
 
 class BudgetSummarySerializer(serializers.Serializer):
+    currency = serializers.CharField()
     board_budget = serializers.CharField()
     actual_spend_total = serializers.CharField()
     remaining = serializers.CharField()
-    by_category = BudgetSummaryByCategorySerializer(many=True)
\ No newline at end of file
+    by_category = BudgetSummaryByCategorySerializer(many=True)
+
+
+class BudgetTimeSeriesPointSerializer(serializers.Serializer):
+    period = serializers.DateField()
+    trip_day = serializers.IntegerField(allow_null=True)
+    spend = serializers.CharField()
+    cumulative = serializers.CharField()
+    remaining = serializers.CharField()
+
+
+class BudgetProjectionSerializer(serializers.Serializer):
+    daily_burn_rate = serializers.CharField()
+    projected_total = serializers.CharField()
+    projected_remaining = serializers.CharField()
+    projected_overrun_date = serializers.DateField(allow_null=True)
+
+
+class BudgetTimeSeriesSerializer(serializers.Serializer):
+    interval = serializers.CharField()
+    board_budget = serializers.CharField()
+    currency = serializers.CharField()
+    start_date = serializers.DateField(allow_null=True)
+    end_date = serializers.DateField(allow_null=True)
+    points = BudgetTimeSeriesPointSerializer(many=True)
+    projection = BudgetProjectionSerializer(allow_null=True)
+
+
+class ReconciliationRowSerializer(serializers.Serializer):
+    planned = serializers.CharField()
+    actual = serializers.CharField()
+    difference = serializers.CharField()
+    over_budget = serializers.BooleanField()
+
+
+class ReconciliationCategorySerializer(ReconciliationRowSerializer):
+    category = serializers.CharField()
+
+
+class ReconciliationListSerializer(ReconciliationRowSerializer):
+    list_id = serializers.IntegerField()
+    list_title = serializers.CharField()
+
+
+class ReconciliationCardSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    list_id = serializers.IntegerField()
+    planned = serializers.CharField()
+    actual = serializers.CharField()
+    over_by = serializers.CharField()
+
+
+class BudgetReconciliationSerializer(serializers.Serializer):
+    currency = serializers.CharField()
+    planned_total = serializers.CharField()
+    actual_total = serializers.CharField()
+    by_category = ReconciliationCategorySerializer(many=True)
+    by_list = ReconciliationListSerializer(many=True)
+    over_budget_cards = ReconciliationCardSerializer(many=True)
+
+
+class SettlementBalanceSerializer(serializers.Serializer):
+    user = serializers.IntegerField()
+    username = serializers.CharField()
+    paid = serializers.CharField()
+    owed = serializers.CharField()
+    net = serializers.CharField()
+
+
+class SettlementTransferSerializer(serializers.Serializer):
+    from_user = serializers.IntegerField()
+    to_user = serializers.IntegerField()
+    amount = serializers.CharField()
+
+
+class SettlementSerializer(serializers.Serializer):
+    currency = serializers.CharField()
+    balances = SettlementBalanceSerializer(many=True)
+    transfers = SettlementTransferSerializer(many=True)
+
+
+class ExpenseImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=['csv', 'ofx'], required=False,
+                                     help_text="Defaults to the file extension")
+    category = serializers.ChoiceField(choices=CATEGORY_CHOICES, default='misc',
+                                       help_text="Category for rows without a recognised category column")
+    currency = serializers.CharField(max_length=3, required=False,
+                                     help_text="Currency of rows without a currency column; defaults to the board's")
+    debits = serializers.ChoiceField(choices=['negative', 'positive'], default='negative',
+                                     help_text="Sign of spending rows in the file")
+    date_format = serializers.CharField(required=False, help_text="strptime format, e.g. %d/%m/%Y")
+    decimal_separator = serializers.ChoiceField(choices=['.', ','], required=False,
+                                                help_text="Detected from the amounts when not given")
+    date_column = serializers.CharField(required=False)
+    title_column = serializers.CharField(required=False)
+    amount_column = serializers.CharField(required=False)
+    currency_column = serializers.CharField(required=False)
+    category_column = serializers.CharField(required=False)
+    reference_column = serializers.CharField(required=False)
+
+
+class ExpenseImportErrorSerializer(serializers.Serializer):
+    line = serializers.IntegerField()
+    error = serializers.CharField()
+
+
+class ExpenseImportResultSerializer(serializers.Serializer):
+    imported = serializers.IntegerField()
+    duplicates = serializers.IntegerField()
+    skipped = serializers.IntegerField()
+    errors = ExpenseImportErrorSerializer(many=True)
+
+
+class SpendingTotalSerializer(serializers.Serializer):
+    total = serializers.CharField()
+    expense_count = serializers.IntegerField()
+
+
+class SpendingCategorySerializer(SpendingTotalSerializer):
+    category = serializers.CharField()
+
+
+class SpendingMonthSerializer(SpendingTotalSerializer):
+    month = serializers.CharField()  # YYYY-MM
+
+
+class SpendingBoardSerializer(SpendingTotalSerializer):
+    board = serializers.IntegerField()
+    title = serializers.CharField()
+    board_currency = serializers.CharField()
+    board_total = serializers.CharField()
+
+
+class SpendingDashboardSerializer(serializers.Serializer):
+    currency = serializers.CharField()
+    as_of = serializers.DateTimeField(allow_null=True)
+    total = serializers.CharField()
+    expense_count = serializers.IntegerField()
+    by_category = SpendingCategorySerializer(many=True)
+    by_month = SpendingMonthSerializer(many=True)
+    by_board = SpendingBoardSerializer(many=True)
@@ -0,0 +1,63 @@
+"""
+Group expense settlement.
+
+Balances come from two grouped queries over expense_shares: what each payer
+fronted for shared expenses and what each member owes. Transfers are found
+greedily: the largest debtor repeatedly pays the largest creditor, which
+needs at most n - 1 transfers for n members with a non-zero balance.
+"""
+import heapq
+from decimal import Decimal, ROUND_HALF_UP
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from .models import ExpenseShare
+
+CENTS = Decimal('0.01')
+
+
+def board_balances(board):
+    """Return {user_id: {'paid': Decimal, 'owed': Decimal}} for a board's shared expenses"""
+    owed_amount = ExpressionWrapper(
+        F('expense__board_amount') * F('ratio'),
+        output_field=DecimalField(max_digits=20, decimal_places=10),
+    )
+    shares = ExpenseShare.objects.filter(expense__board=board).order_by()
+
+    balances = {}
+    for row in shares.values('expense__paid_by').annotate(total=Sum(owed_amount)):
+        if row['expense__paid_by'] is not None:
+            balances.setdefault(row['expense__paid_by'], {'paid': Decimal('0'), 'owed': Decimal('0')})
+            balances[row['expense__paid_by']]['paid'] = Decimal(row['total'])
+    for row in shares.values('user').annotate(total=Sum(owed_amount)):
+        balances.setdefault(row['user'], {'paid': Decimal('0'), 'owed': Decimal('0')})
+        balances[row['user']]['owed'] = Decimal(row['total'])
+
+    for balance in balances.values():
+        balance['paid'] = balance['paid'].quantize(CENTS, ROUND_HALF_UP)
+        balance['owed'] = balance['owed'].quantize(CENTS, ROUND_HALF_UP)
+    return balances
+
+
+def minimal_transfers(net_balances):
+    """
+    Turn {user_id: net} (positive = is owed money) into [(debtor, creditor, amount)].
+    Works in integer cents; a rounding residue below one cent per member is dropped.
+    """
+    creditors, debtors = [], []
+    for user_id, net in net_balances.items():
+        cents = int((net / CENTS).to_integral_value(ROUND_HALF_UP))
+        if cents > 0:
+            heapq.heappush(creditors, (-cents, user_id))
+        elif cents < 0:
+            heapq.heappush(debtors, (cents, user_id))
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, Decimal(amount) * CENTS))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+    return transfers
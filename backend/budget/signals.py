@@ -1,13 +1,42 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_save
 from django.dispatch import receiver
-from .models import Expense
-from users.models import Notification
+from .models import Expense, SpendingRollup
+from .currency import redenominate_board
+from boards.models import Board
+from users.outbox import notify
 
 @receiver(post_save, sender=Expense)
 def create_expense_notification(sender, instance, created, **kwargs):
     if created:
-        Notification.objects.create(
-            user=instance.created_by,
+        notify(
+            [instance.created_by_id],
             title="Budget updated",
-            message=f"New expense '{instance.title}' of {instance.amount} {instance.currency} added to board '{instance.board.title}'."
+            message=f"New expense '{instance.title}' of {instance.amount} {instance.currency} added to board '{instance.board.title}'.",
+            kind='expense_added',
+            board=instance.board_id,
         )
+
+
+@receiver(post_save, sender=Board)
+def redenominate_expenses(sender, instance, created, **kwargs):
+    # Board.from_db remembers the currency as loaded
+    previous = getattr(instance, '_loaded_currency', None)
+    if not created and previous and previous != instance.currency:
+        redenominate_board(instance, previous)
+    instance._loaded_currency = instance.currency
+
+
+@receiver(m2m_changed, sender=Board.members.through)
+def sync_member_spending_rollups(sender, instance, action, reverse, pk_set, **kwargs):
+    """Give new members a copy of the board's spending rollups and drop removed members' copies"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action == 'post_clear':
+        field = 'user' if reverse else 'board'
+        SpendingRollup.objects.filter(**{field: instance}).delete()
+        return
+    user_ids, board_ids = (pk_set, [instance.pk]) if not reverse else ([instance.pk], pk_set)
+    if action == 'post_add':
+        SpendingRollup.rebuild(user_ids=user_ids, board_ids=board_ids)
+    else:
+        SpendingRollup.objects.filter(user_id__in=user_ids, board_id__in=board_ids).delete()
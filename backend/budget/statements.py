@@ -0,0 +1,273 @@
+"""
+Bank and card statement import.
+
+CSV and OFX files are parsed as a stream of rows, normalized into expenses
+and inserted with bulk_create in batches of EXPENSE_IMPORT_BATCH_SIZE. Each
+row gets a content hash (the OFX FITID, or date/amount/currency/title plus
+how many identical rows came before it in the file) that is unique per
+board, so importing an overlapping statement again only adds the new rows.
+Bulk inserts skip Expense.save() and its signals: board amounts, budget
+totals and spending rollups are filled in here and the user gets one summary notification.
+"""
+import csv
+import hashlib
+import re
+from collections import Counter, defaultdict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.db import transaction
+from boards.models import Board
+from users.outbox import notify
+from .currency import convert, ExchangeRateMissing
+from .models import BudgetTotal, Expense, SpendingRollup, CATEGORY_CHOICES
+
+# Header names recognised for each expense field when no mapping is given
+DEFAULT_COLUMNS = {
+    'date': ('date', 'transaction date', 'posted date', 'posting date', 'booking date'),
+    'title': ('description', 'payee', 'merchant', 'name', 'title', 'memo'),
+    'amount': ('amount', 'value', 'transaction amount'),
+    'currency': ('currency',),
+    'category': ('category',),
+    'reference': ('reference', 'id', 'transaction id'),
+}
+FIELDS = tuple(DEFAULT_COLUMNS)
+MAX_REPORTED_ERRORS = 20
+
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+class StatementError(ValueError):
+    """The file cannot be imported at all (unknown format, missing columns)"""
+
+
+def read_csv(stream, columns=None):
+    """Yield (line, {field: value}) for each data row of a CSV statement"""
+    reader = csv.DictReader(stream)
+    try:
+        fieldnames = reader.fieldnames or []
+    except csv.Error as e:
+        raise StatementError(f"Unreadable CSV header: {e}")
+    headers = {name.strip().lower(): name for name in fieldnames}
+    mapping = {}
+    for field in FIELDS:
+        wanted = (columns or {}).get(field)
+        candidates = (wanted.strip().lower(),) if wanted else DEFAULT_COLUMNS[field]
+        found = next((headers[name] for name in candidates if name in headers), None)
+        if wanted and found is None:
+            raise StatementError(f"Column '{wanted}' not found in the file")
+        if found is not None:
+            mapping[field] = found
+    missing = [field for field in ('date', 'title', 'amount') if field not in mapping]
+    if missing:
+        raise StatementError(f"No column found for: {', '.join(missing)}")
+
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            # e.g. a field over csv.field_size_limit(); the reader cannot resync after it
+            raise StatementError(f"Unreadable CSV at line {reader.line_num}: {e}")
+        yield reader.line_num, {field: (row.get(column) or '').strip() for field, column in mapping.items()}
+
+
+def read_ofx(stream):
+    """Yield (transaction number, {field: value}) for each STMTTRN of an OFX statement"""
+    currency = ''
+    entry = None
+    count = 0
+    for line in stream:
+        for closing, tag, value in OFX_TAG.findall(line):
+            tag, value = tag.upper(), value.strip()
+            if tag == 'CURDEF' and not closing:
+                currency = value
+            elif tag == 'STMTTRN':
+                if closing and entry is not None:
+                    count += 1
+                    yield count, {
+                        'date': entry.get('DTPOSTED', '')[:8],
+                        'title': entry.get('NAME') or entry.get('MEMO', ''),
+                        'amount': entry.get('TRNAMT', ''),
+                        'currency': currency,
+                        'reference': entry.get('FITID', ''),
+                    }
+                entry = None if closing else {}
+            elif entry is not None and not closing and value:
+                entry[tag] = value
+
+
+READERS = {'csv': read_csv, 'ofx': read_ofx}
+
+
+def parse_amount(value, decimal_separator=None):
+    """
+    Decimal of a statement amount such as "-1,234.56", "1.234,56" or "12,50".
+    The decimal separator is the last '.' or ','; the other one may only group
+    thousands. A single separator followed by exactly three digits ("1,234")
+    could be either, so it is rejected unless decimal_separator is given.
+    """
+    text = re.sub(r"[^\d,.\-+]", '', value)
+    match = re.fullmatch(r'([-+]?)(\d[\d.,]*|[.,]\d+)', text)
+    if match is None:
+        raise ValueError(f"Invalid amount '{value}'")
+    sign, digits = match.groups()
+    if decimal_separator is None:
+        last = max(digits.rfind('.'), digits.rfind(','))
+        separator = digits[last] if last >= 0 else '.'
+        other = ',' if separator == '.' else '.'
+        if last < 0 or other in digits or (digits.count(separator) == 1 and len(digits) - last - 1 != 3):
+            decimal_separator = separator
+        elif digits.count(separator) > 1:
+            decimal_separator = other  # "1,234,567": every separator groups thousands
+        else:
+            raise ValueError(f"Ambiguous amount '{value}': set the decimal separator")
+    group = ',' if decimal_separator == '.' else '.'
+    whole, _, fraction = digits.partition(decimal_separator)
+    if not re.fullmatch(r'\d*', fraction) or (
+        group in whole and not re.fullmatch(rf'\d{{1,3}}(\{group}\d{{3}})+', whole)
+    ):
+        raise ValueError(f"Invalid amount '{value}'")
+    return Decimal(f"{sign}{whole.replace(group, '') or '0'}.{fraction or '0'}")
+
+
+def parse_date(value, date_format=None):
+    if date_format:
+        return datetime.strptime(value, date_format).date()
+    if re.fullmatch(r'\d{8}', value):
+        return datetime.strptime(value, '%Y%m%d').date()
+    return datetime.strptime(value[:10], '%Y-%m-%d').date()
+
+
+def row_hash(row, occurrence):
+    if row.get('reference'):
+        key = f"ref:{row['reference']}"
+    else:
+        key = f"{row['date']}|{row['amount']}|{row['currency']}|{row['title'].lower()}|{occurrence}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class StatementImport:
+    """
+    Import rows from a statement into board's expenses on behalf of user.
+    With debits='negative' (bank/OFX convention) negative amounts are spending
+    and positive ones are refunds or payments and are skipped; 'positive'
+    is the reverse, as most card exports list purchases.
+    """
+
+    def __init__(self, board, user, category='misc', currency=None, debits='negative',
+                 date_format=None, decimal_separator=None, batch_size=None):
+        self.board = board
+        self.user = user
+        self.category = category
+        self.currency = (currency or board.currency).upper()
+        self.sign = Decimal(-1) if debits == 'negative' else Decimal(1)
+        self.date_format = date_format
+        self.decimal_separator = decimal_separator
+        self.batch_size = batch_size or getattr(settings, 'EXPENSE_IMPORT_BATCH_SIZE', 500)
+        self.categories = {value for value, _ in CATEGORY_CHOICES}
+        self.result = {'imported': 0, 'duplicates': 0, 'skipped': 0, 'errors': []}
+
+    def run(self, rows):
+        occurrences = Counter()
+        pending = {}
+        for line, row in rows:
+            try:
+                expense = self.build(row)
+            except (ValueError, InvalidOperation, ExchangeRateMissing) as e:
+                self.error(line, e)
+                continue
+            if expense is None:
+                self.result['skipped'] += 1
+                continue
+            content = (row['date'], row['amount'], expense.currency, row['title'].lower())
+            occurrences[content] += 1
+            expense.import_hash = row_hash({**row, 'currency': expense.currency}, occurrences[content])
+            if expense.import_hash in pending:
+                self.result['duplicates'] += 1
+                continue
+            pending[expense.import_hash] = expense
+            if len(pending) >= self.batch_size:
+                self.flush(pending)
+                pending = {}
+        if pending:
+            self.flush(pending)
+
+        if self.result['imported']:
+            notify(
+                [self.user.pk],
+                title="Budget updated",
+                message=f"Imported {self.result['imported']} expenses into board '{self.board.title}'.",
+                kind='expenses_imported',
+                board=self.board,
+            )
+        return self.result
+
+    def error(self, line, exc):
+        self.result['skipped'] += 1
+        if len(self.result['errors']) < MAX_REPORTED_ERRORS:
+            self.result['errors'].append({'line': line, 'error': str(exc)})
+
+    def build(self, row):
+        """An unsaved Expense for a spending row, or None for credits and zero rows"""
+        amount = (parse_amount(row['amount'], self.decimal_separator) * self.sign).quantize(Decimal('0.01'))
+        if amount <= 0:
+            return None
+        if not row['title']:
+            raise ValueError("Missing description")
+        day = parse_date(row['date'], self.date_format)
+        currency = (row.get('currency') or self.currency).upper()
+        category = (row.get('category') or '').lower()
+        return Expense(
+            board=self.board,
+            title=row['title'][:200],
+            amount=amount,
+            category=category if category in self.categories else self.category,
+            date=day,
+            currency=currency,
+            board_amount=convert(amount, currency, self.board.currency, day),
+            created_by=self.user,
+            paid_by=self.user,
+        )
+
+    def flush(self, pending):
+        with transaction.atomic():
+            # Serialize imports into the same board so the duplicate check holds
+            Board.objects.select_for_update().filter(pk=self.board.pk).exists()
+            existing = set(
+                Expense.objects.filter(board=self.board, import_hash__in=list(pending))
+                .values_list('import_hash', flat=True)
+            )
+            new = [expense for key, expense in pending.items() if key not in existing]
+            Expense.objects.bulk_create(new)
+
+            totals = defaultdict(lambda: [Decimal('0.00'), 0])
+            months = defaultdict(lambda: [Decimal('0.00'), 0])
+            for expense in new:
+                totals[expense.category][0] += expense.board_amount
+                totals[expense.category][1] += 1
+                months[(expense.category, expense.date.replace(day=1))][0] += expense.board_amount
+                months[(expense.category, expense.date.replace(day=1))][1] += 1
+            for category, (amount, count) in totals.items():
+                BudgetTotal.add(self.board.pk, category, amount, count)
+            for (category, month), (amount, count) in months.items():
+                SpendingRollup.add(self.board.pk, category, month, amount, count)
+
+        self.result['imported'] += len(new)
+        self.result['duplicates'] += len(existing)
+
+
+def detect_format(filename, requested=None):
+    fmt = (requested or filename.rsplit('.', 1)[-1]).lower()
+    if fmt in ('qfx',):
+        fmt = 'ofx'
+    if fmt not in READERS:
+        raise StatementError(f"Unsupported statement format: {fmt}")
+    return fmt
+
+
+def import_statement(board, user, stream, fmt, columns=None, **options):
+    """Import a text stream in format fmt ('csv' or 'ofx'); returns the summary dict"""
+    rows = read_csv(stream, columns) if fmt == 'csv' else read_ofx(stream)
+    return StatementImport(board, user, **options).run(rows)
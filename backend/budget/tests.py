@@ -1,3 +1,451 @@
-from django.test import TestCase
+import csv
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from boards.models import Board, Card
+from .currency import ExchangeRateMissing, clear_rate_cache
+from .models import Expense, BudgetTotal, ExchangeRate, SpendingRollup
+from .statements import parse_amount
 
-# Create your tests here.
+User = get_user_model()
+
+
+class BudgetAPITestCase(APITestCase):
+    """Shared fixtures: an owner with one board that has a budget."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(title='Lisbon', owner=self.owner, budget=Decimal('1000.00'))
+        self.client.force_authenticate(user=self.owner)
+
+    def add_expense(self, amount, category='food', **kwargs):
+        return Expense.objects.create(
+            board=self.board, title='Expense', amount=Decimal(amount), category=category,
+            created_by=self.owner, **kwargs
+        )
+
+
+class BudgetTotalsTest(BudgetAPITestCase):
+    """Test cases for incrementally maintained budget totals."""
+
+    def totals(self):
+        return {
+            row.category: (row.total, row.expense_count)
+            for row in BudgetTotal.objects.filter(board=self.board) if row.expense_count
+        }
+
+    def test_totals_follow_create_update_delete(self):
+        lunch = self.add_expense('20.00')
+        self.add_expense('30.00')
+        self.assertEqual(self.totals(), {'food': (Decimal('50.00'), 2)})
+
+        lunch.amount = Decimal('25.00')
+        lunch.category = 'misc'
+        lunch.save()
+        self.assertEqual(self.totals(), {'food': (Decimal('30.00'), 1), 'misc': (Decimal('25.00'), 1)})
+
+        Expense.objects.get(pk=lunch.pk).delete()
+        self.assertEqual(self.totals(), {'food': (Decimal('30.00'), 1)})
+
+    def test_summary_reads_totals(self):
+        self.add_expense('200.00', category='lodging')
+        self.add_expense('50.00')
+        response = self.client.get(reverse('board-budget-summary', args=[self.board.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['actual_spend_total'], '250.00')
+        self.assertEqual(response.data['remaining'], '750.00')
+        self.assertEqual(response.data['by_category'], [
+            {'category': 'food', 'total': '50.00'},
+            {'category': 'lodging', 'total': '200.00'},
+        ])
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        self.add_expense('20.00')
+        Expense.objects.filter(board=self.board).update(amount=Decimal('99.00'), board_amount=Decimal('99.00'))
+
+        out = StringIO()
+        call_command('reconcile_budget_totals', '--dry-run', stdout=out)
+        self.assertIn('Found 1 drifted', out.getvalue())
+        self.assertEqual(self.totals(), {'food': (Decimal('20.00'), 1)})
+
+        call_command('reconcile_budget_totals', stdout=StringIO())
+        self.assertEqual(self.totals(), {'food': (Decimal('99.00'), 1)})
+
+
+class BudgetTimeSeriesTest(BudgetAPITestCase):
+    """Test cases for the spend-over-time endpoint."""
+
+    def setUp(self):
+        super().setUp()
+        today = timezone.now().date()
+        self.board.start_date = today - timedelta(days=1)
+        self.board.end_date = today + timedelta(days=2)
+        self.board.save()
+        self.add_expense('100.00', date=self.board.start_date)
+        self.add_expense('50.00', date=self.board.start_date)
+        self.add_expense('150.00', date=today)
+        self.url = reverse('board-budget-timeseries', args=[self.board.pk])
+
+    def test_daily_cumulative_spend(self):
+        response = self.client.get(self.url, {'interval': 'trip_day'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        points = response.data['points']
+        self.assertEqual([p['trip_day'] for p in points], [1, 2])
+        self.assertEqual([p['spend'] for p in points], ['150.00', '150.00'])
+        self.assertEqual([p['cumulative'] for p in points], ['150.00', '300.00'])
+        self.assertEqual(points[-1]['remaining'], '700.00')
+        self.assertIsNone(response.data['projection'])
+
+    def test_projection(self):
+        response = self.client.get(self.url, {'projection': 'true'})
+        projection = response.data['projection']
+        self.assertEqual(projection['daily_burn_rate'], '150.00')
+        self.assertEqual(projection['projected_total'], '600.00')
+        self.assertEqual(projection['projected_remaining'], '400.00')
+        self.assertIsNone(projection['projected_overrun_date'])
+
+    def test_invalid_interval(self):
+        response = self.client.get(self.url, {'interval': 'hour'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BudgetReconciliationTest(BudgetAPITestCase):
+    """Test cases for the planned vs actual report."""
+
+    def test_planned_vs_actual(self):
+        first_list = self.board.lists.get(position=0)
+        flight = Card.objects.create(list=first_list, title='Flight', category='flight', budget=Decimal('300.00'))
+        Card.objects.create(list=first_list, title='Hotel', category='hotel', budget=Decimal('500.00'))
+        self.add_expense('350.00', category='travel', card=flight)
+        self.add_expense('40.00', category='food')
+
+        response = self.client.get(reverse('board-budget-reconciliation', args=[self.board.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        by_category = {row['category']: row for row in response.data['by_category']}
+        self.assertEqual(by_category['travel']['planned'], '300.00')
+        self.assertEqual(by_category['travel']['actual'], '350.00')
+        self.assertTrue(by_category['travel']['over_budget'])
+        self.assertFalse(by_category['lodging']['over_budget'])
+        self.assertTrue(by_category['food']['over_budget'])
+        self.assertEqual(response.data['by_list'][0]['planned'], '800.00')
+        self.assertEqual(response.data['by_list'][0]['actual'], '350.00')
+        self.assertEqual(
+            [(c['title'], c['over_by']) for c in response.data['over_budget_cards']],
+            [('Flight', '50.00')]
+        )
+
+
+class MultiCurrencyTest(BudgetAPITestCase):
+    """Test cases for foreign-currency expenses and re-denomination."""
+
+    def setUp(self):
+        super().setUp()
+        clear_rate_cache()
+        self.today = timezone.now().date()
+        ExchangeRate.objects.bulk_create([
+            ExchangeRate(currency='USD', date=self.today, rate=Decimal('1')),
+            ExchangeRate(currency='EUR', date=self.today, rate=Decimal('0.5')),
+        ])
+
+    def test_foreign_expense_is_converted_to_board_currency(self):
+        url = reverse('board-expenses', args=[self.board.pk])
+        response = self.client.post(url, {'title': 'Dinner', 'amount': '10.00', 'category': 'food', 'currency': 'eur'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['currency'], 'EUR')
+        self.assertEqual(response.data['board_amount'], '20.00')
+
+        response = self.client.get(reverse('board-budget-summary', args=[self.board.pk]), {'currency': 'EUR'})
+        self.assertEqual(response.data['actual_spend_total'], '10.00')
+        self.assertEqual(response.data['board_budget'], '500.00')
+
+    def test_unknown_currency_is_rejected(self):
+        url = reverse('board-expenses', args=[self.board.pk])
+        response = self.client.post(url, {'title': 'Dinner', 'amount': '10.00', 'category': 'food', 'currency': 'JPY'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_changing_board_currency_redenominates(self):
+        self.add_expense('10.00')
+        self.add_expense('4.00', currency='EUR')
+        self.board.currency = 'EUR'
+        self.board.save()
+        amounts = sorted(Expense.objects.filter(board=self.board).values_list('board_amount', flat=True))
+        self.assertEqual(amounts, [Decimal('4.00'), Decimal('5.00')])
+        total = BudgetTotal.objects.get(board=self.board, category='food')
+        self.assertEqual(total.total, Decimal('9.00'))
+
+    def test_currency_change_without_rates_is_rejected(self):
+        self.add_expense('4.00', currency='EUR')
+        response = self.client.patch(reverse('board-detail', args=[self.board.pk]), {'currency': 'GBP'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('currency', response.data)
+
+        self.board.currency = 'GBP'
+        with self.assertRaises(ExchangeRateMissing):
+            self.board.save()
+        self.board.refresh_from_db()
+        self.assertEqual(self.board.currency, 'USD')
+        self.assertEqual(Expense.objects.get(board=self.board).board_amount, Decimal('8.00'))
+
+    def test_base_currency_needs_no_stored_rate(self):
+        self.add_expense('10.00')
+        self.add_expense('4.00', currency='EUR')
+        ExchangeRate.objects.filter(currency='USD').delete()
+        clear_rate_cache()
+        response = self.client.patch(reverse('board-detail', args=[self.board.pk]), {'currency': 'EUR'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        amounts = sorted(Expense.objects.filter(board=self.board).values_list('board_amount', flat=True))
+        self.assertEqual(amounts, [Decimal('4.00'), Decimal('5.00')])
+
+        board = Board.objects.get(pk=self.board.pk)
+        board.currency = 'USD'
+        board.save()
+        amounts = sorted(Expense.objects.filter(board=self.board).values_list('board_amount', flat=True))
+        self.assertEqual(amounts, [Decimal('8.00'), Decimal('10.00')])
+
+    def test_expense_without_rate_fails_validation(self):
+        expense = Expense(board=self.board, title='Sushi', amount=Decimal('10.00'), category='food', currency='JPY')
+        with self.assertRaises(ValidationError) as raised:
+            expense.full_clean()
+        self.assertIn('currency', raised.exception.message_dict)
+        with self.assertRaises(ValidationError):
+            expense.save()
+
+    def test_load_exchange_rates_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write('date,currency,rate\n2025-01-01,gbp,0.8\n')
+        call_command('load_exchange_rates', handle.name, stdout=StringIO())
+        os.unlink(handle.name)
+        self.assertEqual(ExchangeRate.objects.get(currency='GBP').rate, Decimal('0.8'))
+        self.assertTrue(ExchangeRate.objects.filter(currency='USD', date='2025-01-01').exists())
+
+
+class ExpenseSettlementTest(BudgetAPITestCase):
+    """Test cases for expense splitting and settlement."""
+
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pass12345')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pass12345')
+        self.board.members.add(self.alice, self.bob)
+
+    def split(self, expense, payload):
+        return self.client.put(reverse('expense-splits', args=[expense.pk]), payload, format='json')
+
+    def test_equal_and_amount_splits_settle(self):
+        hotel = self.add_expense('90.00')
+        response = self.split(hotel, {'users': [self.owner.pk, self.alice.pk, self.bob.pk]})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['shares']), 3)
+
+        dinner = self.add_expense('30.00', paid_by=self.alice)
+        response = self.split(dinner, {'shares': [
+            {'user': self.alice.pk, 'amount': '10.00'},
+            {'user': self.bob.pk, 'amount': '20.00'},
+        ]})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse('board-budget-settlement', args=[self.board.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        net = {row['user']: row['net'] for row in response.data['balances']}
+        self.assertEqual(net, {self.owner.pk: '60.00', self.alice.pk: '-10.00', self.bob.pk: '-50.00'})
+        transfers = {(t['from_user'], t['to_user']): t['amount'] for t in response.data['transfers']}
+        self.assertEqual(transfers, {(self.bob.pk, self.owner.pk): '50.00', (self.alice.pk, self.owner.pk): '10.00'})
+
+    def test_split_rejects_non_members_and_wrong_totals(self):
+        outsider = User.objects.create_user(username='eve', email='eve@example.com', password='pass12345')
+        expense = self.add_expense('30.00')
+        response = self.split(expense, {'users': [self.owner.pk, outsider.pk]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.split(expense, {'shares': [{'user': self.alice.pk, 'amount': '10.00'}]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(expense.shares.exists())
+
+
+class StatementImportTest(BudgetAPITestCase):
+    """Test cases for CSV/OFX statement import."""
+
+    CSV = (
+        'Date,Description,Amount\n'
+        '2025-03-01,Pastelaria,-4.50\n'
+        '2025-03-01,Pastelaria,-4.50\n'
+        '2025-03-02,Refund,12.00\n'
+        'not a date,Taxi,-9.00\n'
+    )
+    OFX = (
+        '<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>USD\n'
+        '<BANKTRANLIST>\n'
+        '<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250303120000<TRNAMT>-20.00<FITID>A1<NAME>Museum</STMTTRN>\n'
+        '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+    )
+
+    def upload(self, name, content, **extra):
+        url = reverse('board-expenses-import', args=[self.board.pk])
+        return self.client.post(url, {'file': SimpleUploadedFile(name, content.encode()), **extra}, format='multipart')
+
+    def test_csv_import_is_idempotent(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.upload('statement.csv', self.CSV, category='food')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual(response.data['skipped'], 2)
+        self.assertEqual(response.data['errors'][0]['line'], 5)
+
+        response = self.upload('statement.csv', self.CSV, category='food')
+        self.assertEqual(response.data['imported'], 0)
+        self.assertEqual(response.data['duplicates'], 2)
+
+        total = BudgetTotal.objects.get(board=self.board, category='food')
+        self.assertEqual((total.total, total.expense_count), (Decimal('9.00'), 2))
+        self.assertEqual(self.owner.notifications.filter(message__startswith='Imported').count(), 1)
+
+    def test_amount_separators(self):
+        for value, expected in [('12,50', '12.50'), ('1.234,56', '1234.56'), ('-1,234.56', '-1234.56'),
+                                ('1,234,567', '1234567'), ('€ 9.99', '9.99')]:
+            self.assertEqual(parse_amount(value), Decimal(expected), value)
+        for value in ['1,234', '1.2.3', '1,23,456.00', 'n/a']:
+            with self.assertRaises(ValueError):
+                parse_amount(value)
+        self.assertEqual(parse_amount('1,234', decimal_separator=','), Decimal('1.234'))
+
+        response = self.upload('statement.csv', 'date,description,amount\n2025-03-01,Hotel,"-1.234,50"\n',
+                               category='lodging', decimal_separator=',')
+        self.assertEqual(response.data['imported'], 1)
+        self.assertEqual(Expense.objects.get(board=self.board).amount, Decimal('1234.50'))
+
+    def test_oversized_csv_field_is_rejected(self):
+        response = self.upload('statement.csv', 'date,description,amount\n2025-03-01,' + 'x' * 200000 + ',-1.00\n')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('file', response.data)
+        response = self.upload('statement.csv', 'date,' + 'x' * 200000 + ',amount\n')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ofx_import_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ofx', delete=False) as handle:
+            handle.write(self.OFX)
+        call_command('import_statement', self.board.pk, handle.name, user=self.owner.email, stdout=StringIO())
+        call_command('import_statement', self.board.pk, handle.name, user=self.owner.email, stdout=StringIO())
+        os.unlink(handle.name)
+        expense = Expense.objects.get(board=self.board)
+        self.assertEqual((expense.title, expense.amount, str(expense.date)), ('Museum', Decimal('20.00'), '2025-03-03'))
+
+
+class ExpenseQueryTest(BudgetAPITestCase):
+    """Test cases for expense list filters and filtered totals."""
+
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create_user(username='alice', email='alice@example.com', password='pass12345')
+        self.board.members.add(self.other)
+        self.add_expense('10.00', category='travel', notes='Tram ticket')
+        self.add_expense('25.00', category='food', notes='Dinner at the tasca')
+        self.add_expense('80.00', category='lodging')
+        Expense.objects.create(board=self.board, title='Fado', amount=Decimal('40.00'), category='activities',
+                               created_by=self.other)
+        self.url = reverse('board-expenses', args=[self.board.pk])
+
+    def test_filters_and_totals(self):
+        response = self.client.get(self.url, {'category': 'food,lodging', 'min_amount': '20', 'created_by': 'me'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['totals'], {'count': 2, 'total': '105.00'})
+
+        response = self.client.get(self.url, {'search': 'tasca'})
+        self.assertEqual([row['amount'] for row in response.data['results']], ['25.00'])
+
+        response = self.client.get(self.url, {'created_by': self.other.pk, 'max_amount': '50'})
+        self.assertEqual(response.data['totals']['total'], '40.00')
+
+    def test_page_and_totals_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        expense_selects = [q for q in queries if 'FROM "expenses"' in q['sql']]
+        self.assertEqual(len(expense_selects), 1)
+        self.assertEqual(response.data['totals'], {'count': 4, 'total': '155.00'})
+
+    def test_invalid_filters_are_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'category': 'space'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'min_amount': 'lots'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'date_from': '2025-13-01'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SpendingDashboardTest(BudgetAPITestCase):
+    """Test cases for the cross-board spending dashboard."""
+
+    def setUp(self):
+        super().setUp()
+        self.member = User.objects.create_user(username='alice', email='alice@example.com', password='pass12345')
+        self.porto = Board.objects.create(title='Porto', owner=self.member, budget=Decimal('300.00'))
+        self.url = reverse('spending-dashboard')
+
+    def test_rollups_follow_expense_writes_and_membership(self):
+        expense = self.add_expense('30.00', date=timezone.now().date().replace(day=1))
+        self.add_expense('20.00', category='lodging')
+        Expense.objects.create(board=self.porto, title='Wine', amount=Decimal('15.00'), category='food',
+                               created_by=self.member)
+        expense.amount = Decimal('35.00')
+        expense.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['total'], response.data['expense_count']), ('55.00', 2))
+        self.assertIsNotNone(response.data['as_of'])
+
+        self.porto.members.add(self.owner)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['total'], '70.00')
+        food = next(row for row in response.data['by_category'] if row['category'] == 'food')
+        self.assertEqual((food['total'], food['expense_count']), ('50.00', 2))
+        self.assertEqual(sorted(row['title'] for row in response.data['by_board']), ['Lisbon', 'Porto'])
+
+        self.porto.members.remove(self.owner)
+        self.assertEqual(self.client.get(self.url).data['total'], '55.00')
+
+    def test_refresh_command_rebuilds_rollups(self):
+        self.add_expense('30.00')
+        SpendingRollup.objects.all().delete()
+        call_command('refresh_spending_rollups', stdout=StringIO())
+        self.assertEqual(self.client.get(self.url).data['total'], '30.00')
+
+
+class BudgetAnalyticsCommandTest(BudgetAPITestCase):
+    """Test cases for the fleet-wide analytics command."""
+
+    def test_writes_grouped_statistics(self):
+        today = timezone.now().date()
+        self.board.start_date, self.board.end_date = today, today + timedelta(days=4)
+        self.board.budget = Decimal('50.00')
+        self.board.save()
+        for amount in ('10.00', '20.00', '30.00'):
+            self.add_expense(amount)
+
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('budget_analytics', os.path.join(directory, 'stats.npz'), chunk_size=2, stdout=StringIO())
+            results = np.load(os.path.join(directory, 'stats.npz'))
+            food = list(results['category_names']).index('food')
+            self.assertEqual(results['category_counts'][food], 3)
+            self.assertAlmostEqual(results['category_quantiles'][food][2], 20.0, delta=0.5)
+            trip = list(results['trip_length_names']).index('4-7')
+            self.assertEqual(results['trip_length_overrun_rate'][trip], 1.0)
+
+            call_command('budget_analytics', os.path.join(directory, 'stats.csv'), stdout=StringIO())
+            with open(os.path.join(directory, 'stats.csv')) as handle:
+                rows = list(csv.DictReader(handle))
+            food_row = next(row for row in rows if row['dimension'] == 'category' and row['group'] == 'food')
+            self.assertEqual(food_row['count'], '3')
@@ -4,10 +4,28 @@ from . import views
 urlpatterns = [
     # Expenses for a board
     path('boards/<int:board_id>/expenses/', views.ExpenseListCreateView.as_view(), name='board-expenses'),
+
+    # Bank/card statement import (CSV or OFX)
+    path('boards/<int:board_id>/expenses/import/', views.ExpenseImportView.as_view(), name='board-expenses-import'),
     
     # Expense detail (global, not nested under board)
     path('expenses/<int:pk>/', views.ExpenseDetailView.as_view(), name='expense-detail'),
+
+    # How an expense is split between board members
+    path('expenses/<int:pk>/splits/', views.ExpenseSplitView.as_view(), name='expense-splits'),
     
     # Budget summary for a board
     path('boards/<int:board_id>/budget/summary/', views.BoardBudgetSummaryView.as_view(), name='board-budget-summary'),
+
+    # Spend over time / burn-down for a board
+    path('boards/<int:board_id>/budget/timeseries/', views.BoardBudgetTimeSeriesView.as_view(), name='board-budget-timeseries'),
+
+    # Planned (card budgets) vs actual (expenses) for a board
+    path('boards/<int:board_id>/budget/reconciliation/', views.BoardBudgetReconciliationView.as_view(), name='board-budget-reconciliation'),
+
+    # Who owes whom for the board's split expenses
+    path('boards/<int:board_id>/budget/settlement/', views.BoardSettlementView.as_view(), name='board-budget-settlement'),
+
+    # The current user's spend across all their boards
+    path('spending/', views.SpendingDashboardView.as_view(), name='spending-dashboard'),
 ]
\ No newline at end of file
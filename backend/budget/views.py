@@ -1,47 +1,104 @@
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, status
 from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.db.models import Sum
-from decimal import Decimal
-from .models import Expense
-from .serializers import ExpenseSerializer, BudgetSummarySerializer
-from boards.models import Board
+from django.db import transaction
+from django.db.models import DecimalField, Func, Q, Sum, Window
+from django.db.models.functions import TruncDay, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+import io
+from decimal import Decimal, ROUND_HALF_UP
+from .models import Expense, ExpenseShare, SpendingRollup, CATEGORY_CHOICES, CARD_CATEGORY_TO_EXPENSE_CATEGORY
+from .currency import base_currency, convert, ExchangeRateMissing
+from .pagination import ExpensePagination
+from .settlement import board_balances, minimal_transfers
+from .statements import FIELDS, StatementError, detect_format, import_statement
+from .serializers import (
+    ExpenseSerializer, BudgetSummarySerializer, BudgetTimeSeriesSerializer, BudgetReconciliationSerializer,
+    ExpenseSplitSerializer, SettlementSerializer, ExpenseImportSerializer, ExpenseImportResultSerializer,
+    SpendingDashboardSerializer,
+)
+from boards.models import Board, Card
+from users.models import User
 from boards.permissions import IsBoardOwnerOrMember
+from boards.mixins import IdempotentCreateMixin
 
 
-class ExpenseListCreateView(generics.ListCreateAPIView):
+class ExpenseListCreateView(IdempotentCreateMixin, generics.ListCreateAPIView):
+    """
+    Board expenses, filtered by ?category= (comma-separated), ?date_from=,
+    ?date_to=, ?min_amount=, ?max_amount=, ?created_by=<id|me> and ?search=.
+    Each page carries the count and total of the whole filtered set.
+    """
     serializer_class = ExpenseSerializer
     permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+    pagination_class = ExpensePagination
 
     def get_queryset(self):
         board = get_object_or_404(Board, pk=self.kwargs['board_id'])
         self.check_object_permissions(self.request, board)
-        queryset = Expense.objects.filter(board=board)
+        queryset = Expense.objects.filter(board=board).prefetch_related('shares')
+        params = self.request.query_params
 
-        # Apply filters
-        category = self.request.query_params.get('category')
-        date_from = self.request.query_params.get('date_from')
-        date_to = self.request.query_params.get('date_to')
+        # ?category=food,lodging or repeated ?category=
+        categories = {value for param in params.getlist('category') for value in param.split(',') if value}
+        if categories:
+            unknown = categories - {value for value, _ in CATEGORY_CHOICES}
+            if unknown:
+                raise ValidationError({'category': f"Unknown categories: {', '.join(sorted(unknown))}"})
+            queryset = queryset.filter(category__in=categories)
 
-        if category:
-            queryset = queryset.filter(category=category)
+        date_from = self.parse_param('date_from', parse_date)
+        date_to = self.parse_param('date_to', parse_date)
+        if date_from and date_to and date_from > date_to:
+            raise ValidationError("date_from must be before or equal to date_to")
         if date_from:
             queryset = queryset.filter(date__gte=date_from)
         if date_to:
             queryset = queryset.filter(date__lte=date_to)
-        if date_from and date_to and date_from > date_to:
-            raise ValidationError("date_from must be before or equal to date_to")
+
+        # Amounts are compared in the board's currency
+        min_amount = self.parse_param('min_amount', Decimal)
+        max_amount = self.parse_param('max_amount', Decimal)
+        if min_amount is not None:
+            queryset = queryset.filter(board_amount__gte=min_amount)
+        if max_amount is not None:
+            queryset = queryset.filter(board_amount__lte=max_amount)
+
+        created_by = params.get('created_by')
+        if created_by == 'me':
+            queryset = queryset.filter(created_by=self.request.user)
+        elif created_by:
+            queryset = queryset.filter(created_by=self.parse_param('created_by', int))
+
+        search = params.get('search', '').strip()
+        if search:
+            queryset = queryset.filter(Q(title__icontains=search) | Q(notes__icontains=search))
 
         return queryset
 
+    def parse_param(self, name, parse):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            parsed = parse(value)
+        except (ValueError, ArithmeticError):
+            parsed = None
+        if parsed is None:
+            raise ValidationError({name: f"Invalid value: {value}"})
+        return parsed
+
     def perform_create(self, serializer):
         board = get_object_or_404(Board, pk=self.kwargs['board_id'])
         self.check_object_permissions(self.request, board)
         serializer.save(
             board=board,
             created_by=self.request.user,
-            currency=board.currency
+            currency=serializer.validated_data.get('currency') or board.currency
         )
 
     def get_serializer_context(self):
@@ -50,6 +107,40 @@ class ExpenseListCreateView(generics.ListCreateAPIView):
         return context
 
 
+class ExpenseImportView(generics.GenericAPIView):
+    """
+    Import a CSV or OFX statement into the board's expenses (multipart upload).
+    Rows already imported are skipped; see budget/statements.py.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+    serializer_class = ExpenseImportSerializer
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request, *args, **kwargs):
+        board = get_object_or_404(Board, pk=self.kwargs['board_id'])
+        self.check_object_permissions(request, board)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        upload = data['file']
+        columns = {field: data[f'{field}_column'] for field in FIELDS if data.get(f'{field}_column')}
+        try:
+            fmt = detect_format(upload.name, data.get('format'))
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', errors='replace', newline='')
+            result = import_statement(
+                board, request.user, stream, fmt, columns,
+                category=data['category'],
+                currency=data.get('currency'),
+                debits=data['debits'],
+                date_format=data.get('date_format'),
+                decimal_separator=data.get('decimal_separator'),
+            )
+        except StatementError as e:
+            raise ValidationError({'file': str(e)})
+        return Response(ExpenseImportResultSerializer(result).data)
+
+
 class ExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ExpenseSerializer
     permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
@@ -62,12 +153,6 @@ class ExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
         self.check_object_permissions(self.request, obj)
         return obj
 
-    def perform_update(self, serializer):
-        board = serializer.instance.board
-        if 'currency' in serializer.validated_data and serializer.validated_data['currency'] != board.currency:
-            raise ValidationError("Currency must match the board's currency.")
-        serializer.save()
-
     def get_serializer_context(self):
         context = super().get_serializer_context()
         if self.get_object():
@@ -75,6 +160,35 @@ class ExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
         return context
 
 
+class ExpenseSplitView(generics.GenericAPIView):
+    """Replace (PUT) or clear (DELETE) how an expense is split between board members"""
+    permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+    serializer_class = ExpenseSplitSerializer
+
+    def get_object(self):
+        obj = get_object_or_404(Expense.objects.select_related('board'), pk=self.kwargs['pk'])
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def put(self, request, *args, **kwargs):
+        expense = self.get_object()
+        serializer = self.get_serializer(data=request.data, context={'request': request, 'expense': expense})
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            expense.shares.all().delete()
+            ExpenseShare.objects.bulk_create([
+                ExpenseShare(expense=expense, user_id=user_id, ratio=ratio)
+                for user_id, ratio in serializer.validated_data['ratios'].items()
+            ])
+        return Response(ExpenseSerializer(expense, context={'request': request, 'board': expense.board}).data)
+
+    def delete(self, request, *args, **kwargs):
+        expense = self.get_object()
+        expense.shares.all().delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class BoardBudgetSummaryView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
     serializer_class = BudgetSummarySerializer
@@ -86,34 +200,331 @@ class BoardBudgetSummaryView(generics.RetrieveAPIView):
 
     def retrieve(self, request, *args, **kwargs):
         board = self.get_object()
-        expenses = board.expenses.all()
 
-        # Aggregate total spending
-        total_result = expenses.aggregate(total=Sum('amount'))
-        actual_spend_total = total_result['total'] or Decimal('0.00')
+        # Totals are maintained incrementally on expense writes (see BudgetTotal),
+        # already in the board's currency
+        totals = [row for row in board.budget_totals.all() if row.expense_count]
+        actual_spend_total = sum((row.total for row in totals), Decimal('0.00'))
+        budget = board.budget
+
+        # ?currency=EUR reports the summary converted at today's rate
+        currency = request.query_params.get('currency', board.currency).upper()
+        if currency != board.currency:
+            try:
+                budget = convert(budget, board.currency, currency)
+                actual_spend_total = convert(actual_spend_total, board.currency, currency)
+                totals = [(row.category, convert(row.total, board.currency, currency)) for row in totals]
+            except ExchangeRateMissing as e:
+                raise ValidationError({'currency': str(e)})
+        else:
+            totals = [(row.category, row.total) for row in totals]
 
         # Calculate remaining budget
-        remaining = board.budget - actual_spend_total
+        remaining = budget - actual_spend_total
         if remaining < Decimal('0.00'):
             remaining = Decimal('0.00')
 
-        # Group by category
-        by_category = expenses.values('category').annotate(total=Sum('amount')).order_by('category')
         by_category_list = [
             {
-                'category': item['category'],
-                'total': str(item['total']) if item['total'] else '0.00'
+                'category': category,
+                'total': str(total) if total else '0.00'
             }
-            for item in by_category
+            for category, total in totals
         ]
 
         # Prepare data for serialization
         summary_data = {
-            'board_budget': str(board.budget),
+            'currency': currency,
+            'board_budget': str(budget),
             'actual_spend_total': str(actual_spend_total),
             'remaining': str(remaining),
             'by_category': by_category_list,
         }
 
         serializer = self.get_serializer(summary_data)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+
+class RunningSum(Func):
+    """SUM() of an aggregate, for use as SUM(SUM(amount)) OVER (ORDER BY ...)"""
+    function = 'SUM'
+    window_compatible = True
+    output_field = DecimalField(max_digits=12, decimal_places=2)
+
+
+class BoardBudgetTimeSeriesView(generics.RetrieveAPIView):
+    """
+    Spend per day, week or trip day with cumulative spend vs the board budget.
+    Bucketing and the running total are done in SQL (GROUP BY + SUM() OVER);
+    ?projection=true adds a linear burn-rate projection to the end date.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+    serializer_class = BudgetTimeSeriesSerializer
+    intervals = {'day': TruncDay, 'week': TruncWeek, 'trip_day': TruncDay}
+
+    def get_object(self):
+        board = get_object_or_404(Board, pk=self.kwargs['board_id'])
+        self.check_object_permissions(self.request, board)
+        return board
+
+    def retrieve(self, request, *args, **kwargs):
+        board = self.get_object()
+        interval = request.query_params.get('interval', 'day')
+        if interval not in self.intervals:
+            raise ValidationError(f"interval must be one of: {', '.join(self.intervals)}")
+        if interval == 'trip_day' and not board.start_date:
+            raise ValidationError("trip_day needs the board to have a start_date")
+
+        expenses = Expense.objects.filter(board=board)
+        if board.start_date:
+            expenses = expenses.filter(date__gte=board.start_date)
+        if board.end_date:
+            expenses = expenses.filter(date__lte=board.end_date)
+
+        buckets = (
+            expenses.annotate(period=self.intervals[interval]('date'))
+            .values('period')
+            .annotate(spend=Sum('board_amount'))
+            .annotate(cumulative=Window(RunningSum(Sum('board_amount')), order_by='period'))
+            .order_by('period')
+        )
+
+        cents = Decimal('0.01')
+        points = []
+        for bucket in buckets:
+            period = bucket['period']
+            period = period.date() if hasattr(period, 'date') else period
+            cumulative = Decimal(bucket['cumulative']).quantize(cents)
+            points.append({
+                'period': period,
+                'trip_day': (period - board.start_date).days + 1 if interval == 'trip_day' else None,
+                'spend': str(Decimal(bucket['spend']).quantize(cents)),
+                'cumulative': str(cumulative),
+                'remaining': str(board.budget - cumulative),
+            })
+
+        projection = None
+        if request.query_params.get('projection') in ('1', 'true', 'True') and board.start_date and board.end_date:
+            spent = Decimal(points[-1]['cumulative']) if points else Decimal('0.00')
+            projection = self.project(board, spent)
+
+        data = {
+            'interval': interval,
+            'board_budget': str(board.budget),
+            'currency': board.currency,
+            'start_date': board.start_date,
+            'end_date': board.end_date,
+            'points': points,
+            'projection': projection,
+        }
+        return Response(self.get_serializer(data).data)
+
+    def project(self, board, spent):
+        """Extrapolate the average daily spend so far to the whole trip"""
+        cents = Decimal('0.01')
+        trip_days = (board.end_date - board.start_date).days + 1
+        today = timezone.now().date()
+        elapsed = min(max((today - board.start_date).days + 1, 1), trip_days)
+        rate = spent / elapsed
+        projected_total = rate * trip_days
+
+        overrun_date = None
+        if rate > 0 and projected_total > board.budget:
+            days_to_overrun = int(board.budget / rate)
+            overrun_date = board.start_date + timedelta(days=days_to_overrun)
+
+        return {
+            'daily_burn_rate': str(rate.quantize(cents, ROUND_HALF_UP)),
+            'projected_total': str(projected_total.quantize(cents, ROUND_HALF_UP)),
+            'projected_remaining': str((board.budget - projected_total).quantize(cents, ROUND_HALF_UP)),
+            'projected_overrun_date': overrun_date,
+        }
+
+
+class BoardBudgetReconciliationView(generics.RetrieveAPIView):
+    """
+    Planned (Card.budget) vs actual (Expense.amount) spend per expense category
+    and per list, with cards whose linked expenses exceed their budget flagged.
+    Uses one grouped query over the board's cards (with their linked expense
+    totals) and one read of the maintained per-category totals.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+    serializer_class = BudgetReconciliationSerializer
+
+    def get_object(self):
+        board = get_object_or_404(Board, pk=self.kwargs['board_id'])
+        self.check_object_permissions(self.request, board)
+        return board
+
+    @staticmethod
+    def row(planned, actual):
+        return {
+            'planned': str(planned),
+            'actual': str(actual),
+            'difference': str(planned - actual),
+            'over_budget': actual > planned,
+        }
+
+    def retrieve(self, request, *args, **kwargs):
+        board = self.get_object()
+        zero = Decimal('0.00')
+
+        cards = (
+            Card.objects.filter(list__board=board)
+            .order_by()
+            .values('id', 'title', 'budget', 'category', 'list_id', 'list__title', 'list__position')
+            .annotate(actual=Sum('expenses__board_amount'))
+        )
+
+        planned_by_category = {category: zero for category, _ in CATEGORY_CHOICES}
+        lists = {}
+        over_budget_cards = []
+        for card in cards:
+            planned = card['budget'] or zero
+            actual = Decimal(card['actual'] or zero).quantize(Decimal('0.01'))
+            category = CARD_CATEGORY_TO_EXPENSE_CATEGORY.get(card['category'], 'misc')
+            planned_by_category[category] += planned
+
+            entry = lists.setdefault(card['list_id'], {
+                'list_id': card['list_id'],
+                'list_title': card['list__title'],
+                'position': card['list__position'],
+                'planned': zero,
+                'actual': zero,
+            })
+            entry['planned'] += planned
+            entry['actual'] += actual
+
+            if actual > planned:
+                over_budget_cards.append({
+                    'id': card['id'],
+                    'title': card['title'],
+                    'list_id': card['list_id'],
+                    'planned': str(planned),
+                    'actual': str(actual),
+                    'over_by': str(actual - planned),
+                })
+
+        actual_by_category = {row.category: row.total for row in board.budget_totals.all()}
+        by_category = [
+            {'category': category, **self.row(planned_by_category[category], actual_by_category.get(category, zero))}
+            for category, _ in CATEGORY_CHOICES
+        ]
+        by_list = [
+            {'list_id': entry['list_id'], 'list_title': entry['list_title'], **self.row(entry['planned'], entry['actual'])}
+            for entry in sorted(lists.values(), key=lambda entry: entry['position'])
+        ]
+
+        data = {
+            'currency': board.currency,
+            'planned_total': str(sum(planned_by_category.values(), zero)),
+            'actual_total': str(sum(actual_by_category.values(), zero)),
+            'by_category': by_category,
+            'by_list': by_list,
+            'over_budget_cards': sorted(over_budget_cards, key=lambda card: card['id']),
+        }
+        return Response(self.get_serializer(data).data)
+
+
+class BoardSettlementView(generics.RetrieveAPIView):
+    """
+    Net balance of every member over the board's split expenses and the
+    transfers that settle them. Balances are two grouped SQL queries; the
+    transfer list is built greedily (see budget/settlement.py).
+    """
+    permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+    serializer_class = SettlementSerializer
+
+    def get_object(self):
+        board = get_object_or_404(Board, pk=self.kwargs['board_id'])
+        self.check_object_permissions(self.request, board)
+        return board
+
+    def retrieve(self, request, *args, **kwargs):
+        board = self.get_object()
+        balances = board_balances(board)
+        usernames = dict(User.objects.filter(pk__in=balances).values_list('id', 'username'))
+
+        net = {user_id: balance['paid'] - balance['owed'] for user_id, balance in balances.items()}
+        data = {
+            'currency': board.currency,
+            'balances': [
+                {
+                    'user': user_id,
+                    'username': usernames.get(user_id, ''),
+                    'paid': str(balance['paid']),
+                    'owed': str(balance['owed']),
+                    'net': str(net[user_id]),
+                }
+                for user_id, balance in sorted(balances.items())
+            ],
+            'transfers': [
+                {'from_user': debtor, 'to_user': creditor, 'amount': str(amount)}
+                for debtor, creditor, amount in minimal_transfers(net)
+            ],
+        }
+        return Response(self.get_serializer(data).data)
+
+
+class SpendingDashboardView(generics.RetrieveAPIView):
+    """
+    The current user's spend across all their boards: total, per category,
+    per month and per board, read from the maintained SpendingRollup rows in
+    one query. Board totals are converted to ?currency= (default: the boards'
+    common currency, else EXCHANGE_RATE_BASE_CURRENCY) at today's rate.
+    as_of is when the newest rollup row was last updated.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = SpendingDashboardSerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        rows = list(
+            SpendingRollup.objects.filter(user=request.user, board__deleted_at__isnull=True)
+            .values('board_id', 'board__title', 'board__currency', 'category', 'month',
+                    'total', 'expense_count', 'updated_at')
+        )
+        board_currencies = {row['board__currency'] for row in rows}
+        default_currency = board_currencies.pop() if len(board_currencies) == 1 else base_currency()
+        currency = request.query_params.get('currency', default_currency).upper()
+
+        zero = Decimal('0.00')
+        total, count = zero, 0
+        by_category, by_month, by_board = {}, {}, {}
+        for row in rows:
+            try:
+                amount = convert(row['total'], row['board__currency'], currency)
+            except ExchangeRateMissing as e:
+                raise ValidationError({'currency': str(e)})
+            total += amount
+            count += row['expense_count']
+            for bucket in (
+                by_category.setdefault(row['category'], {'category': row['category'], 'total': zero, 'expense_count': 0}),
+                by_month.setdefault(row['month'], {'month': f"{row['month']:%Y-%m}", 'total': zero, 'expense_count': 0}),
+            ):
+                bucket['total'] += amount
+                bucket['expense_count'] += row['expense_count']
+            board = by_board.setdefault(row['board_id'], {
+                'board': row['board_id'],
+                'title': row['board__title'],
+                'board_currency': row['board__currency'],
+                'board_total': zero,
+                'total': zero,
+                'expense_count': 0,
+            })
+            board['board_total'] += row['total']
+            board['total'] += amount
+            board['expense_count'] += row['expense_count']
+
+        def as_strings(entries, *fields):
+            return [{**entry, **{field: str(entry[field]) for field in fields}} for entry in entries]
+
+        data = {
+            'currency': currency,
+            'as_of': max((row['updated_at'] for row in rows), default=None),
+            'total': str(total),
+            'expense_count': count,
+            'by_category': as_strings(sorted(by_category.values(), key=lambda entry: entry['category']), 'total'),
+            'by_month': as_strings([by_month[month] for month in sorted(by_month)], 'total'),
+            'by_board': as_strings(by_board.values(), 'total', 'board_total'),
+        }
+        return Response(self.get_serializer(data).data)
@@ -0,0 +1,104 @@
+"""
+Map locations extracted from Card.location.
+
+A card whose location JSON has a valid point gets one linked Location row
+(Location.card), so card places share the geohash index, the bbox / radius
+queries, clustering and routes with the board's own locations. The row is
+kept in sync on every card save (maps/signals.py); sync_card_locations
+backfills cards written before, or by queryset updates that skip signals.
+
+Before cards carried their own row, the card form saved each card place as a
+separate, unlinked Location. An unlinked row of the same board with the same
+name and point is therefore adopted (linked to the card) rather than
+duplicated.
+"""
+from collections import defaultdict
+from .clusters import bump_map_version
+from .geo import encode, point_from_json
+from .models import Location
+
+
+def location_fields(card_title, location, board_id):
+    """Location column values for a card's location JSON, or None when it has no valid point"""
+    point = point_from_json(location)
+    if point is None:
+        return None
+    name = location.get('name')
+    if not isinstance(name, str) or not name.strip():
+        name = card_title
+    return {'board_id': board_id, 'name': name[:200], 'lat': point[0], 'lng': point[1]}
+
+
+def sync_card_location(card, board_id):
+    """Create, move or delete the card's Location; unchanged rows are not written"""
+    fields = location_fields(card.title, card.location, board_id)
+    current = Location.objects.filter(card=card).first()
+    if fields is None:
+        if current is not None:
+            current.delete()
+    elif current is None:
+        adopted = Location.objects.filter(card__isnull=True, **fields).order_by('pk').first()
+        if adopted is None:
+            Location.objects.create(card=card, **fields)
+        else:
+            adopted.card = card
+            adopted.save(update_fields=['card', 'updated_at'])
+    elif any(getattr(current, name) != value for name, value in fields.items()):
+        for name, value in fields.items():
+            setattr(current, name, value)
+        current.save()
+
+
+def sync_card_batch(rows):
+    """
+    Sync (card_id, board_id, title, location) rows with bulk queries;
+    returns (created, updated, deleted) counts, adopted rows counting as updated
+    """
+    existing = {
+        location.card_id: location
+        for location in Location.objects.filter(card_id__in=[row[0] for row in rows])
+    }
+    wanted = {}
+    for card_id, board_id, title, location in rows:
+        fields = location_fields(title, location, board_id)
+        if fields is not None:
+            fields['geohash'] = encode(fields['lat'], fields['lng'])
+        wanted[card_id] = fields
+    # Unlinked rows that match a card place, by (board, name, lat, lng)
+    unlinked = defaultdict(list)
+    missing = [fields for card_id, fields in wanted.items() if fields is not None and card_id not in existing]
+    if missing:
+        for location in Location.objects.filter(
+            card__isnull=True,
+            board_id__in={fields['board_id'] for fields in missing},
+            geohash__in={fields['geohash'] for fields in missing},
+        ).order_by('pk'):
+            unlinked[(location.board_id, location.name, location.lat, location.lng)].append(location)
+
+    new, changed, stale = [], [], []
+    for card_id, fields in wanted.items():
+        current = existing.get(card_id)
+        if fields is None:
+            if current is not None:
+                stale.append(current.pk)
+            continue
+        if current is None:
+            matches = unlinked[(fields['board_id'], fields['name'], fields['lat'], fields['lng'])]
+            if matches:
+                current = matches.pop(0)
+                current.card_id = card_id
+                changed.append(current)
+            else:
+                new.append(Location(card_id=card_id, **fields))
+        elif any(getattr(current, name) != value for name, value in fields.items()):
+            for name, value in fields.items():
+                setattr(current, name, value)
+            changed.append(current)
+
+    Location.objects.bulk_create(new)
+    Location.objects.bulk_update(changed, ['card_id', 'board_id', 'name', 'lat', 'lng', 'geohash'])
+    Location.objects.filter(pk__in=stale).delete()
+    # The bulk queries skip the Location signals
+    for board_id in {location.board_id for location in new + changed}:
+        bump_map_version(board_id)
+    return len(new), len(changed), len(stale)
@@ -0,0 +1,87 @@
+"""
+Server-side marker clustering.
+
+Locations are grouped by the geohash prefix whose cells are about a quarter
+of a map tile wide at the requested zoom: one GROUP BY on a substring of the
+indexed geohash column gives count and centroid per cell, and one
+ROW_NUMBER() window query picks a few sample ids per cell. The clusters of a
+whole board are cached per board map version and precision, so panning
+only filters the cached list by viewport and zooming hits at most one
+grouped query per precision. The map version (a MapVersion row, so all
+web workers see the same one) is bumped in the same transaction whenever a
+location of the board is saved or deleted, or a card's due date changes
+(see maps/signals.py).
+"""
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Window
+from django.db.models.functions import RowNumber, Substr
+from .geo import GEOHASH_PRECISION, cell_size
+from .models import Location, MapVersion
+
+MAX_ZOOM = 22
+CLUSTER_SAMPLE_SIZE = 5
+CLUSTER_CACHE_SECONDS = 60 * 60
+
+
+def map_version(board_id):
+    """Version of the board's map data, for cache keys"""
+    return MapVersion.objects.filter(board_id=board_id).values_list('version', flat=True).first() or 0
+
+
+def bump_map_version(board_id):
+    MapVersion.objects.bulk_create([MapVersion(board_id=board_id)], ignore_conflicts=True)
+    MapVersion.objects.filter(board_id=board_id).update(version=F('version') + 1)
+
+
+def precision_for_zoom(zoom):
+    """Coarsest geohash precision whose cells are at most a quarter tile wide at zoom"""
+    target = 360 / 2 ** (zoom + 2)
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        if cell_size(precision)[1] <= target:
+            return precision
+    return GEOHASH_PRECISION
+
+
+def compute_clusters(board_id, precision):
+    locations = Location.objects.filter(board_id=board_id)
+    cell = Substr('geohash', 1, precision)
+    clusters = {
+        row['cell']: {
+            'geohash': row['cell'], 'lat': row['lat'], 'lng': row['lng'],
+            'count': row['count'], 'sample_ids': [],
+        }
+        for row in (
+            locations.annotate(cell=cell).values('cell')
+            .annotate(count=Count('id'), lat=Avg('lat'), lng=Avg('lng'))
+            .order_by('cell')
+        )
+    }
+    samples = (
+        locations.annotate(cell=cell, rank=Window(RowNumber(), partition_by=[cell], order_by=F('id').asc()))
+        .filter(rank__lte=CLUSTER_SAMPLE_SIZE)
+        .values_list('cell', 'id')
+    )
+    for cell_id, location_id in samples:
+        clusters[cell_id]['sample_ids'].append(location_id)
+    for cluster in clusters.values():
+        cluster['sample_ids'].sort()
+    return list(clusters.values())
+
+
+def board_clusters(board_id, zoom):
+    """(precision, clusters of the whole board) at the zoom level, cached per map version"""
+    precision = precision_for_zoom(zoom)
+    key = f'maps:clusters:{board_id}:{map_version(board_id)}:{precision}'
+    clusters = cache.get(key)
+    if clusters is None:
+        clusters = compute_clusters(board_id, precision)
+        cache.set(key, clusters, CLUSTER_CACHE_SECONDS)
+    return precision, clusters
+
+
+def in_bbox(lat, lng, south, west, north, east):
+    if not south <= lat <= north:
+        return False
+    if west <= east:
+        return west <= lng <= east
+    return lng >= west or lng <= east
@@ -0,0 +1,139 @@
+"""
+Geohash cells for spatial queries on plain lat/lng columns (no PostGIS).
+
+Every Location stores the geohash of its point in an indexed column. A
+bounding box is covered by at most MAX_COVER_CELLS geohash cells of the
+finest precision that allows it; since all points in a cell share its
+prefix, each cell becomes one index range scan (prefix <= geohash <
+prefix + '~'), which works the same on SQLite and PostgreSQL. The lat/lng
+comparison (and, for radius queries, the haversine distance built from
+Django's math functions) then runs only on those candidate rows.
+"""
+import math
+import operator
+from functools import reduce
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 12
+MAX_COVER_CELLS = 32
+EARTH_RADIUS_M = 6_371_008.8
+
+
+def encode(lat, lng, precision=GEOHASH_PRECISION):
+    """Geohash of a point; bits alternate longitude, latitude"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def point_from_json(location):
+    """(lat, lng) of a location JSON like Card.location, or None when it has no valid point"""
+    if not isinstance(location, dict):
+        return None
+    lat, lng = location.get('lat'), location.get('lng')
+    if isinstance(lat, bool) or isinstance(lng, bool):
+        return None
+    try:
+        lat, lng = float(lat), float(lng)
+    except (TypeError, ValueError):
+        return None
+    if not (math.isfinite(lat) and math.isfinite(lng) and -90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+
+def cell_size(precision):
+    """(lat degrees, lng degrees) of a cell at the given precision"""
+    bits = 5 * precision
+    return 180 / 2 ** (bits // 2), 360 / 2 ** ((bits + 1) // 2)
+
+
+def cell_span(low, high, origin, size, cells):
+    first = min(int((low - origin) // size), cells - 1)
+    last = min(int((high - origin) // size), cells - 1)
+    return range(max(first, 0), max(last, 0) + 1)
+
+
+def covering_cells(south, west, north, east, max_cells=MAX_COVER_CELLS):
+    """Geohash prefixes of the finest precision whose cells (at most max_cells) cover the box"""
+    best = None
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        lat_size, lng_size = cell_size(precision)
+        rows = cell_span(south, north, -90, lat_size, round(180 / lat_size))
+        columns = cell_span(west, east, -180, lng_size, round(360 / lng_size))
+        if len(rows) * len(columns) > max_cells:
+            break
+        best = (precision, rows, columns, lat_size, lng_size)
+    precision, rows, columns, lat_size, lng_size = best
+    return sorted({
+        encode(-90 + (row + 0.5) * lat_size, -180 + (column + 0.5) * lng_size, precision)
+        for row in rows for column in columns
+    })
+
+
+def split_antimeridian(south, west, north, east):
+    """Boxes with west > east wrap around the antimeridian and are split in two"""
+    if west <= east:
+        return [(south, west, north, east)]
+    return [(south, west, north, 180.0), (south, -180.0, north, east)]
+
+
+def bbox_q(south, west, north, east, prefix=''):
+    """Q selecting the points inside the box, pruned through the geohash index"""
+    boxes = []
+    for box_south, box_west, box_north, box_east in split_antimeridian(south, west, north, east):
+        cells = reduce(operator.or_, (
+            Q(**{f'{prefix}geohash__gte': cell, f'{prefix}geohash__lt': cell + '~'})
+            for cell in covering_cells(box_south, box_west, box_north, box_east)
+        ))
+        boxes.append(cells & Q(**{
+            f'{prefix}lat__gte': box_south, f'{prefix}lat__lte': box_north,
+            f'{prefix}lng__gte': box_west, f'{prefix}lng__lte': box_east,
+        }))
+    return reduce(operator.or_, boxes)
+
+
+def radius_bbox(lat, lng, radius_m):
+    """(south, west, north, east) of the smallest box containing the circle"""
+    angle = radius_m / EARTH_RADIUS_M
+    south, north = lat - math.degrees(angle), lat + math.degrees(angle)
+    if south <= -90.0 or north >= 90.0:
+        return max(south, -90.0), -180.0, min(north, 90.0), 180.0  # the circle covers a pole
+    ratio = math.sin(angle) / math.cos(math.radians(lat))
+    if angle >= math.pi / 2 or ratio >= 1.0:
+        return south, -180.0, north, 180.0
+    lng_delta = math.degrees(math.asin(ratio))
+    west, east = lng - lng_delta, lng + lng_delta
+    if west < -180.0:
+        west += 360.0
+    if east > 180.0:
+        east -= 360.0
+    return south, west, north, east
+
+
+def haversine_expression(lat, lng, prefix=''):
+    """Great-circle distance in metres from (lat, lng) to the row's point"""
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2, lng2 = Radians(F(f'{prefix}lat')), Radians(F(f'{prefix}lng'))
+    a = (
+        Power(Sin((lat2 - Value(lat1)) / 2), 2)
+        + Value(math.cos(lat1)) * Cos(lat2) * Power(Sin((lng2 - Value(lng1)) / 2), 2)
+    )
+    return Value(2 * EARTH_RADIUS_M) * ASin(Least(Sqrt(a), Value(1.0)), output_field=FloatField())
+
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from boards.models import Card
+from maps.card_locations import sync_card_batch
+
+
+class Command(BaseCommand):
+    help = "Create, update or remove the map locations extracted from Card.location (backfill)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        totals = [0, 0, 0]
+        last_pk = 0
+        while True:
+            rows = list(
+                Card.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', 'list__board_id', 'title', 'location')[:options['batch_size']]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            for i, count in enumerate(sync_card_batch(rows)):
+                totals[i] += count
+        created, updated, deleted = totals
+        self.stdout.write(self.style.SUCCESS(
+            f"Card locations: {created} created, {updated} updated, {deleted} removed"
+        ))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:28
+
+from django.db import migrations, models
+from maps.geo import encode
+
+
+def backfill_geohash(apps, schema_editor):
+    Location = apps.get_model('maps', 'Location')
+    locations = list(Location.objects.only('lat', 'lng'))
+    for location in locations:
+        location.geohash = encode(location.lat, location.lng)
+    Location.objects.bulk_update(locations, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maps', '0002_location_delete_maplocation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='geohash',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
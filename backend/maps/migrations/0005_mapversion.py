@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0011_boardarchive'),
+        ('maps', '0004_location_card'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MapVersion',
+            fields=[
+                ('board', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='map_version', serialize=False, to='boards.board')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'map_versions',
+            },
+        ),
+    ]
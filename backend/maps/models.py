@@ -1,6 +1,7 @@
 from django.db import models
-from boards.models import Board
+from boards.models import Board, Card
 from users.models import User
+from .geo import encode
 
 class Location(models.Model):
     board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='locations')
@@ -8,12 +9,44 @@ class Location(models.Model):
     lat = models.FloatField()
     lng = models.FloatField()
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='created_locations')
+    # Set for the point extracted from Card.location, kept in sync by maps/signals.py
+    card = models.OneToOneField(Card, on_delete=models.CASCADE, null=True, blank=True, related_name='map_location')
+    # Geohash of (lat, lng) for the bbox / radius queries (see maps/geo.py)
+    geohash = models.CharField(max_length=12, db_index=True, editable=False, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.name} ({self.board.title})"
 
+    def save(self, *args, **kwargs):
+        self.geohash = encode(self.lat, self.lng)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'lat', 'lng'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
     class Meta:
         db_table = 'locations'
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+
+
+class MapVersion(models.Model):
+    """
+    Version of a board's map data, part of the cluster and route cache keys.
+    It lives in the database rather than the cache so a bump made by one web
+    worker invalidates what every worker has cached.
+    """
+    # No FK constraint: deleting a board's locations through the cascade bumps
+    # the version while the board row is being deleted. The purge plan
+    # (boards/deletion.py) removes the row.
+    board = models.OneToOneField(
+        Board, on_delete=models.DO_NOTHING, db_constraint=False, primary_key=True, related_name='map_version'
+    )
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'map_versions'
+
+    def __str__(self):
+        return f"{self.board_id}: v{self.version}"
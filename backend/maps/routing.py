@@ -0,0 +1,152 @@
+"""
+Itinerary route optimization.
+
+optimize_route() orders stops for a short open path: a haversine distance
+matrix computed with numpy broadcasting, a nearest-neighbour tour, then 2-opt
+moves until no segment reversal shortens it. The open path is solved as a
+cycle through a dummy stop at distance 0 from every stop (or only from the
+fixed start), so the ends of the path can move like any other edge. Each 2-opt
+step scores all reversals starting at one position with one vectorized
+expression.
+
+Routes are cached per board map version. Small inputs are solved in the
+request; larger ones go to a process pool (ROUTE_WORKERS processes) and the
+request returns "pending" until the result lands in the cache. The pending
+marker expires after ROUTE_PENDING_SECONDS, so a route whose worker process
+was restarted mid-computation is submitted again by the next request.
+"""
+import hashlib
+import json
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from .geo import EARTH_RADIUS_M
+
+ROUTE_CACHE_SECONDS = 24 * 60 * 60
+ROUTE_PENDING_SECONDS = 5 * 60
+PENDING = 'pending'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def distance_matrix(lats, lngs):
+    """(n x n) great-circle distances in metres"""
+    phi = np.radians(np.asarray(lats, dtype=float))
+    lam = np.radians(np.asarray(lngs, dtype=float))
+    a = (
+        np.sin((phi[:, None] - phi[None, :]) / 2) ** 2
+        + np.cos(phi)[:, None] * np.cos(phi)[None, :] * np.sin((lam[:, None] - lam[None, :]) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(np.sqrt(a), 1.0))
+
+
+def leg_distances(lats, lngs):
+    """Distances in metres between consecutive stops"""
+    phi = np.radians(np.asarray(lats, dtype=float))
+    lam = np.radians(np.asarray(lngs, dtype=float))
+    a = np.sin(np.diff(phi) / 2) ** 2 + np.cos(phi[:-1]) * np.cos(phi[1:]) * np.sin(np.diff(lam) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(np.sqrt(a), 1.0))
+
+
+def nearest_neighbour(dist, start):
+    n = len(dist)
+    tour = [start]
+    visited = np.zeros(n, dtype=bool)
+    visited[start] = True
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, dist[tour[-1]])
+        tour.append(int(np.argmin(row)))
+        visited[tour[-1]] = True
+    return np.array(tour)
+
+
+def two_opt(tour, dist, max_passes=100):
+    """Improve a cycle in place until no reversal of a segment shortens it"""
+    m = len(tour)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(m - 2):
+            a, b = tour[i], tour[i + 1]
+            c = tour[i + 2:]
+            d = np.roll(tour, -1)[i + 2:]
+            delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+            if i == 0:
+                delta = delta[:-1]  # the last edge shares node a
+            if not len(delta):
+                continue
+            k = int(np.argmin(delta))
+            if delta[k] < -1e-7:
+                j = i + 2 + k
+                tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    return tour
+
+
+def optimize_route(lats, lngs, start=None):
+    """Visiting order (indices) of the stops and its total distance in metres"""
+    n = len(lats)
+    if n < 2:
+        return list(range(n)), 0.0
+    dist = distance_matrix(lats, lngs)
+    # Dummy stop n turns the open path into a cycle
+    big = dist.max() * (n + 1) + 1
+    augmented = np.zeros((n + 1, n + 1))
+    augmented[:n, :n] = dist
+    if start is not None:
+        augmented[n, :n] = augmented[:n, n] = big
+        augmented[n, start] = augmented[start, n] = 0
+    first = start if start is not None else int(np.argmin(dist.sum(axis=1)))
+    tour = np.concatenate(([n], nearest_neighbour(dist, first)))
+    tour = two_opt(tour, augmented)
+
+    position = int(np.flatnonzero(tour == n)[0])
+    path = np.concatenate((tour[position + 1:], tour[:position]))
+    if start is not None and path[0] != start:
+        path = path[::-1]
+    total = float(dist[path[:-1], path[1:]].sum())
+    return [int(index) for index in path], total
+
+
+def route_cache_key(board_id, version, params):
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+    return f'maps:route:{board_id}:{version}:{digest}'
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=getattr(settings, 'ROUTE_WORKERS', 2))
+        return _pool
+
+
+def solve(key, lats, lngs, start=None):
+    """
+    Cached (order, total distance) for the stops, or PENDING while a pool
+    worker computes it. Inputs up to ROUTE_INLINE_MAX_STOPS are solved here.
+    """
+    result = cache.get(key)
+    if result is not None:
+        return result
+    if len(lats) <= getattr(settings, 'ROUTE_INLINE_MAX_STOPS', 60):
+        result = optimize_route(lats, lngs, start)
+        cache.set(key, result, ROUTE_CACHE_SECONDS)
+        return result
+
+    # cache.add is atomic, so concurrent requests submit the job once
+    if cache.add(key, PENDING, ROUTE_PENDING_SECONDS):
+        future = get_pool().submit(optimize_route, lats, lngs, start)
+
+        def store(done):
+            if done.exception() is None:
+                cache.set(key, done.result(), ROUTE_CACHE_SECONDS)
+            else:
+                cache.delete(key)
+
+        future.add_done_callback(store)
+    return PENDING
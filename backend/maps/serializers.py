@@ -1,17 +1,20 @@
 from rest_framework import serializers
+from boards.models import Card
 from .models import Location
 from users.serializers import UserSerializer
 
 class LocationSerializer(serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
+    # Metres from ?near=, only present on radius queries
+    distance = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Location
         fields = [
             'id', 'board', 'name', 'lat', 'lng',
-            'created_by', 'created_at', 'updated_at'
+            'created_by', 'card', 'created_at', 'updated_at', 'distance'
         ]
-        read_only_fields = ['id', 'board', 'created_by', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'board', 'created_by', 'card', 'created_at', 'updated_at']
 
     def validate_lat(self, value):
         if not -90 <= value <= 90:
@@ -21,4 +24,24 @@ class LocationSerializer(serializers.ModelSerializer):
     def validate_lng(self, value):
         if not -180 <= value <= 180:
             raise serializers.ValidationError("Longitude must be between -180 and 180.")
-        return value
\ No newline at end of file
+        return value
+
+
+class MapCardSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Card
+        fields = ['id', 'list', 'title', 'due_date', 'category', 'position']
+
+
+class MapFeatureSerializer(serializers.ModelSerializer):
+    """A map marker: a board location, or a card's place with the card attached"""
+    type = serializers.SerializerMethodField()
+    card = MapCardSerializer(read_only=True)
+    distance = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Location
+        fields = ['id', 'type', 'board', 'name', 'lat', 'lng', 'card', 'distance']
+
+    def get_type(self, obj):
+        return 'card' if obj.card_id else 'location'
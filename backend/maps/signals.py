@@ -0,0 +1,55 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from boards.models import Card, List
+from .card_locations import sync_card_location
+from .clusters import bump_map_version
+from .models import Location
+
+# Card fields the map depends on: places, and due dates for the day routes
+CARD_MAP_FIELDS = ('location', 'due_date')
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def invalidate_board_map(sender, instance, **kwargs):
+    bump_map_version(instance.board_id)
+
+
+@receiver(pre_save, sender=Card)
+def remember_card_map_fields(sender, instance, update_fields=None, **kwargs):
+    instance._previous_map_fields = None
+    if instance.pk and (update_fields is None or set(CARD_MAP_FIELDS) & set(update_fields)):
+        instance._previous_map_fields = Card.objects.filter(pk=instance.pk).values_list(*CARD_MAP_FIELDS).first()
+
+
+def invalidate_card_board_map(card):
+    board_id = List.objects.filter(pk=card.list_id).values_list('board_id', flat=True).first()
+    if board_id is not None:
+        bump_map_version(board_id)
+
+
+@receiver(post_save, sender=Card)
+def invalidate_board_map_for_card(sender, instance, created, **kwargs):
+    # Reorders and title edits leave the map alone
+    current = tuple(getattr(instance, field) for field in CARD_MAP_FIELDS)
+    if created:
+        changed = any(current)
+    else:
+        changed = instance._previous_map_fields not in (None, current)
+    if changed:
+        invalidate_card_board_map(instance)
+
+
+@receiver(post_delete, sender=Card)
+def invalidate_board_map_for_deleted_card(sender, instance, **kwargs):
+    if instance.location or instance.due_date:
+        invalidate_card_board_map(instance)
+
+
+@receiver(post_save, sender=Card)
+def sync_card_map_location(sender, instance, created, update_fields=None, **kwargs):
+    if created and not instance.location:
+        return
+    if update_fields is not None and 'location' not in update_fields and 'title' not in update_fields:
+        return
+    sync_card_location(instance, instance.list.board_id)
@@ -1,3 +1,293 @@
-from django.test import TestCase
+from concurrent.futures import Future
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from boards.models import Board, Card
+from .clusters import map_version
+from .geo import covering_cells, encode
+from .models import Location
 
-# Create your tests here.
+User = get_user_model()
+
+
+class MapsAPITestCase(APITestCase):
+    """Shared fixtures: an owner with a Lisbon board and a few locations."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(title='Lisbon', owner=self.owner)
+        self.client.force_authenticate(user=self.owner)
+
+    def add_location(self, name, lat, lng, board=None):
+        return Location.objects.create(board=board or self.board, name=name, lat=lat, lng=lng, created_by=self.owner)
+
+
+class GeohashTest(APITestCase):
+    """Test cases for the geohash helpers."""
+
+    def test_encode_known_point(self):
+        self.assertEqual(encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_cover_contains_points_of_the_box(self):
+        cells = covering_cells(38.6, -9.3, 38.8, -9.0)
+        self.assertLessEqual(len(cells), 32)
+        for lat, lng in [(38.6, -9.3), (38.7, -9.14), (38.8, -9.0)]:
+            self.assertTrue(any(encode(lat, lng).startswith(cell) for cell in cells))
+
+
+class LocationAreaQueryTest(MapsAPITestCase):
+    """Test cases for ?bbox= and ?near= location queries."""
+
+    def setUp(self):
+        super().setUp()
+        self.belem = self.add_location('Belem', 38.6916, -9.2160)
+        self.alfama = self.add_location('Alfama', 38.7114, -9.1302)
+        self.sintra = self.add_location('Sintra', 38.7876, -9.3905)
+        self.url = reverse('board-locations', args=[self.board.pk])
+
+    def names(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['name'] for row in response.data['results']]
+
+    def test_geohash_follows_coordinates(self):
+        self.belem.lat, self.belem.lng = 40.0, -8.0
+        self.belem.save(update_fields=['lat', 'lng'])
+        self.assertEqual(Location.objects.get(pk=self.belem.pk).geohash, encode(40.0, -8.0))
+
+    def test_bbox(self):
+        response = self.client.get(self.url, {'bbox': '-9.25,38.68,-9.10,38.72'})
+        self.assertEqual(sorted(self.names(response)), ['Alfama', 'Belem'])
+
+    def test_bbox_across_antimeridian(self):
+        self.add_location('Fiji', -17.7, 178.0)
+        self.add_location('Samoa', -13.8, -171.8)
+        response = self.client.get(self.url, {'bbox': '170,-20,-170,-10'})
+        self.assertEqual(sorted(self.names(response)), ['Fiji', 'Samoa'])
+
+    def test_near_orders_by_distance(self):
+        response = self.client.get(self.url, {'near': '38.7110,-9.1400', 'radius': 8000})
+        self.assertEqual(self.names(response), ['Alfama', 'Belem'])
+        self.assertAlmostEqual(response.data['results'][0]['distance'], 855, delta=20)
+
+    def test_invalid_parameters(self):
+        for params in [{'bbox': '1,2,3'}, {'bbox': '0,50,10,40'}, {'near': '38.7,-9.1'}, {'near': 'a,b', 'radius': 10}]:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_all_boards_of_the_user(self):
+        other = Board.objects.create(title='Porto', owner=self.owner)
+        self.add_location('Ribeira', 41.1406, -8.6110, board=other)
+        stranger = User.objects.create_user(username='stranger', email='stranger@example.com', password='testpass123')
+        self.add_location('Hidden', 41.1410, -8.6100, board=Board.objects.create(title='Other', owner=stranger))
+
+        response = self.client.get(reverse('user-locations'), {'near': '41.14,-8.61', 'radius': 5000})
+        self.assertEqual(self.names(response), ['Ribeira'])
+        response = self.client.get(reverse('user-locations'))
+        self.assertEqual(response.data['count'], 4)
+        self.assertNotIn('distance', response.data['results'][0])
+
+
+class MarkerClusterTest(MapsAPITestCase):
+    """Test cases for server-side marker clustering."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        for i in range(8):
+            self.add_location(f'Lisbon {i}', 38.70 + i * 0.001, -9.14)
+        self.add_location('Porto', 41.15, -8.61)
+        self.url = reverse('board-clusters', args=[self.board.pk])
+
+    def clusters(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(response.data['clusters'], key=lambda cluster: -cluster['count'])
+
+    def test_low_zoom_groups_nearby_locations(self):
+        lisbon, porto = self.clusters(zoom=6)
+        self.assertEqual(lisbon['count'], 8)
+        self.assertAlmostEqual(lisbon['lat'], 38.7035, places=4)
+        self.assertEqual(len(lisbon['sample_ids']), 5)
+        self.assertEqual(porto['count'], 1)
+
+    def test_high_zoom_splits_clusters(self):
+        self.assertGreater(len(self.clusters(zoom=18)), 2)
+
+    def test_viewport_and_cache_invalidation(self):
+        self.assertEqual([c['count'] for c in self.clusters(zoom=6, bbox='-9.5,38,-8.8,39')], [8])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_location('Cascais', 38.70, -9.14)
+        self.assertEqual([c['count'] for c in self.clusters(zoom=6, bbox='-9.5,38,-8.8,39')], [9])
+
+    def test_only_map_changes_of_cards_bump_the_version(self):
+        card = Card.objects.create(list=self.board.lists.get(position=0), title='Tram', position=1)
+        version = map_version(self.board.pk)
+        card.title, card.position = 'Tram 28', 2
+        card.save()
+        self.assertEqual(map_version(self.board.pk), version)
+        card.due_date = '2026-06-01'
+        card.save(update_fields=['due_date'])
+        self.assertEqual(map_version(self.board.pk), version + 1)
+
+    def test_zoom_is_required(self):
+        response = self.client.get(self.url, {'zoom': 30})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class InlineExecutor:
+    """Stands in for the route worker pool, running each job on submit."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+class RouteOptimizationTest(MapsAPITestCase):
+    """Test cases for itinerary route optimization."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        # Stops along a line, created out of order
+        for name, lng in [('C', -9.12), ('A', -9.20), ('E', -9.04), ('B', -9.16), ('D', -9.08)]:
+            self.add_location(name, 38.70, lng)
+        self.url = reverse('board-route', args=[self.board.pk])
+
+    def route(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_orders_stops_along_the_line(self):
+        data = self.route()
+        self.assertIn(''.join(stop['name'] for stop in data['stops']), ['ABCDE', 'EDCBA'])
+        self.assertLess(data['total_distance'], data['original_distance'])
+        self.assertAlmostEqual(data['total_distance'], sum(stop['leg_distance'] for stop in data['stops']), places=3)
+
+    def test_fixed_start(self):
+        start = Location.objects.get(name='C')
+        names = [stop['name'] for stop in self.route(start=start.pk)['stops']]
+        self.assertEqual(names[0], 'C')
+        self.assertEqual(len(names), 5)
+
+    def test_day_of_cards(self):
+        first_list = self.board.lists.get(position=0)
+        for i, lng in enumerate([-9.10, -9.30, -9.20]):
+            Card.objects.create(list=first_list, title=f'Stop {i}', position=i + 1, due_date='2026-06-01',
+                                location={'name': f'Stop {i}', 'lat': 38.7, 'lng': lng})
+        Card.objects.create(list=first_list, title='No place', position=9, due_date='2026-06-01')
+        names = [stop['name'] for stop in self.route(date='2026-06-01')['stops']]
+        self.assertIn(names, [['Stop 1', 'Stop 2', 'Stop 0'], ['Stop 0', 'Stop 2', 'Stop 1']])
+
+    @override_settings(ROUTE_INLINE_MAX_STOPS=2)
+    def test_large_routes_go_to_the_worker_pool(self):
+        with mock.patch('maps.routing.get_pool', return_value=InlineExecutor()) as get_pool:
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            response = self.client.get(self.url)
+        self.assertEqual(get_pool.call_count, 1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['stops']), 5)
+
+
+class CardLocationTest(MapsAPITestCase):
+    """Test cases for card locations in the maps spatial index."""
+
+    def setUp(self):
+        super().setUp()
+        self.list = self.board.lists.get(position=0)
+        self.url = reverse('list-cards', args=[self.board.pk, self.list.pk])
+
+    def test_card_location_is_indexed(self):
+        response = self.client.post(self.url, {
+            'title': 'Castle', 'location': {'name': 'São Jorge', 'lat': 38.7139, 'lng': -9.1335}
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        location = Location.objects.get(card_id=response.data['id'])
+        self.assertEqual((location.board_id, location.name), (self.board.pk, 'São Jorge'))
+        self.assertEqual(location.geohash, encode(38.7139, -9.1335))
+
+        card = Card.objects.get(pk=response.data['id'])
+        card.location = {'lat': 38.6916, 'lng': -9.2160}
+        card.save()
+        location.refresh_from_db()
+        self.assertEqual((location.name, location.lat), ('Castle', 38.6916))
+
+        card.location = {}
+        card.save()
+        self.assertFalse(Location.objects.filter(card=card).exists())
+
+    def test_invalid_location_is_rejected(self):
+        for location in [{'lat': 'north', 'lng': 1}, {'lat': 91, 'lng': 0}, {'name': 'Nowhere'}, {'lat': True, 'lng': 0}]:
+            response = self.client.post(self.url, {'title': 'Bad', 'location': location}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, location)
+            self.assertIn('location', response.data)
+
+    def test_map_returns_cards_and_locations(self):
+        self.add_location('Alfama', 38.7114, -9.1302)
+        self.add_location('Porto', 41.15, -8.61)
+        card = Card.objects.create(list=self.list, title='Lunch', position=1,
+                                   location={'name': 'Time Out Market', 'lat': 38.7069, 'lng': -9.1459})
+        Card.objects.create(list=self.list, title='No place', position=2)
+
+        with self.assertNumQueries(3):  # board, permission check, features
+            response = self.client.get(reverse('board-map', args=[self.board.pk]), {'bbox': '-9.3,38.6,-9.0,38.8'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        features = {feature['name']: feature for feature in response.data['features']}
+        self.assertEqual(sorted(features), ['Alfama', 'Time Out Market'])
+        self.assertEqual(features['Alfama']['type'], 'location')
+        self.assertIsNone(features['Alfama']['card'])
+        self.assertEqual(features['Time Out Market']['type'], 'card')
+        self.assertEqual(features['Time Out Market']['card']['id'], card.pk)
+        self.assertFalse(response.data['truncated'])
+
+        response = self.client.get(reverse('user-map'))
+        self.assertEqual(response.data['count'], 3)
+
+    def test_backfill_command(self):
+        cards = [Card.objects.create(list=self.list, title=f'Stop {i}', position=i) for i in range(3)]
+        # Queryset updates skip the signals
+        Card.objects.filter(pk__in=[card.pk for card in cards[:2]]).update(location={'lat': 38.7, 'lng': -9.14})
+        Card.objects.filter(pk=cards[2].pk).update(location={'lat': 'bad'})
+
+        out = StringIO()
+        call_command('sync_card_locations', batch_size=2, stdout=out)
+        self.assertIn('2 created, 0 updated, 0 removed', out.getvalue())
+        self.assertEqual(Location.objects.get(card=cards[0]).geohash, encode(38.7, -9.14))
+
+        Card.objects.filter(pk=cards[0].pk).update(location=None)
+        out = StringIO()
+        call_command('sync_card_locations', stdout=out)
+        self.assertIn('0 created, 0 updated, 1 removed', out.getvalue())
+
+    def test_backfill_adopts_matching_unlinked_locations(self):
+        # Saved separately by the card form before cards had their own row
+        legacy = self.add_location('Time Out Market', 38.7069, -9.1459)
+        card = Card.objects.create(list=self.list, title='Lunch', position=1)
+        Card.objects.filter(pk=card.pk).update(location={'name': 'Time Out Market', 'lat': 38.7069, 'lng': -9.1459})
+
+        out = StringIO()
+        call_command('sync_card_locations', stdout=out)
+        self.assertIn('0 created, 1 updated, 0 removed', out.getvalue())
+        self.assertEqual(Location.objects.get(board=self.board).pk, legacy.pk)
+        self.assertEqual(Location.objects.get(pk=legacy.pk).card_id, card.pk)
+
+    def test_card_places_are_edited_through_the_card(self):
+        card = Card.objects.create(list=self.list, title='Castle', position=1,
+                                   location={'lat': 38.7139, 'lng': -9.1335})
+        url = reverse('location-detail', args=[card.map_location.pk])
+        response = self.client.patch(url, {'name': 'Elsewhere'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Location.objects.get(card=card).name, 'Castle')
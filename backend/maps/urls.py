@@ -4,7 +4,14 @@ from . import views
 urlpatterns = [
     # Locations for a board
     path('boards/<int:board_id>/locations/', views.LocationListCreateView.as_view(), name='board-locations'),
+    path('boards/<int:board_id>/clusters/', views.BoardClusterView.as_view(), name='board-clusters'),
+    path('boards/<int:board_id>/route/', views.BoardRouteView.as_view(), name='board-route'),
+    path('boards/<int:board_id>/map/', views.MapFeatureView.as_view(), name='board-map'),
     
+    # Locations across all of the user's boards
+    path('locations/', views.UserLocationListView.as_view(), name='user-locations'),
+    path('map/', views.MapFeatureView.as_view(), name='user-map'),
+
     # Location detail (global, not nested under board)
     path('locations/<int:pk>/', views.LocationDetailView.as_view(), name='location-detail'),
 ]
\ No newline at end of file
@@ -1,19 +1,74 @@
+import math
+from datetime import date
 from rest_framework import generics, permissions
 from rest_framework.exceptions import ValidationError
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from .clusters import MAX_ZOOM, board_clusters, in_bbox, map_version
+from .geo import EARTH_RADIUS_M, bbox_q, haversine_expression, radius_bbox
 from .models import Location
-from .serializers import LocationSerializer
+from .routing import PENDING, leg_distances, route_cache_key, solve
+from .serializers import LocationSerializer, MapFeatureSerializer
 from boards.models import Board
 from boards.permissions import IsBoardOwnerOrMember
+from boards.mixins import IdempotentCreateMixin
 
-class LocationListCreateView(generics.ListCreateAPIView):
+def parse_numbers(params, name, count):
+    try:
+        numbers = [float(part) for part in params[name].split(',')]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count or not all(math.isfinite(number) for number in numbers):
+        raise ValidationError({name: f"Expected {count} comma-separated numbers."})
+    return numbers
+
+
+def parse_bbox(params):
+    west, south, east, north = parse_numbers(params, 'bbox', 4)
+    if not -90 <= south <= north <= 90 or not (-180 <= west <= 180 and -180 <= east <= 180):
+        raise ValidationError({'bbox': "Expected west,south,east,north within -180..180 and -90..90."})
+    return south, west, north, east
+
+
+def filter_by_area(queryset, params):
+    """
+    Apply ?bbox=west,south,east,north (west > east crosses the antimeridian)
+    and/or ?near=lat,lng&radius=metres, which also annotates and orders by
+    distance in metres.
+    """
+    if params.get('bbox'):
+        queryset = queryset.filter(bbox_q(*parse_bbox(params)))
+
+    if params.get('near'):
+        lat, lng = parse_numbers(params, 'near', 2)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValidationError({'near': "Expected lat,lng within -90..90 and -180..180."})
+        try:
+            radius = float(params.get('radius', ''))
+        except ValueError:
+            radius = 0
+        if not 0 < radius <= math.pi * EARTH_RADIUS_M:
+            raise ValidationError({'radius': "A radius in metres is required with near."})
+        queryset = (
+            queryset.filter(bbox_q(*radius_bbox(lat, lng, radius)))
+            .annotate(distance=haversine_expression(lat, lng))
+            .filter(distance__lte=radius)
+            .order_by('distance')
+        )
+    return queryset
+
+
+class LocationListCreateView(IdempotentCreateMixin, generics.ListCreateAPIView):
     serializer_class = LocationSerializer
     permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
 
     def get_queryset(self):
         board = get_object_or_404(Board, pk=self.kwargs['board_id'])
         self.check_object_permissions(self.request, board)
-        return Location.objects.filter(board=board)
+        queryset = Location.objects.filter(board=board).select_related('created_by')
+        return filter_by_area(queryset, self.request.query_params)
 
     def perform_create(self, serializer):
         board = get_object_or_404(Board, pk=self.kwargs['board_id'])
@@ -23,6 +78,141 @@ class LocationListCreateView(generics.ListCreateAPIView):
             created_by=self.request.user
         )
 
+class UserLocationListView(generics.ListAPIView):
+    """Locations on all of your boards, with the same ?bbox= and ?near= filters"""
+    serializer_class = LocationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = Location.objects.filter(
+            board__in=Board.objects.filter(members=self.request.user)
+        ).select_related('created_by')
+        return filter_by_area(queryset, self.request.query_params)
+
+
+class BoardClusterView(APIView):
+    """
+    Marker clusters of a board's locations for ?zoom=0..22, optionally only
+    those with their centroid in ?bbox=west,south,east,north
+    """
+    permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+
+    def get(self, request, board_id):
+        board = get_object_or_404(Board, pk=board_id)
+        self.check_object_permissions(request, board)
+        try:
+            zoom = int(request.query_params.get('zoom', ''))
+        except ValueError:
+            zoom = -1
+        if not 0 <= zoom <= MAX_ZOOM:
+            raise ValidationError({'zoom': f"An integer zoom level from 0 to {MAX_ZOOM} is required."})
+
+        precision, clusters = board_clusters(board.pk, zoom)
+        if request.query_params.get('bbox'):
+            bbox = parse_bbox(request.query_params)
+            clusters = [cluster for cluster in clusters if in_bbox(cluster['lat'], cluster['lng'], *bbox)]
+        return Response({
+            'zoom': zoom,
+            'precision': precision,
+            'count': sum(cluster['count'] for cluster in clusters),
+            'clusters': clusters,
+        })
+
+
+ROUTE_MAX_STOPS = 500
+MAP_MAX_FEATURES = 2000
+
+
+def route_stops(board, day=None):
+    """The board's map locations (card places included), or with day those of the cards due that day"""
+    locations = Location.objects.filter(board=board)
+    if day is None:
+        locations = locations.order_by('id')
+    else:
+        locations = locations.filter(card__due_date=day).order_by('card__position', 'card_id')
+    return [
+        {'id': pk, 'card': card_id, 'name': name, 'lat': lat, 'lng': lng}
+        for pk, card_id, name, lat, lng in locations.values_list('id', 'card_id', 'name', 'lat', 'lng')
+    ]
+
+
+class BoardRouteView(APIView):
+    """
+    Near-optimal visiting order of a board's locations, or with ?date= of the
+    located cards due that day. ?start= fixes the first stop (a location id).
+    Large itineraries answer 202 "pending" while a worker computes them; poll
+    the same URL.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+
+    def get(self, request, board_id):
+        board = get_object_or_404(Board, pk=board_id)
+        self.check_object_permissions(request, board)
+
+        day = request.query_params.get('date')
+        if day:
+            try:
+                day = date.fromisoformat(day)
+            except ValueError:
+                raise ValidationError({'date': "Expected a date as YYYY-MM-DD."})
+        stops = route_stops(board, day or None)
+        if len(stops) > ROUTE_MAX_STOPS:
+            raise ValidationError({'detail': f"Routes are limited to {ROUTE_MAX_STOPS} stops."})
+
+        start = request.query_params.get('start')
+        start_index = None
+        if start:
+            ids = [str(stop['id']) for stop in stops]
+            if start not in ids:
+                raise ValidationError({'start': "Not one of the stops."})
+            start_index = ids.index(start)
+
+        # The cache key covers the stops themselves, not only the board's map version
+        params = {'date': str(day or ''), 'start': start_index, 'stops': [stop['id'] for stop in stops]}
+        key = route_cache_key(board.pk, map_version(board.pk), params)
+        lats = [stop['lat'] for stop in stops]
+        lngs = [stop['lng'] for stop in stops]
+        result = solve(key, lats, lngs, start_index)
+        if result == PENDING:
+            return Response({'status': PENDING}, status=status.HTTP_202_ACCEPTED)
+
+        order, total = result
+        ordered = [stops[index] for index in order]
+        legs = [0.0, *leg_distances([stop['lat'] for stop in ordered], [stop['lng'] for stop in ordered])]
+        return Response({
+            'status': 'done',
+            'stops': [{**stop, 'leg_distance': float(leg)} for stop, leg in zip(ordered, legs)],
+            'total_distance': total,
+            'original_distance': float(sum(leg_distances(lats, lngs))) if len(stops) > 1 else 0.0,
+        })
+
+
+class MapFeatureView(APIView):
+    """
+    Cards and locations of one board (or of all your boards) in one query,
+    limited to ?bbox= or ?near=&radius=. At most MAP_MAX_FEATURES markers are
+    returned; "truncated" tells the client to switch to clusters.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+
+    def get(self, request, board_id=None):
+        if board_id is None:
+            queryset = Location.objects.filter(board__in=Board.objects.filter(members=request.user))
+        else:
+            board = get_object_or_404(Board, pk=board_id)
+            self.check_object_permissions(request, board)
+            queryset = Location.objects.filter(board=board)
+        queryset = filter_by_area(queryset, request.query_params).select_related('card').defer(
+            'card__description', 'card__subtasks', 'card__attachments', 'card__location',
+        )
+        features = list(queryset[:MAP_MAX_FEATURES + 1])
+        return Response({
+            'count': min(len(features), MAP_MAX_FEATURES),
+            'truncated': len(features) > MAP_MAX_FEATURES,
+            'features': MapFeatureSerializer(features[:MAP_MAX_FEATURES], many=True).data,
+        })
+
+
 class LocationDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = LocationSerializer
     permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
@@ -33,4 +223,17 @@ class LocationDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_object(self):
         obj = get_object_or_404(Location, pk=self.kwargs['pk'])
         self.check_object_permissions(self.request, obj)
-        return obj
\ No newline at end of file
+        return obj
+
+    def check_not_card_place(self, location):
+        # The row mirrors Card.location and would be overwritten by the next card save
+        if location.card_id is not None:
+            raise ValidationError({'card': "This place belongs to a card; change the card's location instead."})
+
+    def perform_update(self, serializer):
+        self.check_not_card_place(serializer.instance)
+        super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        self.check_not_card_place(instance)
+        super().perform_destroy(instance)
\ No newline at end of file
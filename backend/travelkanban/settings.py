@@ -228,8 +228,57 @@ CORS_ALLOWED_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'if-match',
+    'idempotency-key',
 ]
 
+# Row versions for optimistic concurrency are sent back as ETags
+CORS_EXPOSE_HEADERS = ['etag']
+
+# Collaborative description editing: write the merged text back to the row at
+# most once per debounce window and keep this many operations of history
+COLLAB_SNAPSHOT_DEBOUNCE_SECONDS = int(os.environ.get('COLLAB_SNAPSHOT_DEBOUNCE_SECONDS', 5))
+COLLAB_HISTORY_LENGTH = 200
+
+# How long a stored Idempotency-Key response is replayed for retried POSTs
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+
+# Rows removed per query by the purge_deleted worker when boards and accounts are deleted
+DELETION_BATCH_SIZE = 1000
+
+# archive_boards moves completed boards whose trip ended this many days ago into board_archives
+BOARD_ARCHIVE_AFTER_DAYS = 180
+
+# Route optimization: stops solved in the request, and pool processes for larger itineraries
+ROUTE_INLINE_MAX_STOPS = 60
+ROUTE_WORKERS = 2
+
+# send_due_date_reminders notifies assignees this many days before a card's due date
+DUE_DATE_REMINDER_HORIZONS = [7, 1, 0]
+
+# Exchange rates (loaded with `manage.py load_exchange_rates`) are quoted
+# against this currency; lookups are memoized per process for this long
+EXCHANGE_RATE_BASE_CURRENCY = 'USD'
+EXCHANGE_RATE_CACHE_SECONDS = 3600
+
+# Statement imports insert expenses in batches of this many rows
+EXPENSE_IMPORT_BATCH_SIZE = 500
+
+# Deliver queued notifications in-process after each commit; set to False in
+# production and run `manage.py dispatch_notifications --interval 1` instead
+NOTIFICATION_OUTBOX_INLINE = os.environ.get('NOTIFICATION_OUTBOX_INLINE', 'True') == 'True'
+
+# Repeated events of one kind on one board within this window share a
+# notification ("7 expenses added to 'Lisbon'"); with NOTIFICATION_DIGEST they
+# are held back and delivered once per window by the dispatch worker
+NOTIFICATION_COALESCE_SECONDS = 600
+NOTIFICATION_DIGEST = os.environ.get('NOTIFICATION_DIGEST', 'False') == 'True'
+
+# prune_notifications keeps at most this many notifications per user, none
+# older than this many days
+NOTIFICATION_RETENTION_DAYS = 90
+NOTIFICATION_RETENTION_MAX_PER_USER = 500
+
 CSRF_TRUSTED_ORIGINS = os.environ.get('CSRF_TRUSTED_ORIGINS', '').split(',')
 if DEBUG:
     CSRF_TRUSTED_ORIGINS.extend(['http://localhost:3000', 'http://127.0.0.1:3000'])
@@ -242,6 +291,14 @@ EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 
+# Outgoing mail is queued and sent by `manage.py send_queued_email --interval 5`;
+# failed messages are retried with exponential backoff
+EMAIL_QUEUE_INLINE = os.environ.get('EMAIL_QUEUE_INLINE', 'False') == 'True'
+EMAIL_RETRY_BACKOFF_SECONDS = 60
+EMAIL_MAX_ATTEMPTS = 5
+# A worker that dies while sending releases its batch after this long
+EMAIL_SEND_LEASE_SECONDS = 600
+
 # Security settings
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
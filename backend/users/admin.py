@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
-from .models import User, Notification
+from .models import User, Notification, NotificationEvent, QueuedEmail
 
 class CustomUserCreationForm(UserCreationForm):
     """Custom form for creating users in admin."""
@@ -77,3 +77,15 @@ class NotificationAdmin(admin.ModelAdmin):
     list_filter = ('is_read', 'user')
     search_fields = ('title', 'message')
     ordering = ('-created_at',)
+
+
+@admin.register(NotificationEvent)
+class NotificationEventAdmin(admin.ModelAdmin):
+    list_display = ('title', 'user', 'created_at')
+
+
+@admin.register(QueuedEmail)
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to_email', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('to_email', 'subject')
@@ -0,0 +1,110 @@
+"""
+Queued email delivery.
+
+queue_email() stores messages in the email_outbox table; the
+send_queued_email worker sends due messages in batches over a single
+connection of the configured EMAIL_BACKEND. A batch is claimed (marked
+sending) in a short transaction, sent with no transaction or row locks held,
+and each result is recorded as soon as its message is sent, so a crash
+re-sends at most the message in flight; the claims of a worker that died
+expire after EMAIL_SEND_LEASE_SECONDS. A message that fails is retried after
+EMAIL_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1) and given up after
+EMAIL_MAX_ATTEMPTS. With EMAIL_QUEUE_INLINE the messages of a transaction
+are sent in-process right after it commits (development only: the request
+then waits for SMTP again).
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .models import QueuedEmail
+
+DEFAULT_FROM_EMAIL = 'noreply@tripboard.com'
+
+
+def queue_email(subject, body, recipients, from_email=None):
+    """Queue one message per recipient; returns the queued rows"""
+    queued = QueuedEmail.objects.bulk_create([
+        QueuedEmail(to_email=recipient, subject=subject, body=body, from_email=from_email or '')
+        for recipient in recipients
+    ])
+    if queued and getattr(settings, 'EMAIL_QUEUE_INLINE', False):
+        ids = [email.pk for email in queued]
+        transaction.on_commit(lambda: send_queued(email_ids=ids))
+    return queued
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'EMAIL_RETRY_BACKOFF_SECONDS', 60)
+    return timedelta(seconds=base * 2 ** (attempts - 1))
+
+
+def record_failure(email, error, now, max_attempts):
+    email.attempts += 1
+    email.last_error = str(error)[:1000]
+    if email.attempts >= max_attempts:
+        email.status = QueuedEmail.FAILED
+    else:
+        email.status = QueuedEmail.PENDING
+        email.next_attempt_at = now + retry_delay(email.attempts)
+
+
+def claim_batch(batch_size, email_ids, now):
+    """Mark up to batch_size due messages (or expired claims) as sending; returns them"""
+    lease = timedelta(seconds=getattr(settings, 'EMAIL_SEND_LEASE_SECONDS', 600))
+    with transaction.atomic():
+        due = QueuedEmail.objects.filter(
+            status__in=[QueuedEmail.PENDING, QueuedEmail.SENDING], next_attempt_at__lte=now
+        ).order_by('id')
+        if email_ids is not None:
+            due = due.filter(pk__in=email_ids)
+        # Concurrent workers take disjoint batches
+        batch = list(due.select_for_update(skip_locked=True)[:batch_size])
+        QueuedEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+            status=QueuedEmail.SENDING, next_attempt_at=now + lease
+        )
+    return batch
+
+
+RESULT_FIELDS = ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+
+
+def send_queued(batch_size=100, email_ids=None):
+    """Send up to batch_size due messages over one connection; returns (sent, failed)"""
+    max_attempts = getattr(settings, 'EMAIL_MAX_ATTEMPTS', 5)
+    now = timezone.now()
+    batch = claim_batch(batch_size, email_ids, now)
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        # Server unreachable: back the whole batch off
+        for email in batch:
+            record_failure(email, e, now, max_attempts)
+        QueuedEmail.objects.bulk_update(batch, RESULT_FIELDS)
+        return 0, len(batch)
+    try:
+        for email in batch:
+            message = EmailMessage(
+                email.subject, email.body, email.from_email or DEFAULT_FROM_EMAIL, [email.to_email],
+                connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as e:
+                record_failure(email, e, now, max_attempts)
+                failed += 1
+            else:
+                email.attempts += 1
+                email.status = QueuedEmail.SENT
+                email.sent_at = timezone.now()
+                sent += 1
+            email.save(update_fields=RESULT_FIELDS)
+    finally:
+        connection.close()
+    return sent, failed
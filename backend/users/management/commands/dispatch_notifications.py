@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from users.outbox import dispatch
+
+
+class Command(BaseCommand):
+    help = "Deliver queued notifications from the outbox (run as a worker with NOTIFICATION_OUTBOX_INLINE=False)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep running, polling every N seconds (0 = drain once and exit)")
+
+    def handle(self, *args, **options):
+        while True:
+            delivered = 0
+            while True:
+                count = dispatch(batch_size=options['batch_size'])
+                delivered += count
+                if count < options['batch_size']:
+                    break
+            if delivered or not options['interval']:
+                self.stdout.write(f"Delivered {delivered} notification(s)")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,51 @@
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from users.models import Notification, NotificationCounter
+
+
+class Command(BaseCommand):
+    help = "Delete notifications older than the retention period or beyond the per-user limit, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90),
+                            help="Delete notifications older than this many days (0 = no age limit)")
+        parser.add_argument('--keep', type=int, default=getattr(settings, 'NOTIFICATION_RETENTION_MAX_PER_USER', 500),
+                            help="Keep at most this many notifications per user (0 = no count limit)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        deleted = 0
+        if options['days']:
+            cutoff = timezone.now() - timedelta(days=options['days'])
+            deleted += self.delete_in_batches(Notification.objects.filter(created_at__lt=cutoff))
+        if options['keep']:
+            crowded = (
+                Notification.objects.order_by().values('user_id')
+                .annotate(total=Count('id')).filter(total__gt=options['keep'])
+                .values_list('user_id', flat=True)
+            )
+            for user_id in crowded:
+                newest = Notification.objects.filter(user_id=user_id).order_by('-id')
+                last_kept = newest.values_list('id', flat=True)[options['keep'] - 1]
+                deleted += self.delete_in_batches(Notification.objects.filter(user_id=user_id, id__lt=last_kept))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} notification(s)"))
+
+    def delete_in_batches(self, queryset):
+        """Delete rows batch by batch so no statement holds locks for long; keeps unread counters right"""
+        deleted = 0
+        while True:
+            ids = list(queryset.order_by('id').values_list('id', flat=True)[:self.batch_size])
+            if not ids:
+                return deleted
+            with transaction.atomic():
+                unread = Counter(
+                    Notification.objects.filter(pk__in=ids, is_read=False).values_list('user_id', flat=True)
+                )
+                deleted += Notification.objects.filter(pk__in=ids).delete()[0]
+                NotificationCounter.add({user_id: -count for user_id, count in unread.items()})
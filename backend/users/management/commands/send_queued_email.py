@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from users.mailer import send_queued
+
+
+class Command(BaseCommand):
+    help = "Send queued email in batches, one mail server connection per batch, retrying failures with backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep running, polling every N seconds (0 = send what is due and exit)")
+
+    def handle(self, *args, **options):
+        while True:
+            total_sent = total_failed = 0
+            while True:
+                sent, failed = send_queued(batch_size=options['batch_size'])
+                total_sent += sent
+                total_failed += failed
+                if sent + failed < options['batch_size']:
+                    break
+            if total_sent or total_failed or not options['interval']:
+                self.stdout.write(f"Sent {total_sent} email(s), {total_failed} failed")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -1,6 +1,14 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+class ActiveUserManager(UserManager):
+    """Leaves out accounts that were deleted and wait for the background purge"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 
 class User(AbstractUser):
     """
@@ -26,6 +34,12 @@ class User(AbstractUser):
         help_text="Timestamp when the user account was created"
     )
 
+    # Set when the account is deleted; the rows are purged in the background
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ActiveUserManager()
+    all_objects = models.Manager()
+
     # Use email as the username field for authentication
     USERNAME_FIELD = 'email'
 
@@ -73,9 +87,112 @@ class Notification(models.Model):
     message = models.TextField(blank=True, null=True)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # What the notification is about, so repeated events can be coalesced (see users/outbox.py)
+    kind = models.CharField(max_length=30, blank=True, default='')
+    board = models.ForeignKey('boards.Board', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    count = models.PositiveIntegerField(default=1, help_text="Number of events coalesced into this notification")
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Only unread rows: keeps mark-read UPDATEs and recounts cheap for users with long histories
+            models.Index(fields=['user', 'id'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+            models.Index(fields=['user', '-created_at'], name='notification_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} for {self.user.email}"
+
+
+class NotificationEvent(models.Model):
+    """
+    Outbox row for a notification that still has to be delivered. Written in
+    the same transaction as the change it reports and turned into
+    Notification rows by users/outbox.py after commit.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    title = models.CharField(max_length=200)
+    message = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    kind = models.CharField(max_length=30, blank=True, default='')
+    board_id = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'notification_outbox'
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.title} for {self.user_id}"
+
+
+class NotificationCounter(models.Model):
+    """
+    Number of unread notifications per user, so the badge count is a primary
+    key lookup. Incremented when the outbox delivers notifications and
+    decremented by the mark-read endpoints; rebuild() recounts.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'notification_counters'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+    @classmethod
+    def add(cls, counts):
+        """Add {user_id: n} to the unread counters (n may be negative)"""
+        cls.objects.bulk_create([cls(user_id=user_id) for user_id in counts], ignore_conflicts=True)
+        for user_id, count in counts.items():
+            if count:
+                cls.objects.filter(user_id=user_id).update(unread=models.F('unread') + count)
+
+    @classmethod
+    def rebuild(cls, user_ids):
+        """Recount the unread notifications of user_ids"""
+        unread = dict(
+            Notification.objects.filter(user_id__in=user_ids, is_read=False)
+            .order_by().values('user_id').annotate(count=models.Count('id')).values_list('user_id', 'count')
+        )
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, unread=unread.get(user_id, 0)) for user_id in user_ids],
+            update_conflicts=True, unique_fields=['user'], update_fields=['unread'],
+        )
+
+
+class QueuedEmail(models.Model):
+    """
+    Outgoing email waiting for the send_queued_email worker (see users/mailer.py),
+    so requests never wait on SMTP.
+    """
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (SENDING, 'Sending'), (SENT, 'Sent'), (FAILED, 'Failed')]
+
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # When a pending message is due; while sending, when the worker's claim expires
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'email_outbox'
+        ordering = ['id']
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at'], condition=models.Q(status__in=['pending', 'sending']),
+                name='email_outbox_due_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.to_email} ({self.status})"
@@ -0,0 +1,141 @@
+"""
+Transactional outbox for notifications.
+
+Signal handlers call notify(), which appends NotificationEvent rows with one
+INSERT inside the current transaction, so a rolled-back change never
+notifies anyone and a committed one always does. dispatch() moves events
+into Notification with bulk_create. With NOTIFICATION_OUTBOX_INLINE the
+events of a transaction are dispatched in-process right after it commits;
+otherwise the dispatch_notifications worker command drains the outbox.
+
+Events of a coalescing kind (see COALESCED) for the same user and board are
+merged: into one notification per dispatch batch, and into a still-unread
+notification of the same kind from the last NOTIFICATION_COALESCE_SECONDS,
+e.g. "7 expenses added to 'Lisbon'". With NOTIFICATION_DIGEST those events
+are held back until they are a window old, so each window produces one
+digest notification per user and board.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Notification, NotificationCounter, NotificationEvent
+
+# kind: (title, message for a count of events on a board)
+COALESCED = {
+    'expense_added': ("Budget updated", "{count} expenses added to board '{board}'."),
+    'card_assigned': ("Tasks assigned to you", "You have been assigned to {count} tasks in board '{board}'."),
+}
+
+
+def coalesce_window():
+    return timedelta(seconds=getattr(settings, 'NOTIFICATION_COALESCE_SECONDS', 600))
+
+
+def notify(user_ids, title, message, kind='', board=None):
+    """Queue the same notification for several users"""
+    board_id = getattr(board, 'pk', board)
+    notify_many((user_id, title, message, kind, board_id) for user_id in user_ids)
+
+
+def notify_many(events):
+    """Queue (user_id, title, message, kind, board_id) notifications"""
+    events = NotificationEvent.objects.bulk_create([
+        NotificationEvent(user_id=user_id, title=title, message=message, kind=kind, board_id=board_id)
+        for user_id, title, message, kind, board_id in events
+        if user_id is not None
+    ])
+    if events and getattr(settings, 'NOTIFICATION_OUTBOX_INLINE', True):
+        event_ids = [event.pk for event in events]
+        transaction.on_commit(lambda: dispatch(event_ids=event_ids))
+
+
+def dispatch(event_ids=None, batch_size=500):
+    """Deliver up to batch_size queued events (or just event_ids); returns how many were delivered"""
+    from boards.models import Board  # Import here to avoid circular
+
+    now = timezone.now()
+    with transaction.atomic():
+        events = NotificationEvent.objects.order_by('pk')
+        if event_ids is not None:
+            events = events.filter(pk__in=event_ids)
+        if getattr(settings, 'NOTIFICATION_DIGEST', False):
+            events = events.filter(~Q(kind__in=COALESCED) | Q(created_at__lte=now - coalesce_window()))
+        # Concurrent workers take disjoint batches
+        events = list(events.select_for_update(skip_locked=True)[:batch_size])
+        if not events:
+            return 0
+
+        board_titles = dict(
+            Board.objects.filter(pk__in={event.board_id for event in events if event.board_id})
+            .values_list('pk', 'title')
+        )
+        single, grouped = [], defaultdict(list)
+        for event in events:
+            if event.board_id not in board_titles:
+                event.board_id = None  # the board was deleted meanwhile
+            if event.kind in COALESCED and event.board_id:
+                grouped[(event.user_id, event.kind, event.board_id)].append(event)
+            else:
+                single.append(event)
+
+        merged = merge_into_recent(grouped, board_titles, now)
+        new = [
+            Notification(user_id=event.user_id, title=event.title, message=event.message,
+                         kind=event.kind, board_id=event.board_id)
+            for event in single
+        ]
+        for (user_id, kind, board_id), group in grouped.items():
+            if (user_id, kind, board_id) in merged:
+                continue
+            if len(group) == 1:
+                new.append(Notification(user_id=user_id, title=group[0].title, message=group[0].message,
+                                        kind=kind, board_id=board_id))
+            else:
+                title, message = COALESCED[kind]
+                new.append(Notification(
+                    user_id=user_id, title=title, kind=kind, board_id=board_id, count=len(group),
+                    message=message.format(count=len(group), board=board_titles[board_id]),
+                ))
+
+        Notification.objects.bulk_create(new)
+        NotificationEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+        NotificationCounter.add(Counter(notification.user_id for notification in new))
+    return len(events)
+
+
+def merge_into_recent(grouped, board_titles, now):
+    """
+    Fold groups into matching unread notifications created within the window.
+    Returns the keys that were merged.
+    """
+    if not grouped:
+        return set()
+    recent = (
+        Notification.objects.select_for_update()
+        .filter(
+            user_id__in={user_id for user_id, _, _ in grouped},
+            kind__in={kind for _, kind, _ in grouped},
+            board_id__in={board_id for _, _, board_id in grouped},
+            is_read=False,
+            created_at__gte=now - coalesce_window(),
+        )
+        .order_by('id')
+    )
+    latest = {(n.user_id, n.kind, n.board_id): n for n in recent}
+
+    updated = []
+    for key, group in grouped.items():
+        notification = latest.get(key)
+        if notification is None:
+            continue
+        _, kind, board_id = key
+        title, message = COALESCED[kind]
+        notification.count += len(group)
+        notification.title = title
+        notification.message = message.format(count=notification.count, board=board_titles[board_id])
+        updated.append(notification)
+    Notification.objects.bulk_update(updated, ['count', 'title', 'message'])
+    return {(n.user_id, n.kind, n.board_id) for n in updated}
@@ -121,8 +121,25 @@ class LoginSerializer(serializers.Serializer):
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ['id', 'title', 'message', 'is_read', 'created_at']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'title', 'message', 'is_read', 'created_at', 'kind', 'board', 'count']
+        read_only_fields = ['id', 'created_at', 'kind', 'board', 'count']
+
+class BulkInviteSerializer(serializers.Serializer):
+    emails = serializers.ListField(child=serializers.EmailField(), allow_empty=False, max_length=100)
+
+
+class NotificationReadSerializer(serializers.Serializer):
+    """Notifications to mark read: explicit ids and/or an inclusive id range"""
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=1000)
+    from_id = serializers.IntegerField(required=False)
+    to_id = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if not attrs.get('ids') and 'from_id' not in attrs and 'to_id' not in attrs:
+            raise serializers.ValidationError("Provide ids, from_id or to_id.")
+        if attrs.get('from_id') is not None and attrs.get('to_id') is not None and attrs['from_id'] > attrs['to_id']:
+            raise serializers.ValidationError("from_id must be less than or equal to to_id.")
+        return attrs
 
 # FIX: Custom TokenRefreshSerializer to handle deleted users gracefully
 class CustomTokenRefreshSerializer(TokenRefreshSerializer):
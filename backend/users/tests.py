@@ -1,9 +1,21 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from smtplib import SMTPException
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
+from boards.deletion import job_progress, purge_batch
+from boards.models import Board, BoardArchive, DeletionJob
+from .mailer import send_queued
+from .models import Notification, NotificationCounter, NotificationEvent, QueuedEmail
+from .outbox import notify, notify_many
 
 User = get_user_model()
 
@@ -178,4 +190,245 @@ class AuthAPITest(APITestCase):
         # Try to register with same email
         response = self.client.post(self.register_url, self.user_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertIn('email', response.data)
\ No newline at end of file
+        self.assertIn('email', response.data)
+
+class NotificationOutboxTest(TestCase):
+    """Test cases for the notification outbox."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='testpass123')
+        self.member = User.objects.create_user(username='member', email='member@example.com', password='testpass123')
+
+    def test_events_are_delivered_after_commit(self):
+        """Test that queued events become notifications once the transaction commits."""
+        with self.captureOnCommitCallbacks(execute=True):
+            board = Board.objects.create(title='Lisbon', owner=self.owner)
+            card = board.lists.get(position=0).cards.create(title='Museum')
+            card.assigned_members.add(self.owner, self.member)
+            self.assertFalse(Notification.objects.exists())
+        self.assertEqual(self.owner.notifications.count(), 2)
+        self.assertEqual(self.member.notifications.get().title, 'Task assigned to you')
+        self.assertFalse(NotificationEvent.objects.exists())
+
+    @override_settings(NOTIFICATION_OUTBOX_INLINE=False)
+    def test_worker_command_drains_the_outbox(self):
+        """Test that the dispatch_notifications command delivers queued events in batches."""
+        with self.captureOnCommitCallbacks(execute=True):
+            notify([self.owner.pk, self.member.pk], title='Hello', message='Hi')
+            notify([self.owner.pk], title='Again', message='Hi')
+        self.assertEqual(NotificationEvent.objects.count(), 3)
+        call_command('dispatch_notifications', batch_size=2, stdout=StringIO())
+        self.assertFalse(NotificationEvent.objects.exists())
+        self.assertEqual(Notification.objects.count(), 3)
+
+
+class NotificationReadStateTest(APITestCase):
+    """Test cases for unread counts and bulk read operations."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='owner', email='owner@example.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            notify([self.user.pk] * 5, title='Budget updated', message='New expense')
+        self.ids = list(self.user.notifications.order_by('id').values_list('id', flat=True))
+
+    def unread(self):
+        return self.client.get(reverse('users:notifications-unread-count')).data['unread']
+
+    def test_mark_range_and_all_read(self):
+        """Test that the counter follows range and mark-all updates."""
+        self.assertEqual(self.unread(), 5)
+        response = self.client.post(reverse('users:notifications-read'), {'from_id': self.ids[0], 'to_id': self.ids[1]}, format='json')
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(self.unread(), 3)
+
+        response = self.client.post(reverse('users:notifications-read-all'))
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(self.unread(), 0)
+        self.assertFalse(self.user.notifications.filter(is_read=False).exists())
+
+    def test_missing_counter_is_rebuilt(self):
+        """Test that a user without a counter row gets one from a recount."""
+        NotificationCounter.objects.all().delete()
+        self.client.post(reverse('users:notifications-read'), {'ids': [self.ids[0]]}, format='json')
+        self.assertEqual(self.unread(), 4)
+
+
+class NotificationCompactionTest(TestCase):
+    """Test cases for notification coalescing and retention."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='owner', email='owner@example.com', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.board = Board.objects.create(title='Lisbon', owner=self.user)
+
+    def add_expenses(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(count):
+                notify([self.user.pk], title='Budget updated', message='New expense', kind='expense_added', board=self.board)
+
+    def test_same_kind_events_on_a_board_are_coalesced(self):
+        """Test that repeated expense events share one unread notification."""
+        with self.captureOnCommitCallbacks(execute=True):
+            notify_many([(self.user.pk, 'Budget updated', 'New expense', 'expense_added', self.board.pk)] * 3)
+        self.add_expenses(4)
+        notification = self.user.notifications.get(kind='expense_added')
+        self.assertEqual(notification.count, 7)
+        self.assertEqual(notification.message, "7 expenses added to board 'Lisbon'.")
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread, 2)
+
+        notification.is_read = True
+        notification.save()
+        self.add_expenses(1)
+        self.assertEqual(self.user.notifications.filter(kind='expense_added').count(), 2)
+
+    @override_settings(NOTIFICATION_DIGEST=True, NOTIFICATION_COALESCE_SECONDS=0)
+    def test_digest_mode_holds_events_for_the_worker(self):
+        """Test that digest mode leaves coalescable events to the dispatcher run."""
+        with override_settings(NOTIFICATION_COALESCE_SECONDS=600):
+            self.add_expenses(3)
+        self.assertFalse(self.user.notifications.filter(kind='expense_added').exists())
+        call_command('dispatch_notifications', stdout=StringIO())
+        self.assertEqual(self.user.notifications.get(kind='expense_added').count, 3)
+
+    def test_prune_by_age_and_count(self):
+        """Test that retention deletes old and surplus notifications and fixes the counter."""
+        Notification.objects.bulk_create([Notification(user=self.user, title=f'n{i}') for i in range(5)])
+        NotificationCounter.rebuild([self.user.pk])
+        Notification.objects.filter(title='n0').update(created_at=timezone.now() - timedelta(days=100))
+        call_command('prune_notifications', days=90, keep=3, batch_size=2, stdout=StringIO())
+        self.assertEqual(self.user.notifications.count(), 3)
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread, 3)
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    """Email backend whose server rejects every message."""
+
+    def send_messages(self, email_messages):
+        raise SMTPException('Service unavailable')
+
+
+class RecordingEmailBackend(BaseEmailBackend):
+    """Email backend that records the outbox status of each message while it is sent."""
+    seen = []
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            self.seen.append(QueuedEmail.objects.get(to_email=message.to[0]).status)
+        return len(email_messages)
+
+
+class QueuedInviteTest(APITestCase):
+    """Test cases for queued and bulk invitation email."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='owner', email='owner@example.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def test_bulk_invite_is_queued_and_sent_in_one_batch(self):
+        """Test that invites are queued by the request and delivered by the worker."""
+        response = self.client.post(
+            reverse('invite-bulk'),
+            {'emails': ['a@example.com', 'B@example.com', 'b@example.com', 'owner@example.com']},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['queued'], 3)
+        self.assertEqual(len(mail.outbox), 0)
+
+        call_command('send_queued_email', stdout=StringIO())
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['a@example.com', 'b@example.com', 'owner@example.com'])
+        existing = next(message for message in mail.outbox if message.to == ['owner@example.com'])
+        self.assertIn('Log in to view your boards', existing.body)
+        self.assertFalse(QueuedEmail.objects.exclude(status=QueuedEmail.SENT).exists())
+
+    def test_single_invite_matches_existing_user_case_insensitively(self):
+        """Test that a single invite normalises the email like the bulk one."""
+        response = self.client.post(reverse('invite'), {'email': 'OWNER@Example.com'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        call_command('send_queued_email', stdout=StringIO())
+        self.assertEqual([message.to for message in mail.outbox], [['owner@example.com']])
+        self.assertIn('Log in to view your boards', mail.outbox[0].body)
+
+    @override_settings(EMAIL_BACKEND='users.tests.FailingEmailBackend', EMAIL_MAX_ATTEMPTS=2)
+    def test_failed_email_is_retried_with_backoff(self):
+        """Test that failures are rescheduled and eventually given up."""
+        self.client.post(reverse('invite'), {'email': 'a@example.com'}, format='json')
+        self.assertEqual(send_queued(), (0, 1))
+        email = QueuedEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), (QueuedEmail.PENDING, 1))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(send_queued(), (0, 0))  # not due yet
+
+        QueuedEmail.objects.update(next_attempt_at=timezone.now())
+        send_queued()
+        self.assertEqual(QueuedEmail.objects.get().status, QueuedEmail.FAILED)
+
+
+class AccountDeletionTest(APITestCase):
+    """Test cases for background account deletion."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='leaving', email='leaving@example.com', password='testpass123')
+        self.friend = User.objects.create_user(username='friend', email='friend@example.com', password='testpass123')
+        self.own_board = Board.objects.create(title='Solo trip', owner=self.user)
+        self.own_board.members.add(self.friend)
+        self.shared_board = Board.objects.create(title='Group trip', owner=self.friend)
+        self.shared_board.members.add(self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_delete_hides_account_and_purges_in_background(self):
+        response = self.client.delete(reverse('user-delete'))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Board.objects.filter(pk=self.own_board.pk).exists())
+        # The email can be registered again right away
+        User.objects.create_user(username='leaving', email='leaving@example.com', password='testpass123')
+
+        call_command('purge_deleted', stdout=StringIO())
+        self.assertFalse(User.all_objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Board.all_objects.filter(pk=self.own_board.pk).exists())
+        self.assertEqual(list(self.shared_board.members.all()), [self.friend])
+
+    def test_purge_removes_archives_in_batches(self):
+        """Test that archived boards are purged by their own steps, not the account cascade."""
+        own_archive = BoardArchive.objects.create(board_id=1001, owner=self.user, title='Old solo trip', document=b'')
+        own_archive.members.add(self.friend)
+        shared_archive = BoardArchive.objects.create(board_id=1002, owner=self.friend, title='Old group trip', document=b'')
+        shared_archive.members.add(self.user, self.friend)
+        self.client.delete(reverse('user-delete'))
+
+        job = DeletionJob.objects.get()
+        # Run every step up to the account row itself
+        while job_progress(job)[2] != 'account':
+            job = purge_batch(batch_size=1, job_ids=[job.pk])
+        self.assertFalse(BoardArchive.objects.filter(pk=own_archive.pk).exists())
+        self.assertEqual(list(shared_archive.members.all()), [self.friend])
+
+        call_command('purge_deleted', stdout=StringIO())
+        self.assertFalse(User.all_objects.filter(pk=self.user.pk).exists())
+        self.assertTrue(BoardArchive.objects.filter(pk=shared_archive.pk).exists())
+
+    @override_settings(EMAIL_BACKEND='users.tests.RecordingEmailBackend')
+    def test_batch_is_claimed_before_sending(self):
+        """Test that messages are marked sending while sent, and stale claims are retried."""
+        RecordingEmailBackend.seen = []
+        self.client.post(reverse('invite'), {'email': 'a@example.com'}, format='json')
+        self.assertEqual(send_queued(), (1, 0))
+        self.assertEqual(RecordingEmailBackend.seen, [QueuedEmail.SENDING])
+
+        self.client.post(reverse('invite'), {'email': 'b@example.com'}, format='json')
+        # A worker died holding the claim: it is left alone until the lease runs out
+        QueuedEmail.objects.filter(to_email='b@example.com').update(
+            status=QueuedEmail.SENDING, next_attempt_at=timezone.now() + timedelta(minutes=5)
+        )
+        self.assertEqual(send_queued(), (0, 0))
+        QueuedEmail.objects.filter(to_email='b@example.com').update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued(), (1, 0))
+        self.assertFalse(QueuedEmail.objects.exclude(status=QueuedEmail.SENT).exists())
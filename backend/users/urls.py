@@ -10,6 +10,9 @@ urlpatterns = [
 
     # Notifications
     path('notifications/', views.NotificationListView.as_view(), name='notifications'),
+    path('notifications/unread-count/', views.NotificationUnreadCountView.as_view(), name='notifications-unread-count'),
+    path('notifications/read-all/', views.NotificationMarkAllReadView.as_view(), name='notifications-read-all'),
+    path('notifications/read/', views.NotificationMarkReadView.as_view(), name='notifications-read'),
 
     # Future user management endpoints
     # These will be useful when you need user listing, searching, etc.
@@ -6,9 +6,12 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
-from django.core.mail import send_mail
-from .models import User, Notification
-from .serializers import UserSerializer, RegisterSerializer, LoginSerializer, NotificationSerializer, CustomTokenRefreshSerializer
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Lower
+from .models import User, Notification, NotificationCounter
+from .mailer import queue_email
+from .serializers import UserSerializer, RegisterSerializer, LoginSerializer, NotificationSerializer, NotificationReadSerializer, BulkInviteSerializer, CustomTokenRefreshSerializer
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 
@@ -111,11 +114,15 @@ class UserDeleteView(generics.DestroyAPIView):
         return self.request.user
 
     def delete(self, request, *args, **kwargs):
-        user = self.get_object()
-        user.delete()
+        from boards.deletion import delete_account  # Import here to avoid circular
+        from boards.serializers import DeletionJobSerializer
+
+        # The account and its boards are hidden at once and purged in the background
+        job = delete_account(self.get_object())
         return Response({
-            'message': 'Account deleted successfully'
-        }, status=status.HTTP_204_NO_CONTENT)
+            'message': 'Account deleted successfully',
+            'deletion': DeletionJobSerializer(job).data,
+        }, status=status.HTTP_202_ACCEPTED)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -125,6 +132,31 @@ def health_check(request):
         'status': 'healthy'
     }, status=status.HTTP_200_OK)
 
+INVITE_SUBJECT = 'Invitation to Join TripBoard'
+INVITE_MESSAGE = 'You have been invited to join TripBoard. Please register or log in to collaborate on travel plans.'
+INVITE_MESSAGE_EXISTING_USER = 'You have been invited to join a team on TripBoard. Log in to view your boards.'
+
+
+def queue_invitations(emails):
+    """
+    Queue invitation emails; people who already have an account get the
+    log-in wording. Addresses are compared case-insensitively; returns the
+    normalised, de-duplicated list that was queued.
+    """
+    emails = list(dict.fromkeys(email.strip().lower() for email in emails))
+    existing = set(
+        User.objects.annotate(email_lower=Lower('email'))
+        .filter(email_lower__in=emails).values_list('email_lower', flat=True)
+    )
+    new_users = [email for email in emails if email not in existing]
+    with transaction.atomic():
+        if new_users:
+            queue_email(INVITE_SUBJECT, INVITE_MESSAGE, new_users)
+        if existing:
+            queue_email(INVITE_SUBJECT, INVITE_MESSAGE_EXISTING_USER, sorted(existing))
+    return emails
+
+
 class InviteView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -133,21 +165,73 @@ class InviteView(APIView):
         if not email:
             return Response({'error': 'Email is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        subject = 'Invitation to Join TripBoard'
-        message = 'You have been invited to join TripBoard. Please register or log in to collaborate on travel plans.'
-        from_email = 'noreply@tripboard.com'
-        recipient_list = [email]
+        # Sent by the send_queued_email worker, so the request does not wait on SMTP
+        queue_invitations([email])
 
-        if User.objects.filter(email=email).exists():
-            message = 'You have been invited to join a team on TripBoard. Log in to view your boards.'
+        return Response({'message': 'Invitation sent successfully'}, status=status.HTTP_202_ACCEPTED)
 
-        send_mail(subject, message, from_email, recipient_list)
 
-        return Response({'message': 'Invitation sent successfully'}, status=status.HTTP_200_OK)
+class BulkInviteView(APIView):
+    """Queue invitations for a list of email addresses"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = BulkInviteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        emails = queue_invitations(serializer.validated_data['emails'])
+        return Response({'queued': len(emails)}, status=status.HTTP_202_ACCEPTED)
 
 class NotificationListView(generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
\ No newline at end of file
+        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+
+def mark_read(user, notifications):
+    """Mark the user's unread notifications in the queryset read with one UPDATE; returns the count"""
+    with transaction.atomic():
+        updated = notifications.filter(user=user, is_read=False).update(is_read=True)
+        if updated:
+            NotificationCounter.objects.filter(user=user).update(unread=F('unread') - updated)
+    return updated
+
+
+class NotificationUnreadCountView(APIView):
+    """Unread notification count, read from the maintained counter"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        unread = NotificationCounter.objects.filter(user=request.user).values_list('unread', flat=True).first()
+        if unread is None:
+            NotificationCounter.rebuild([request.user.pk])
+            unread = NotificationCounter.objects.get(user=request.user).unread
+        return Response({'unread': max(unread, 0)})
+
+
+class NotificationMarkAllReadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        updated = mark_read(request.user, Notification.objects.all())
+        return Response({'updated': updated})
+
+
+class NotificationMarkReadView(APIView):
+    """Mark notifications read by ids and/or an inclusive id range"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = NotificationReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        notifications = Notification.objects.all()
+        if data.get('ids'):
+            notifications = notifications.filter(pk__in=data['ids'])
+        if data.get('from_id') is not None:
+            notifications = notifications.filter(pk__gte=data['from_id'])
+        if data.get('to_id') is not None:
+            notifications = notifications.filter(pk__lte=data['to_id'])
+        updated = mark_read(request.user, notifications)
+        return Response({'updated': updated})
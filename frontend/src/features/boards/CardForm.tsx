@@ -7,7 +7,7 @@ import { Textarea } from '@/components/ui/textarea';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { Checkbox } from '@/components/ui/checkbox';
 import { Label } from '@/components/ui/label';
-import { useCreateCard, useUpdateCard, useCreateLocation, useUpdateLocation } from './hooks';
+import { useCreateCard, useUpdateCard } from './hooks';
 import { toast } from 'sonner';
 import { useState } from 'react';
 
@@ -29,7 +29,7 @@ interface CardFormProps {
   boardId: number;
   listId: number;
   onSuccess: () => void;
-  initialData?: Partial<CardFormData> & { id?: number; locationId?: number };
+  initialData?: Partial<CardFormData> & { id?: number };
 }
 
 export default function CardForm({ boardId, listId, onSuccess, initialData }: CardFormProps) {
@@ -54,8 +54,6 @@ export default function CardForm({ boardId, listId, onSuccess, initialData }: Ca
 
   const { mutate: createCard } = useCreateCard(boardId, listId);
   const { mutate: updateCard } = useUpdateCard(boardId, listId);
-  const { mutate: createLocation } = useCreateLocation(boardId);
-  const { mutate: updateLocation } = useUpdateLocation();
 
   const handleGeocode = async () => {
     if (!address.trim()) return;
@@ -87,35 +85,11 @@ export default function CardForm({ boardId, listId, onSuccess, initialData }: Ca
   };
 
   const onSubmit: SubmitHandler<CardFormData> = (data) => {
-    const cardData = { ...data };
-    delete cardData.location;
-
-    const handleLocation = (cardId: number, location?: CardFormData['location']) => {
-      if (location) {
-        if (initialData?.locationId) {
-          updateLocation({ locationId: initialData.locationId, data: { ...location, board: boardId }, boardId });
-        } else {
-          createLocation({ ...location, board: boardId }, {
-            onSuccess: () => toast.success('Location synced to map'),
-          });
-        }
-      }
-    };
-
+    // The card's location is saved with the card; the API keeps its map location in sync
     if (initialData?.id) {
-      updateCard({ cardId: initialData.id, data: cardData }, { 
-        onSuccess: (updatedCard) => {
-          handleLocation(updatedCard.id, data.location);
-          onSuccess();
-        },
-      });
+      updateCard({ cardId: initialData.id, data }, { onSuccess: () => onSuccess() });
     } else {
-      createCard(cardData, { 
-        onSuccess: (newCard) => {
-          handleLocation(newCard.id, data.location);
-          onSuccess();
-        },
-      });
+      createCard(data, { onSuccess: () => onSuccess() });
     }
   };
 